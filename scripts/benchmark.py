@@ -0,0 +1,3 @@
+from triage_trend.benchmarks.suite import main
+
+main()
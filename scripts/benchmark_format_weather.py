@@ -0,0 +1,90 @@
+import glob
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from triage_trend.weather_features import (
+    FEATURE_COLUMNS,
+    WEATHER_DATA_PATTERN,
+    calculate_cloudiness,
+    update_station_weather,
+)
+
+
+# Previous per-group implementation, kept here as the benchmark baseline
+def legacy_calculate_daily_features(group):
+    features = {}
+    features["Average_Temperature"] = group.loc[
+        group["Parameter"] == "T", "Wert"
+    ].mean()
+    features["Max_Temperature"] = group.loc[
+        group["Parameter"] == "T_max_h1", "Wert"
+    ].max()
+    features["Total_Rain_Duration"] = group.loc[
+        group["Parameter"] == "RainDur", "Wert"
+    ].sum()
+    features["Average_Pressure"] = group.loc[
+        group["Parameter"] == "p", "Wert"
+    ].mean()
+    features["Average_Global_Radiation"] = group.loc[
+        group["Parameter"] == "StrGlo", "Wert"
+    ].mean()
+    if pd.notnull(features["Average_Global_Radiation"]):
+        features["Cloudiness"] = calculate_cloudiness(
+            features["Average_Global_Radiation"]
+        )
+    else:
+        features["Cloudiness"] = np.nan
+    return pd.Series(features)
+
+
+def legacy_format_weather(path):
+    df = pd.read_csv(path)
+    df["Datum"] = pd.to_datetime(df["Datum"])
+    grouped = df.groupby(["Datum", "Standort"], as_index=False)
+    daily_features = grouped.apply(legacy_calculate_daily_features).reset_index(
+        drop=True
+    )
+    daily_features["Total_Rain_Duration"] = np.clip(
+        daily_features["Total_Rain_Duration"], 0, 1440
+    )
+    daily_features["Cloudiness"] = daily_features["Cloudiness"].fillna(0.5)
+    numeric_columns = daily_features.select_dtypes(include=[np.number]).columns
+    return daily_features.groupby("Datum")[numeric_columns].mean().reset_index()
+
+
+def main():
+    paths = sorted(glob.glob(WEATHER_DATA_PATTERN))
+
+    start = time.perf_counter()
+    legacy = pd.concat(
+        [legacy_format_weather(path) for path in paths], ignore_index=True
+    )
+    legacy_seconds = time.perf_counter() - start
+
+    # A fresh cache, so every file is read like on the first run
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        features = update_station_weather(
+            paths,
+            cache_path=f"{cache_dir}/station_weather.npz",
+            manifest_path=f"{cache_dir}/station_weather.json",
+        ).daily_features()
+        seconds = time.perf_counter() - start
+
+    # The default aggregation reproduces the legacy features exactly
+    pd.testing.assert_series_equal(features["Datum"], legacy["Datum"])
+    np.testing.assert_array_equal(
+        features[FEATURE_COLUMNS].to_numpy(),
+        legacy[FEATURE_COLUMNS].to_numpy(),
+    )
+    print(f"{len(paths)} files, {len(features)} days")
+    print(f"legacy groupby.apply: {legacy_seconds:8.3f} s")
+    print(f"station array:        {seconds:8.3f} s")
+    print(f"speedup:              {legacy_seconds / seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
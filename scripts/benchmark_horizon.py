@@ -0,0 +1,58 @@
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Every /predict call has to score its day, not read it from the cache
+os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from triage_trend.main import app  # noqa: E402
+
+START = date(2024, 8, 24)
+HORIZON_DAYS = 90
+
+
+def single_day_calls(client, dates):
+    return [
+        client.post("/predict", json={"date": d}).json()["prediction"]
+        for d in dates
+    ]
+
+
+def horizon_call(client, days):
+    response = client.post(
+        "/predict/horizon", json={"start": START.isoformat(), "days": days}
+    )
+    return [day["prediction"] for day in response.json()["predictions"]]
+
+
+def timed(func, *args, repeat=20):
+    func(*args)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, np.median(timings)
+
+
+def main():
+    dates = [
+        (START + timedelta(days=i)).isoformat() for i in range(HORIZON_DAYS)
+    ]
+    with TestClient(app) as client:
+        single, single_time = timed(single_day_calls, client, dates, repeat=5)
+        horizon, horizon_time = timed(horizon_call, client, HORIZON_DAYS)
+
+    print(f"{HORIZON_DAYS} days from {START}")
+    print(f"{HORIZON_DAYS} x /predict      {single_time * 1e3:9.2f} ms")
+    print(f"1 x /predict/horizon {horizon_time * 1e3:9.2f} ms")
+    print(f"Speedup              {single_time / horizon_time:9.1f}x")
+    print(f"Identical predictions: {np.array_equal(single, horizon)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import time
+
+import joblib
+import numpy as np
+
+from triage_trend.compiled_model import (
+    COMPILED_MODEL_DIR,
+    PICKLE_MODEL_PATH,
+    ArrayPipelineModel,
+    PipelineModel,
+    load_compiled_model,
+)
+from triage_trend.data_service.get_data import get_data_batch
+from triage_trend.data_service.weather_forecast import get_weather_forecast
+
+
+def latencies(predict, features, number):
+    predict(features)  # warm up
+    timings = np.empty(number)
+    for i in range(number):
+        start = time.perf_counter()
+        predict(features)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def report(name, timings):
+    p50, p99 = np.percentile(timings, [50, 99]) * 1e3
+    print(f"{name:<35} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+
+
+def main(number=2000):
+    pipeline = joblib.load(PICKLE_MODEL_PATH)
+    models = {
+        "pipeline (DataFrame)": PipelineModel(pipeline),
+        "array (sklearn on numpy)": ArrayPipelineModel(pipeline),
+        "compiled": load_compiled_model(COMPILED_MODEL_DIR),
+    }
+
+    features = get_data_batch(sorted(get_weather_forecast()))
+    reference = models["pipeline (DataFrame)"].predict_features(features)
+    for name, model in models.items():
+        identical = np.array_equal(model.predict_features(features), reference)
+        print(f"{name:<35} identical to pipeline: {identical}")
+
+    for batch in (features[:1], features):
+        print(f"\n{len(batch)} day(s) per call, {number} calls")
+        for name, model in models.items():
+            report(name, latencies(model.predict_features, batch, number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+import timeit
+
+import joblib
+import numpy as np
+
+from triage_trend.compiled_model import (
+    COMPILED_MODEL_DIR,
+    PICKLE_MODEL_PATH,
+    PipelineModel,
+    export_pipeline,
+    load_compiled_model,
+)
+from triage_trend.data_service.get_data import get_data_batch
+from triage_trend.data_service.weather_forecast import get_weather_forecast
+
+# Each cold start runs in a fresh interpreter, so imports count as well
+PICKLE_COLD_START = f"""
+import joblib, pandas
+joblib.load({PICKLE_MODEL_PATH!r})
+"""
+COMPILED_COLD_START = f"""
+from triage_trend.compiled_model import load_compiled_model
+load_compiled_model({COMPILED_MODEL_DIR!r})
+"""
+
+
+def cold_start(code, repeat=5):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    timings = []
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        subprocess.run([sys.executable, "-c", code], check=True, env=env)
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def report(name, seconds, count=1, unit="call"):
+    print(f"{name:<40} {seconds / count * 1e3:10.3f} ms/{unit}")
+
+
+def main():
+    pipeline = PipelineModel(joblib.load(PICKLE_MODEL_PATH))
+    if not os.path.exists(COMPILED_MODEL_DIR):
+        export_pipeline(pipeline.pipeline, COMPILED_MODEL_DIR)
+    compiled = load_compiled_model(COMPILED_MODEL_DIR)
+
+    report("pickle cold start", cold_start(PICKLE_COLD_START))
+    report("compiled cold start", cold_start(COMPILED_COLD_START))
+
+    features_list = get_data_batch(sorted(get_weather_forecast()))
+    features = features_list[:1]
+    for name, model in [("pickle", pipeline), ("compiled", compiled)]:
+        number = 200
+        report(
+            f"{name} single prediction",
+            timeit.timeit(
+                lambda: model.predict_features(features), number=number
+            ),
+            number,
+        )
+        report(
+            f"{name}, {len(features_list)} predictions",
+            timeit.timeit(
+                lambda: model.predict_features(features_list), number=number
+            ),
+            number * len(features_list),
+            "day",
+        )
+
+    identical = np.array_equal(
+        pipeline.predict_features(features_list),
+        compiled.predict_features(features_list),
+    )
+    print(f"predictions identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from triage_trend.data_service.rolling_weather import WEATHER_COLUMNS
+from triage_trend.load_data import (
+    add_holiday_and_weather_features,
+    vacation_transition_features,
+)
+
+NUM_CANTONS = 26
+VACATIONS_PER_YEAR = 5
+
+
+# Implementation before the shared rolling window and the vectorized
+# transitions, kept here as the baseline of the benchmark
+def legacy_transition_features(df, cantons):
+    for canton in cantons:
+        holiday_col = f"IsVacation{canton}"
+        df[f"{canton}_Week_After_Holiday"] = (
+            (df[holiday_col] == 0) & (df[holiday_col].shift(7) == 1)
+        ).astype(int)
+        df[f"{canton}_First_Week_of_Holiday"] = (
+            (df[holiday_col] == 1) & (df[holiday_col].shift(7) == 0)
+        ).astype(int)
+    return df
+
+
+def legacy_add_holiday_and_weather_features(df, cantons):
+    df = legacy_transition_features(df, cantons)
+    df.set_index("Datum", inplace=True)
+    df_rolling_means = df[WEATHER_COLUMNS].rolling(window=5).mean().shift(1)
+    df = df.join(df_rolling_means, rsuffix="_5day_mean")
+    df.reset_index(inplace=True)
+    return df
+
+
+def synthetic_frame(years, num_cantons=NUM_CANTONS, seed=0):
+    """Daily frame with random weather and vacations of 1-5 weeks."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("1975-01-01", periods=int(years * 365.25), freq="D")
+    df = pd.DataFrame({"Datum": dates})
+    for column in WEATHER_COLUMNS:
+        df[column] = rng.normal(size=len(df))
+
+    cantons = [f"Canton{i:02d}" for i in range(num_cantons)]
+    for canton in cantons:
+        flags = np.zeros(len(df), dtype=np.int64)
+        for start in rng.integers(0, len(df), VACATIONS_PER_YEAR * years):
+            flags[start : start + 7 * rng.integers(1, 6)] = 1
+        df[f"IsVacation{canton}"] = flags
+    return df, cantons
+
+
+def vectorized_transition_features(df):
+    features = vacation_transition_features(df)
+    return pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
+
+
+def best_of(func, df, *args, repeat):
+    timings = []
+    for _ in range(repeat):
+        # Both versions add columns, so each run gets a fresh frame
+        frame = df.copy()
+        start = timeit.default_timer()
+        func(frame, *args)
+        timings.append(timeit.default_timer() - start)
+    return min(timings)
+
+
+def main(repeat=5):
+    for years in (5, 50):
+        df, cantons = synthetic_frame(years)
+        print(f"{years} years, {len(df)} days, {len(cantons)} cantons")
+        # legacy marks "differs from 7 days ago", vectorized the true first
+        # and after weeks of each vacation run
+        for name, legacy, vectorized in [
+            (
+                "transition features",
+                best_of(legacy_transition_features, df, cantons, repeat=repeat),
+                best_of(vectorized_transition_features, df, repeat=repeat),
+            ),
+            (
+                "add_holiday_and_weather_features",
+                best_of(
+                    legacy_add_holiday_and_weather_features,
+                    df,
+                    cantons,
+                    repeat=repeat,
+                ),
+                best_of(add_holiday_and_weather_features, df, repeat=repeat),
+            ),
+        ]:
+            print(
+                f"  {name:<34} legacy {legacy * 1e3:8.2f} ms   "
+                f"vectorized {vectorized * 1e3:8.2f} ms   "
+                f"{legacy / vectorized:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import timeit
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from triage_trend.data_service.vacations import (
+    VACATION_PERIODS,
+    get_vacation_data,
+    get_vacation_flags,
+)
+
+
+# Previous implementation, kept here as the baseline of the benchmark
+def legacy_is_date_in_range(date_str, start_str, end_str):
+    date = datetime.strptime(date_str, "%Y-%m-%d")
+    start = datetime.strptime(start_str, "%d.%m")
+    end = datetime.strptime(end_str, "%d.%m")
+    start = start.replace(year=date.year)
+    end = end.replace(year=date.year)
+    return start <= date <= end
+
+
+def legacy_get_vacation_data(date_str):
+    vacations = {}
+    for canton, periods in VACATION_PERIODS.items():
+        in_vacation = any(
+            legacy_is_date_in_range(date_str, start, end)
+            for start, end in periods
+        )
+        first_week_of_holiday = any(
+            legacy_is_date_in_range(
+                date_str,
+                start,
+                (
+                    datetime.strptime(start, "%d.%m") + timedelta(days=7)
+                ).strftime("%d.%m"),
+            )
+            for start, end in periods
+        )
+        week_after_holiday = any(
+            legacy_is_date_in_range(
+                date_str,
+                (datetime.strptime(end, "%d.%m") + timedelta(days=1)).strftime(
+                    "%d.%m"
+                ),
+                (datetime.strptime(end, "%d.%m") + timedelta(days=7)).strftime(
+                    "%d.%m"
+                ),
+            )
+            for start, end in periods
+        )
+        canton_key = canton.replace(" ", "_")
+        vacations[f"IsVacation{canton_key}"] = int(in_vacation)
+        vacations[f"{canton_key}_First_Week_of_Holiday"] = int(
+            first_week_of_holiday
+        )
+        vacations[f"{canton_key}_Week_After_Holiday"] = int(week_after_holiday)
+    return vacations
+
+
+def report(name, seconds, count, unit="call"):
+    print(f"{name:<40} {seconds / count * 1e6:10.2f} us/{unit}")
+
+
+def main():
+    date_str = "2024-08-24"
+    number = 2000
+    get_vacation_data(date_str)  # compile the calendar outside the timing
+
+    report(
+        "legacy get_vacation_data",
+        timeit.timeit(
+            lambda: legacy_get_vacation_data(date_str), number=number
+        ),
+        number,
+    )
+    report(
+        "compiled get_vacation_data",
+        timeit.timeit(lambda: get_vacation_data(date_str), number=number),
+        number,
+    )
+
+    start = date(2019, 1, 1)
+    days = [start + timedelta(days=i) for i in range(7 * 365)]
+    date_strs = [d.isoformat() for d in days]
+    ordinals = np.array([d.toordinal() for d in days])
+
+    report(
+        f"legacy, {len(days)} days",
+        timeit.timeit(
+            lambda: [legacy_get_vacation_data(d) for d in date_strs], number=1
+        ),
+        len(days),
+        "day",
+    )
+    report(
+        f"vectorized get_vacation_flags, {len(days)} days",
+        timeit.timeit(lambda: get_vacation_flags(ordinals), number=20),
+        20 * len(days),
+        "day",
+    )
+
+
+if __name__ == "__main__":
+    main()
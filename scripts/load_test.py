@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from triage_trend.data_service.weather_forecast import get_weather_forecast
+
+
+async def wait_until_ready(client, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get(f"{url}/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Service at {url} did not start")
+
+
+async def run_load(url, concurrency, requests, range_share):
+    dates = sorted(get_weather_forecast())
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            if random.random() < range_share:
+                path = "/predict/range"
+                body = {"start": dates[0], "end": dates[-1]}
+            else:
+                path = "/predict"
+                body = {"date": random.choice(dates)}
+            start = time.perf_counter()
+            response = await client.post(f"{url}{path}", json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await wait_until_ready(client, url)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+    print(
+        f"concurrency {concurrency:4d}: {requests / elapsed:8.1f} req/s, "
+        f"p50 {p50:7.2f} ms, p95 {p95:7.2f} ms, p99 {p99:7.2f} ms, "
+        f"{errors} errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the prediction service under concurrency"
+    )
+    parser.add_argument(
+        "--url", help="Running service, by default one is started locally"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 128]
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--range-share",
+        type=float,
+        default=0.1,
+        help="Share of /predict/range requests among all requests",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep the prediction cache of the started service enabled",
+    )
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url = "http://127.0.0.1:8765"
+        env = dict(os.environ, PYTHONPATH=os.getcwd())
+        if not args.cache:
+            # Measure feature assembly and scoring, not cache lookups
+            env["PREDICTION_CACHE_SIZE"] = "0"
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "triage_trend.main:app",
+                "--port",
+                "8765",
+                "--log-level",
+                "warning",
+            ],
+            env=env,
+        )
+    try:
+        for concurrency in args.concurrency:
+            asyncio.run(
+                run_load(url, concurrency, args.requests, args.range_share)
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
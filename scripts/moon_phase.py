@@ -1,35 +1,21 @@
-from datetime import datetime
+from datetime import date
 
-import ephem
 import pandas as pd
 
+from triage_trend.data_service.moon_phase import get_moon_phases
+
 # Define the start and end dates
-start_date = datetime(2019, 1, 1)
-end_date = datetime(2023, 12, 31)
+start_date = date(2019, 1, 1)
+end_date = date(2023, 12, 31)
 
-# Create a list of dates between the start and end dates
+# Compute all phases in one call, served from the on-disk ephemeris cache
 date_range = pd.date_range(start_date, end_date)
-
-# Initialize lists to store the data
-dates = []
-moon_phases = []
-
-# Loop through each date and calculate the moon phase
-for single_date in date_range:
-    # Create an observer at a location in Switzerland (Bern)
-    observer = ephem.Observer()
-    observer.lat, observer.lon = "46.948", "7.4474"  # Bern, Switzerland
-    observer.date = single_date
-
-    # Calculate the moon phase
-    moon = ephem.Moon(observer)
-    phase = moon.phase  # Moon phase as a percentage
-
-    dates.append(single_date)
-    moon_phases.append(phase)
+moon_phases = get_moon_phases(date_range.to_numpy())
 
 # Create a DataFrame with the results
-moon_calendar_df = pd.DataFrame({"Date": dates, "Moon Phase (%)": moon_phases})
+moon_calendar_df = pd.DataFrame(
+    {"Date": date_range, "Moon Phase (%)": moon_phases}
+)
 
 # Save the DataFrame to a CSV file
 moon_calendar_df.to_csv("moon_calendar_switzerland_2019_2023.csv", index=False)
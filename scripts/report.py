@@ -0,0 +1,3 @@
+from triage_trend.report import main
+
+main()
@@ -0,0 +1,3 @@
+from triage_trend.retrain import main
+
+main()
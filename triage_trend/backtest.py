@@ -0,0 +1,371 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+
+from triage_trend.load_data import load_data
+from triage_trend.sites import get_site, get_sites
+from triage_trend.train import (
+    create_pipeline,
+    missing_value_fills,
+    preprocess_data,
+)
+
+# Fold predictions are cached in this directory of the site's cache_dir
+BACKTEST_CACHE_DIR = "backtest"
+REPORT_DIR = "reports"
+REPORT_PATH = os.path.join(REPORT_DIR, "backtest.md")
+
+# Days of history before the first forecast origin
+MIN_TRAIN_DAYS = 365
+# Months between forecast origins, each fold predicts the following months
+STEP_MONTHS = 1
+
+# Model name -> factory of a pipeline with "preprocessor" and a regressor,
+# called with the feature schema of the site
+BACKTEST_MODELS = {
+    "gradient_boosting": create_pipeline,
+}
+
+
+def make_folds(dates, min_train_days=MIN_TRAIN_DAYS, step_months=STEP_MONTHS):
+    """Expanding-window folds with origins on the first day of a month.
+
+    Each fold trains on all days before its origin and tests on the
+    following step_months months.
+    """
+    dates = pd.DatetimeIndex(dates)
+    first_origin = (dates.min() + pd.Timedelta(days=min_train_days)).to_period(
+        "M"
+    )
+    folds = []
+    origin = first_origin.to_timestamp()
+    while origin <= dates.max():
+        end = origin + pd.DateOffset(months=step_months)
+        train = np.flatnonzero(dates < origin)
+        test = np.flatnonzero((dates >= origin) & (dates < end))
+        if len(train) and len(test):
+            folds.append(
+                {
+                    "origin": origin.strftime("%Y-%m-%d"),
+                    "train": train,
+                    "test": test,
+                }
+            )
+        origin = end
+    return folds
+
+
+def hash_rows(X, y, indices):
+    digest = hashlib.sha256()
+    digest.update(
+        pd.util.hash_pandas_object(X.iloc[indices], index=False).to_numpy()
+    )
+    digest.update(np.asarray(y.iloc[indices], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def model_signature(model_name, schema):
+    """Hash of the model definition, so changed parameters re-score."""
+    pipeline = BACKTEST_MODELS[model_name](schema=schema)
+    params = pipeline.get_params(deep=True)
+    encoded = json.dumps(
+        {name: repr(value) for name, value in params.items()}, sort_keys=True
+    )
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def fold_key(model_name, signature, train_hash, test_hash):
+    encoded = f"{model_name}|{signature}|{train_hash}|{test_hash}"
+    return hashlib.sha256(encoded.encode()).hexdigest()[:24]
+
+
+_worker_data = {}
+
+
+def init_worker(X, y, schema):
+    _worker_data["X"] = X
+    _worker_data["y"] = y
+    _worker_data["schema"] = schema
+
+
+def run_fold(fold, models, cache_dir):
+    """Score the uncached models of one fold.
+
+    Missing values are filled with the means and modes of the training
+    rows only, so no test day leaks into the fit. The preprocessing of a
+    fold is fitted once and shared by all its models, they only differ in
+    the regressor.
+    """
+    X = _worker_data["X"]
+    y = _worker_data["y"]
+    schema = _worker_data["schema"]
+    fill_values = missing_value_fills(
+        X.iloc[fold["train"]].assign(Date_Occurrences=y.iloc[fold["train"]]),
+        schema,
+    )
+    X_train = X.iloc[fold["train"]].fillna(fill_values)
+    X_test = X.iloc[fold["test"]].fillna(fill_values)
+    transformed = {}
+    results = []
+    for model_name, key in models:
+        pipeline = BACKTEST_MODELS[model_name](schema=schema)
+        preprocessor = pipeline.named_steps["preprocessor"]
+        regressor = clone(pipeline.steps[-1][1])
+        preprocessor_key = repr(preprocessor.get_params(deep=False))
+
+        start = time.perf_counter()
+        if preprocessor_key not in transformed:
+            preprocessor.fit(X_train)
+            transformed[preprocessor_key] = (
+                preprocessor.transform(X_train),
+                preprocessor.transform(X_test),
+            )
+        train_matrix, test_matrix = transformed[preprocessor_key]
+        regressor.fit(train_matrix, y.iloc[fold["train"]])
+        fit_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predictions = regressor.predict(test_matrix)
+        predict_time = time.perf_counter() - start
+
+        # Renamed into place so an interrupted run leaves no partial file
+        tmp_path = os.path.join(cache_dir, f"{key}.tmp.npz")
+        np.savez(
+            tmp_path,
+            predictions=predictions,
+            times=np.array([fit_time, predict_time]),
+        )
+        os.replace(tmp_path, os.path.join(cache_dir, f"{key}.npz"))
+        results.append((model_name, predictions, fit_time, predict_time))
+    return results
+
+
+def read_cached(cache_dir, key):
+    try:
+        with np.load(os.path.join(cache_dir, f"{key}.npz")) as data:
+            fit_time, predict_time = data["times"]
+            return data["predictions"], float(fit_time), float(predict_time)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def backtest(
+    model_names=None,
+    min_train_days=MIN_TRAIN_DAYS,
+    step_months=STEP_MONTHS,
+    max_workers=None,
+    cache_dir=None,
+    site=None,
+):
+    """Rolling-origin backtest of a site, one record per model and fold.
+
+    Fold predictions are cached by model definition and the exact training
+    and test rows, so a new model or a new month only scores what changed.
+    """
+    site = get_site(site)
+    if model_names is None:
+        model_names = list(BACKTEST_MODELS)
+    if cache_dir is None:
+        cache_dir = os.path.join(site.cache_dir, BACKTEST_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    df = load_data(site=site)
+    dates = df["Datum"].to_numpy()
+    # Gaps are filled per fold, see run_fold
+    X, y, _ = preprocess_data(df, fill_values={}, schema=site.schema)
+    folds = make_folds(dates, min_train_days, step_months)
+    signatures = {
+        name: model_signature(name, site.schema) for name in model_names
+    }
+
+    records = {}
+    pending = []
+    for i, fold in enumerate(folds):
+        train_hash = hash_rows(X, y, fold["train"])
+        test_hash = hash_rows(X, y, fold["test"])
+        missing = []
+        for model_name in model_names:
+            key = fold_key(
+                model_name, signatures[model_name], train_hash, test_hash
+            )
+            cached = read_cached(cache_dir, key)
+            if cached is None:
+                missing.append((model_name, key))
+            else:
+                records[i, model_name] = (*cached, True)
+        if missing:
+            pending.append((i, fold, missing))
+
+    if pending:
+        print(f"Scoring {len(pending)} of {len(folds)} folds")
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=init_worker,
+            initargs=(X, y, site.schema),
+        ) as executor:
+            futures = {
+                i: executor.submit(run_fold, fold, missing, cache_dir)
+                for i, fold, missing in pending
+            }
+            for i, future in futures.items():
+                for model_name, *record in future.result():
+                    records[i, model_name] = (*record, False)
+
+    results = []
+    for i, fold in enumerate(folds):
+        y_test = y.iloc[fold["test"]].to_numpy()
+        for model_name in model_names:
+            predictions, fit_time, predict_time, cached = records[i, model_name]
+            results.append(
+                {
+                    "model": model_name,
+                    "origin": fold["origin"],
+                    "train_days": len(fold["train"]),
+                    "test_days": len(fold["test"]),
+                    "mae": float(mean_absolute_error(y_test, predictions)),
+                    "rmse": float(
+                        np.sqrt(mean_squared_error(y_test, predictions))
+                    ),
+                    "bias": float(np.mean(predictions - y_test)),
+                    "fit_time": fit_time,
+                    "predict_time": predict_time,
+                    "cached": cached,
+                }
+            )
+    return results
+
+
+def summarize(results):
+    summary = {}
+    for model_name in dict.fromkeys(record["model"] for record in results):
+        records = [r for r in results if r["model"] == model_name]
+        test_days = np.array([r["test_days"] for r in records])
+        summary[model_name] = {
+            "folds": len(records),
+            # Weighted by test days, so this is the MAE over all test days
+            "mae": float(
+                np.average([r["mae"] for r in records], weights=test_days)
+            ),
+            "rmse": float(
+                np.sqrt(
+                    np.average(
+                        [r["rmse"] ** 2 for r in records], weights=test_days
+                    )
+                )
+            ),
+            "fit_time": float(sum(r["fit_time"] for r in records)),
+        }
+    return summary
+
+
+def write_report(results, path=REPORT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    summary = summarize(results)
+    with open(os.path.splitext(path)[0] + ".json", "w") as f:
+        json.dump({"summary": summary, "folds": results}, f, indent=2)
+
+    lines = [
+        "# Rolling-origin backtest",
+        "",
+        "| Model | Folds | MAE | RMSE | Total fit time (s) |",
+        "| --- | ---: | ---: | ---: | ---: |",
+    ]
+    for model_name, row in summary.items():
+        lines.append(
+            f"| {model_name} | {row['folds']} | {row['mae']:.2f} "
+            f"| {row['rmse']:.2f} | {row['fit_time']:.2f} |"
+        )
+    lines += [
+        "",
+        "| Model | Origin | Train days | Test days | MAE | RMSE | Bias "
+        "| Fit (s) | Predict (s) | Cached |",
+        "| --- | --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | --- |",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['model']} | {r['origin']} | {r['train_days']} "
+            f"| {r['test_days']} | {r['mae']:.2f} | {r['rmse']:.2f} "
+            f"| {r['bias']:.2f} | {r['fit_time']:.3f} "
+            f"| {r['predict_time']:.4f} | {'yes' if r['cached'] else 'no'} |"
+        )
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return summary
+
+
+def report_path(site):
+    """Backtest report of a site, the default site keeps REPORT_PATH."""
+    if site.name == get_sites()[1]:
+        return REPORT_PATH
+    return os.path.join(REPORT_DIR, f"backtest_{site.name}.md")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest")
+    parser.add_argument(
+        "--site", action="append", help="Site to backtest, repeatable"
+    )
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    sites = [get_site(name) for name in args.site or [None]]
+    check_arguments(parser, args, sites)
+    run(args, sites)
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=list(BACKTEST_MODELS),
+        help="Models to backtest, all by default",
+    )
+    parser.add_argument("--min-train-days", type=int, default=MIN_TRAIN_DAYS)
+    parser.add_argument("--step-months", type=int, default=STEP_MONTHS)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument(
+        "--backtest-report",
+        help=f"Report path of a single site (default: {REPORT_PATH}, "
+        "reports/backtest_<site>.md for other sites)",
+    )
+
+
+def check_arguments(parser, args, sites):
+    if args.backtest_report and len(sites) > 1:
+        parser.error("--backtest-report can only be used with a single site")
+
+
+def run(args, sites):
+    for site in sites:
+        start = time.perf_counter()
+        path = args.backtest_report or report_path(site)
+        results = backtest(
+            args.models,
+            args.min_train_days,
+            args.step_months,
+            args.workers,
+            site=site,
+        )
+        summary = write_report(results, path)
+        for model_name, row in summary.items():
+            print(
+                f"{site.name} {model_name}: {row['folds']} folds, "
+                f"MAE = {row['mae']:.2f}, RMSE = {row['rmse']:.2f}"
+            )
+        print(
+            f"Backtest took {time.perf_counter() - start:.1f}s, report "
+            f"written to {path}"
+        )
+
+
+if __name__ == "__main__":
+    main()
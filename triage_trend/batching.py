@@ -0,0 +1,97 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from triage_trend.metrics import METRICS_ENABLED, batch_sizes
+
+# Threads running feature assembly and scoring off the event loop
+PREDICTION_WORKERS = int(os.environ.get("PREDICTION_WORKERS", 4))
+# Time concurrent requests are collected into one model call. With 0 only
+# requests arriving in the same event loop iteration are coalesced, which
+# adds no latency and still batches under load.
+BATCH_WINDOW_MS = float(os.environ.get("PREDICTION_BATCH_WINDOW_MS", 0))
+BATCH_MAX_ITEMS = int(os.environ.get("PREDICTION_BATCH_MAX_ITEMS", 512))
+
+
+class MicroBatcher:
+    """Coalesce concurrent calls of a list function into one pool call.
+
+    func maps a list of items to a list of results of the same length. Items
+    submitted within `window` seconds are passed to a single func call on
+    the executor, so the event loop never runs it. If the combined call
+    fails, every submission is retried alone so one bad request cannot fail
+    the others.
+    """
+
+    def __init__(self, func, executor, window, max_items=BATCH_MAX_ITEMS):
+        self.func = func
+        self.executor = executor
+        self.window = window
+        self.max_items = max_items
+        self.batch_sizes = (
+            batch_sizes.get(func.__name__) if METRICS_ENABLED else None
+        )
+        self.pending = []
+        self.pending_items = 0
+        self.timer = None
+        # The loop only keeps weak references to tasks
+        self.tasks = set()
+
+    async def submit(self, items):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((list(items), future))
+        self.pending_items += len(items)
+        if self.pending_items >= self.max_items:
+            self.flush()
+        elif self.timer is None:
+            if self.window > 0:
+                self.timer = loop.call_later(self.window, self.flush)
+            else:
+                self.timer = loop.call_soon(self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch = self.pending
+        self.pending = []
+        self.pending_items = 0
+        if batch:
+            task = asyncio.ensure_future(self.run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for batch_items, _ in batch for item in batch_items]
+        if self.batch_sizes is not None:
+            self.batch_sizes.observe(len(items))
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.func, items
+            )
+        except Exception as error:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(error)
+                return
+            await asyncio.gather(
+                *(self.run([submission]) for submission in batch)
+            )
+            return
+
+        start = 0
+        for batch_items, future in batch:
+            end = start + len(batch_items)
+            if not future.done():
+                future.set_result(results[start:end])
+            start = end
+
+
+def create_batcher(func):
+    executor = ThreadPoolExecutor(
+        max_workers=PREDICTION_WORKERS, thread_name_prefix="predict"
+    )
+    return MicroBatcher(func, executor, BATCH_WINDOW_MS / 1000)
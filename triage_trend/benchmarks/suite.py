@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+from triage_trend.benchmarks.synthetic import (
+    site_name,
+    synthetic_dates,
+    write_sites,
+)
+
+BENCHMARK_DIR = "data/cache/benchmark"
+RESULTS_DIR = "reports/benchmarks"
+SCALES = (1, 10, 100)
+# Changes beyond this share are reported as regressions or improvements
+THRESHOLD = 0.1
+
+
+def timed(func, repeat):
+    """Best and median wall time of repeated calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"min": min(timings), "median": float(np.median(timings))}
+
+
+def latency_summary(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+async def measure_throughput(app, site_names, dates, requests, concurrency):
+    """Requests per second of /predict through an in-process ASGI client."""
+    import httpx
+
+    bodies = iter(
+        [
+            {
+                "date": dates[i % len(dates)],
+                "site": site_names[i % len(site_names)],
+            }
+            for i in range(requests)
+        ]
+    )
+    latencies = []
+
+    async def worker(client):
+        for body in bodies:
+            start = time.perf_counter()
+            response = await client.post("/predict", json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {
+        "requests_per_second": requests / elapsed,
+        **latency_summary(latencies),
+    }
+
+
+def benchmark_serving(sites, args):
+    # Imported here, the service reads the sites config at import
+    from triage_trend import main
+
+    rng = np.random.default_rng(0)
+    dates = synthetic_dates().strftime("%Y-%m-%d").tolist()
+    site = sites[0].name
+    # Load the model and the feature stores of the site before timing
+    main.predict([(site, dates[0])])
+
+    latencies = []
+    for date_str in rng.choice(dates, args.single_calls):
+        start = time.perf_counter()
+        main.predict([(site, date_str)])
+        latencies.append(time.perf_counter() - start)
+
+    batch = [(site, date_str) for date_str in dates[:366]]
+    shuffled = rng.permutation(dates).tolist()
+    return {
+        "single_prediction": latency_summary(latencies),
+        "batch_prediction_366_days_seconds": timed(
+            lambda: main.predict(batch), args.repeat
+        ),
+        # Requests go round-robin over the sites, beyond MAX_RESIDENT_SITES
+        # this includes reloading evicted models
+        "throughput": asyncio.run(
+            measure_throughput(
+                main.app,
+                [site.name for site in sites],
+                shuffled,
+                args.requests,
+                args.concurrency,
+            )
+        ),
+    }
+
+
+def benchmark_scale(scale, args):
+    from triage_trend.load_data import load_sites_data
+    from triage_trend.sites import get_site
+    from triage_trend.train import train_sites
+
+    sites = [get_site(site_name(i)) for i in range(scale)]
+    results = {"sites": scale}
+    results["dataset_build_seconds"] = timed(
+        lambda: load_sites_data(sites, use_cache=False), args.repeat
+    )
+    results["dataset_rows"] = len(load_sites_data(sites))
+    results["dataset_cached_load_seconds"] = timed(
+        lambda: load_sites_data(sites), args.repeat
+    )
+    results["training_seconds"] = timed(
+        lambda: train_sites(sites, args.workers), 1
+    )
+    results.update(benchmark_serving(sites, args))
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = (
+            subprocess.run(["git", "diff", "--quiet", "HEAD"]).returncode != 0
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(previous, current, threshold=THRESHOLD):
+    """Print the relative change of every metric found in both results."""
+    before = flatten(previous["scales"])
+    after = flatten(current["scales"])
+    print(f"Compared to {previous['commit'][:12]}:")
+    for name in sorted(before.keys() & after.keys()):
+        if not before[name]:
+            continue
+        change = after[name] / before[name] - 1
+        # Only throughput is better when higher
+        if "per_second" in name:
+            change = -change
+        flag = ""
+        if change > threshold:
+            flag = "  slower"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"  {name:<60} {after[name]:12.4f} {change:+7.1%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark data loading, training and serving"
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=list(SCALES),
+        help="Numbers of synthetic sites, 1, 10 or 100 for 1x to 100x",
+    )
+    parser.add_argument("--workdir", default=BENCHMARK_DIR)
+    parser.add_argument(
+        "--output", help="Results file, reports/benchmarks/<commit>.json"
+    )
+    parser.add_argument(
+        "--compare", help="Earlier results file to compare the run with"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--single-calls", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Training processes"
+    )
+    args = parser.parse_args(argv)
+
+    config_path = write_sites(
+        os.path.join(args.workdir, "data"), max(args.scales)
+    )
+    # Set before the service modules are imported, they read them once
+    os.environ["SITES_CONFIG"] = config_path
+    os.environ["FORECAST_CACHE_PATH"] = os.path.join(
+        args.workdir, "forecast.json"
+    )
+    # Every prediction is scored, not read from the cache
+    os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+    from triage_trend.sites import MAX_RESIDENT_SITES
+
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "max_resident_sites": MAX_RESIDENT_SITES,
+        "scales": {},
+    }
+    for scale in sorted(args.scales):
+        start = time.perf_counter()
+        results["scales"][f"{scale}x"] = benchmark_scale(scale, args)
+        print(f"{scale}x done in {time.perf_counter() - start:.1f}s")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit[:12]}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
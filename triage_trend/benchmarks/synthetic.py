@@ -0,0 +1,129 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from triage_trend.data_service.public_holidays import HOLIDAY_COLUMNS
+from triage_trend.data_service.rolling_weather import WEATHER_COLUMNS
+from triage_trend.data_service.vacations import (
+    VACATION_PERIODS,
+    get_vacation_flags,
+)
+
+# Same span as the real data, a scale multiplies the number of sites
+FIRST_DATE = "2019-01-01"
+LAST_DATE = "2023-12-31"
+# Mean admissions per day and relative level by weekday, Monday first
+ADMISSIONS_PER_DAY = 10.1
+WEEKDAY_LEVELS = np.array([1.25, 1.15, 1.1, 1.05, 1.0, 0.7, 0.75])
+
+
+def site_name(index):
+    return f"bench_{index:03d}"
+
+
+def synthetic_dates():
+    return pd.date_range(FIRST_DATE, LAST_DATE, freq="D")
+
+
+def weather_frame(dates, rng):
+    """Daily weather like data/weather_features.csv, with a seasonal cycle."""
+    season = np.cos(2 * np.pi * (dates.dayofyear.to_numpy() - 200) / 365.25)
+    temperature = 10 + 9 * season + rng.normal(0, 3, len(dates))
+    radiation = np.clip(
+        150 + 110 * season + rng.normal(0, 50, len(dates)), 5, None
+    )
+    rain = rng.exponential(120, len(dates)) * (rng.random(len(dates)) < 0.45)
+    columns = {
+        "Average_Temperature": temperature,
+        "Max_Temperature": temperature + rng.uniform(2, 7, len(dates)),
+        "Total_Rain_Duration": np.clip(rain, 0, 1440),
+        "Average_Pressure": rng.normal(970, 7, len(dates)),
+        "Average_Global_Radiation": radiation,
+        "Cloudiness": np.clip(1 - radiation / 1000, 0, 1),
+    }
+    df = pd.DataFrame({"Datum": dates.strftime("%Y-%m-%d")})
+    for column in WEATHER_COLUMNS:
+        df[column] = columns[column]
+    return df
+
+
+def vacations_frame(dates, cantons):
+    """School vacation flags like data/vacations.csv, from the real rules."""
+    flags = get_vacation_flags(dates.to_numpy())
+    df = pd.DataFrame({"Date": dates.strftime("%Y-%m-%d")})
+    for canton in cantons:
+        df[f"IsVacation{canton}"] = flags[f"IsVacation{canton}"]
+    return df
+
+
+def admissions_frame(dates, rng, level=1.0):
+    """One row per admission like data/clienia_dataset.csv."""
+    season = 1 + 0.1 * np.sin(2 * np.pi * dates.dayofyear.to_numpy() / 365.25)
+    means = ADMISSIONS_PER_DAY * level * season * WEEKDAY_LEVELS[dates.weekday]
+    counts = rng.poisson(means)
+    admission_dates = np.repeat(dates.strftime("%m/%d/%y"), counts)
+    return pd.DataFrame(
+        {
+            "Fall_ID": np.arange(len(admission_dates)),
+            "Fall_Eintritt_Datum": admission_dates,
+        }
+    )
+
+
+def site_config(index, data_dir, rng):
+    """Config entry of a synthetic site with random canton sets."""
+    name = site_name(index)
+    site_dir = os.path.join(data_dir, name)
+    vacation_cantons = sorted(
+        rng.choice(
+            list(VACATION_PERIODS), size=rng.integers(2, 7), replace=False
+        ).tolist()
+    )
+    holiday_cantons = sorted(
+        rng.choice(
+            list(HOLIDAY_COLUMNS), size=rng.integers(1, 8), replace=False
+        ).tolist()
+    )
+    return {
+        "vacation_cantons": vacation_cantons,
+        "holiday_cantons": holiday_cantons,
+        "weather": os.path.join(site_dir, "weather_features.csv"),
+        "vacations": os.path.join(site_dir, "vacations.csv"),
+        "admissions": os.path.join(site_dir, "admissions.csv"),
+        "model_dir": os.path.join(site_dir, "model"),
+        "cache_dir": os.path.join(site_dir, "cache"),
+        "plots_dir": os.path.join(site_dir, "plots"),
+    }
+
+
+def write_sites(data_dir, num_sites, seed=0):
+    """Write the data files and the sites config of num_sites sites.
+
+    Sites are generated from their own seeds, so the first sites of a
+    larger scale are the same as those of a smaller one. Existing files are
+    kept, which keeps their dataset caches valid between runs.
+    """
+    dates = synthetic_dates()
+    sites = {}
+    for index in range(num_sites):
+        rng = np.random.default_rng([seed, index])
+        config = site_config(index, data_dir, rng)
+        sites[site_name(index)] = config
+        if os.path.exists(config["admissions"]):
+            continue
+        os.makedirs(os.path.dirname(config["admissions"]), exist_ok=True)
+        weather_frame(dates, rng).to_csv(config["weather"], index=False)
+        vacations_frame(dates, config["vacation_cantons"]).to_csv(
+            config["vacations"], index=False
+        )
+        # Written last, it marks the site as complete
+        admissions_frame(dates, rng, rng.uniform(0.5, 2)).to_csv(
+            config["admissions"], index=False
+        )
+
+    path = os.path.join(data_dir, "sites.json")
+    with open(path, "w") as f:
+        json.dump({"default": site_name(0), "sites": sites}, f, indent=2)
+    return path
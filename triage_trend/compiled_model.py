@@ -0,0 +1,267 @@
+import json
+import os
+
+import numpy as np
+
+PICKLE_MODEL_PATH = "./model/gb_model.pkl"
+COMPILED_MODEL_DIR = "./model/gb_model"
+INFERENCE_MODES = ("compiled", "array", "pipeline")
+INFERENCE_MODE = os.environ.get("MODEL_INFERENCE_MODE", "compiled")
+META_FILE = "meta.json"
+# Quantile-loss models trained next to the point model for the intervals
+QUANTILES = (0.1, 0.9)
+ARRAY_NAMES = [
+    "scaler_mean",
+    "scaler_scale",
+    "categories",
+    "roots",
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "value",
+]
+
+
+def quantile_model_paths(alpha, model_dir="./model"):
+    """Compiled bundle and pickle of the quantile model for alpha."""
+    name = f"gb_model_q{round(alpha * 100):02d}"
+    return f"{model_dir}/{name}", f"{model_dir}/{name}.pkl"
+
+
+def export_pipeline(pipeline, path=COMPILED_MODEL_DIR):
+    """Compile a fitted scaler/one-hot/gradient boosting pipeline to arrays.
+
+    All trees are flattened into shared node arrays. Leaves point to
+    themselves, so every tree can be walked for the same number of steps.
+    """
+    preprocessor = pipeline.named_steps["preprocessor"]
+    gb = pipeline.named_steps["gb"]
+    scaler = preprocessor.named_transformers_["num"]
+    encoder = preprocessor.named_transformers_["cat"]
+    numeric_columns = list(preprocessor.transformers_[0][2])
+    categorical_columns = list(preprocessor.transformers_[1][2])
+    if len(categorical_columns) != 1 or gb.estimators_.shape[1] != 1:
+        raise ValueError(
+            "Only pipelines with one categorical column and a single output "
+            "can be compiled"
+        )
+
+    roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+    offset = 0
+    for estimator in gb.estimators_[:, 0]:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+        # Same product as sklearn computes at prediction time
+        values.append(gb.learning_rate * tree.value[:, 0, 0])
+        offset += tree.node_count
+
+    arrays = {
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "categories": np.asarray(encoder.categories_[0], dtype=np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values),
+    }
+    meta = {
+        "numeric_columns": numeric_columns,
+        "categorical_column": categorical_columns[0],
+        "init": float(gb.init_.predict(np.zeros((1, gb.n_features_in_)))[0]),
+        "max_depth": int(max(e.tree_.max_depth for e in gb.estimators_[:, 0])),
+    }
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    # meta.json is written last, a bundle without it is incomplete
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+class CompiledModel:
+    """Array-based scorer for a pipeline compiled by export_pipeline.
+
+    Predictions are bit-for-bit identical to the sklearn pipeline: inputs
+    are scaled in float64, cast to float32 like sklearn's trees do, and the
+    tree outputs are accumulated in the same order.
+    """
+
+    def __init__(self, meta, arrays):
+        self.numeric_columns = meta["numeric_columns"]
+        self.categorical_column = meta["categorical_column"]
+        self.feature_names = self.numeric_columns + [self.categorical_column]
+        self.init = meta["init"]
+        self.max_depth = meta["max_depth"]
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+    def transform(self, X):
+        return scale_and_encode(
+            X, self.scaler_mean, self.scaler_scale, self.categories
+        )
+
+    def predict_transformed(self, transformed):
+        X = transformed.astype(np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # cumsum adds the trees one after another, like sklearn does
+        stages = np.empty((len(X), len(self.roots) + 1), dtype=np.float64)
+        stages[:, 0] = self.init
+        stages[:, 1:] = self.value[nodes]
+        return np.cumsum(stages, axis=1)[:, -1]
+
+    def predict(self, X):
+        return self.predict_transformed(self.transform(X))
+
+    def predict_features(self, features):
+        X = feature_matrix(features, self.feature_names)
+        # sklearn rejects missing values, the trees would route them right
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+        return self.predict(X)
+
+
+class ArrayPipelineModel:
+    """Scores feature records with the pickled regressor, without pandas.
+
+    Column order, scaler statistics and categories are taken from the
+    pipeline once, the input is scaled with the same operations as the
+    ColumnTransformer and the regressor is called on the raw array.
+    """
+
+    def __init__(self, pipeline):
+        preprocessor = pipeline.named_steps["preprocessor"]
+        scaler = preprocessor.named_transformers_["num"]
+        encoder = preprocessor.named_transformers_["cat"]
+        self.pipeline = pipeline
+        self.regressor = pipeline.named_steps["gb"]
+        self.feature_names = list(preprocessor.transformers_[0][2]) + list(
+            preprocessor.transformers_[1][2]
+        )
+        self.scaler_mean = scaler.mean_
+        self.scaler_scale = scaler.scale_
+        self.categories = np.asarray(encoder.categories_[0], dtype=np.float64)
+
+    def predict_features(self, features):
+        return self.predict(feature_matrix(features, self.feature_names))
+
+    def predict(self, X):
+        return self.regressor.predict(
+            scale_and_encode(
+                X, self.scaler_mean, self.scaler_scale, self.categories
+            )
+        )
+
+
+class PipelineModel:
+    """Scores feature records with the pickled sklearn pipeline."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.feature_names = list(
+            pipeline.named_steps["preprocessor"].feature_names_in_
+        )
+
+    def predict_features(self, features):
+        import pandas as pd
+
+        input_df = pd.DataFrame(
+            {name: features[name] for name in self.feature_names}
+        )
+        return self.pipeline.predict(input_df)
+
+
+def feature_matrix(features, feature_names):
+    """Copy feature records, or arrays keyed by name, into a matrix."""
+    X = np.empty((len(features[feature_names[0]]), len(feature_names)))
+    for i, name in enumerate(feature_names):
+        X[:, i] = features[name]
+    return X
+
+
+def scale_and_encode(X, mean, scale, categories):
+    """Scale the numeric columns and one-hot encode the last column.
+
+    Same operations as the fitted ColumnTransformer, so the result is
+    bitwise identical.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    num_numeric = len(mean)
+    transformed = np.empty((len(X), num_numeric + len(categories)))
+    transformed[:, :num_numeric] = X[:, :num_numeric]
+    transformed[:, :num_numeric] -= mean
+    transformed[:, :num_numeric] /= scale
+    transformed[:, num_numeric:] = X[:, num_numeric, None] == categories
+    return transformed
+
+
+def load_compiled_model(path=COMPILED_MODEL_DIR, mmap_mode="r"):
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in ARRAY_NAMES
+    }
+    return CompiledModel(meta, arrays)
+
+
+def model_version(
+    compiled_path=COMPILED_MODEL_DIR, pickle_path=PICKLE_MODEL_PATH
+):
+    """Cheap stamp of the model artifacts that changes on every export."""
+    stamps = []
+    for path in (os.path.join(compiled_path, META_FILE), pickle_path):
+        try:
+            stat = os.stat(path)
+            stamps.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+        except OSError:
+            stamps.append("missing")
+    return ":".join(stamps)
+
+
+def load_model(
+    compiled_path=COMPILED_MODEL_DIR,
+    pickle_path=PICKLE_MODEL_PATH,
+    inference_mode=INFERENCE_MODE,
+):
+    """Load the model for the given inference mode.
+
+    "compiled" uses the array bundle unless it is missing or older than the
+    pickle, then falls back to "array". "array" scores the pickled regressor
+    on numpy arrays and "pipeline" runs the whole pickled pipeline on a
+    DataFrame. joblib and sklearn are only imported for the pickle.
+    """
+    if inference_mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{inference_mode}'")
+
+    meta_path = os.path.join(compiled_path, META_FILE)
+    if (
+        inference_mode == "compiled"
+        and os.path.exists(meta_path)
+        and (
+            not os.path.exists(pickle_path)
+            or os.path.getmtime(meta_path) >= os.path.getmtime(pickle_path)
+        )
+    ):
+        return load_compiled_model(compiled_path)
+
+    import joblib
+
+    pipeline = joblib.load(pickle_path)
+    if inference_mode == "pipeline":
+        return PipelineModel(pipeline)
+    return ArrayPipelineModel(pipeline)
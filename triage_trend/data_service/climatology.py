@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+import numpy as np
+
+from triage_trend.data_service.dates import to_datetime64
+from triage_trend.data_service.rolling_weather import (
+    WEATHER_COLUMNS,
+    WEATHER_FEATURES_PATH,
+    read_weather_history,
+)
+
+# Days on each side of a day of the year that are averaged as well
+CLIMATOLOGY_HALF_WINDOW = 7
+DAYS_PER_YEAR = 366
+# The Gregorian calendar repeats every 400 years
+DAYS_PER_CYCLE = 146097
+
+
+def compute_day_of_year_slots(ordinals):
+    days = to_datetime64(ordinals)
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years).astype(np.int64)
+    year_numbers = years.astype(np.int64) + 1970
+    leap = (year_numbers % 4 == 0) & (
+        (year_numbers % 100 != 0) | (year_numbers % 400 == 0)
+    )
+    # Non-leap years skip the February 29th slot
+    return np.where(~leap & (day_of_year >= 59), day_of_year + 1, day_of_year)
+
+
+CYCLE_SLOTS = compute_day_of_year_slots(
+    np.arange(1, DAYS_PER_CYCLE + 1)
+).astype(np.int16)
+
+
+def day_of_year_slots(ordinals):
+    """Day of the year in 0..365, with March 1st always at slot 60."""
+    return CYCLE_SLOTS[(np.asarray(ordinals) - 1) % DAYS_PER_CYCLE]
+
+
+class Climatology:
+    """Mean weather of each day of the year over the stored history."""
+
+    def __init__(self, slots):
+        self.slots = slots
+
+    @classmethod
+    def from_history(
+        cls, first_ordinal, values, half_window=CLIMATOLOGY_HALF_WINDOW
+    ):
+        values = np.asarray(values, dtype=np.float64)
+        slots = day_of_year_slots(
+            np.arange(first_ordinal, first_ordinal + len(values))
+        )
+        valid = ~np.isnan(values)
+        sums = np.zeros((DAYS_PER_YEAR, values.shape[1]))
+        counts = np.zeros((DAYS_PER_YEAR, values.shape[1]))
+        np.add.at(sums, slots, np.where(valid, values, 0))
+        np.add.at(counts, slots, valid)
+
+        # Smooth over neighbouring days, wrapping around the new year
+        window_sums = np.zeros_like(sums)
+        window_counts = np.zeros_like(counts)
+        for shift in range(-half_window, half_window + 1):
+            window_sums += np.roll(sums, shift, axis=0)
+            window_counts += np.roll(counts, shift, axis=0)
+        with np.errstate(invalid="ignore"):
+            return cls(window_sums / window_counts)
+
+    def row(self, date_obj):
+        """Climatological weather of a day, in WEATHER_COLUMNS order."""
+        return self.slots[day_of_year_slots([date_obj.toordinal()])[0]]
+
+    def features(self, date_obj):
+        return dict(zip(WEATHER_COLUMNS, self.row(date_obj).tolist()))
+
+
+@lru_cache(maxsize=None)
+def get_climatology(path=WEATHER_FEATURES_PATH):
+    return Climatology.from_history(*read_weather_history(path))
@@ -0,0 +1,18 @@
+from datetime import date
+
+import numpy as np
+
+# Day ordinal of 1970-01-01, to convert datetime64[D] values to ordinals
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_ordinals(dates):
+    """Convert an array of datetime64 values or day ordinals to ordinals."""
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype("datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+    return dates.astype(np.int64)
+
+
+def to_datetime64(ordinals):
+    return (np.asarray(ordinals) - EPOCH_ORDINAL).astype("datetime64[D]")
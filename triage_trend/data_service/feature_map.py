@@ -1,42 +0,0 @@
-feature_map = {
-    "Average_Temperature": "averageTemperature",
-    "Max_Temperature": "maxTemperature",
-    "Total_Rain_Duration": "totalRainDuration",
-    "Average_Pressure": "averagePressure",
-    "Average_Global_Radiation": "averageGlobalRadiation",
-    "Cloudiness": "cloudiness",
-    "Moon Phase (%)": "moonPhase",
-    "IsVacationAargau": "isVacationAargau",
-    "IsVacationZug": "isVacationZug",
-    "IsVacationSchwyz": "isVacationSchwyz",
-    "IsVacationSt_gallen": "isVacationStGallen",
-    "IsVacationSchaffhausen": "isVacationSchaffhausen",
-    "IsVacationThurgau": "isVacationThurgau",
-    "Weekday": "weekday",
-    "IsWeekend": "isWeekend",
-    "Aargau_Week_After_Holiday": "aargauWeekAfterHoliday",
-    "Aargau_First_Week_of_Holiday": "aargauFirstWeekOfHoliday",
-    "Zug_Week_After_Holiday": "zugWeekAfterHoliday",
-    "Zug_First_Week_of_Holiday": "zugFirstWeekOfHoliday",
-    "Schwyz_Week_After_Holiday": "schwyzWeekAfterHoliday",
-    "Schwyz_First_Week_of_Holiday": "schwyzFirstWeekOfHoliday",
-    "St_gallen_Week_After_Holiday": "stGallenWeekAfterHoliday",
-    "St_gallen_First_Week_of_Holiday": "stGallenFirstWeekOfHoliday",
-    "Schaffhausen_Week_After_Holiday": "schaffhausenWeekAfterHoliday",
-    "Schaffhausen_First_Week_of_Holiday": "schaffhausenFirstWeekOfHoliday",
-    "Thurgau_Week_After_Holiday": "thurgauWeekAfterHoliday",
-    "Thurgau_First_Week_of_Holiday": "thurgauFirstWeekOfHoliday",
-    "Average_Temperature_5day_mean": "averageTemperature5dayMean",
-    "Max_Temperature_5day_mean": "maxTemperature5dayMean",
-    "Total_Rain_Duration_5day_mean": "totalRainDuration5dayMean",
-    "Average_Pressure_5day_mean": "averagePressure5dayMean",
-    "Average_Global_Radiation_5day_mean": "averageGlobalRadiation5dayMean",
-    "Cloudiness_5day_mean": "cloudiness5dayMean",
-    "publicHolidayAargau": "publicHolidayAargau",
-    "publicHolidayZug": "publicHolidayZug",
-    "publicHolidaySchwyz": "publicHolidaySchwyz",
-    "publicHolidayStGallen": "publicHolidayStGallen",
-    "publicHolidayThurgau": "publicHolidayThurgau",
-    "publicHolidaySchaffhausen": "publicHolidaySchaffhausen",
-    "publicHolidayZurich": "publicHolidayZurich",
-}
@@ -0,0 +1,137 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from triage_trend.data_service.public_holidays import HOLIDAY_COLUMNS
+from triage_trend.data_service.rolling_weather import (
+    WEATHER_COLUMNS,
+    feature_name,
+)
+
+# name: column in the training data and key of the model inputs
+# alias: camelCase key in the API responses
+# source: data_service module that computes the feature
+# kind: "numeric" and "categorical" features are model inputs, "info"
+# features are only reported with the predictions
+Feature = namedtuple("Feature", ["name", "alias", "dtype", "source", "kind"])
+
+MOON_PHASE_COLUMN = "Moon Phase (%)"
+WEATHER_ALIASES = {
+    "Average_Temperature": "averageTemperature",
+    "Max_Temperature": "maxTemperature",
+    "Total_Rain_Duration": "totalRainDuration",
+    "Average_Pressure": "averagePressure",
+    "Average_Global_Radiation": "averageGlobalRadiation",
+    "Cloudiness": "cloudiness",
+}
+# Canton sets of the default site, the sites config chooses its own
+VACATION_CANTONS = (
+    "Aargau",
+    "Zug",
+    "Schwyz",
+    "St_gallen",
+    "Schaffhausen",
+    "Thurgau",
+)
+HOLIDAY_CANTONS = tuple(HOLIDAY_COLUMNS)
+
+
+def canton_alias(canton):
+    """CamelCase part of the response aliases, e.g. StGallen."""
+    return "".join(part[:1].upper() + part[1:] for part in canton.split("_"))
+
+
+def build_features(
+    vacation_cantons=VACATION_CANTONS, holiday_cantons=HOLIDAY_CANTONS
+):
+    features = [
+        Feature(column, WEATHER_ALIASES[column], "f8", "weather", "numeric")
+        for column in WEATHER_COLUMNS
+    ]
+    features.append(
+        Feature(MOON_PHASE_COLUMN, "moonPhase", "f8", "moon_phase", "numeric")
+    )
+    for canton in vacation_cantons:
+        features.append(
+            Feature(
+                f"IsVacation{canton}",
+                f"isVacation{canton_alias(canton)}",
+                "i1",
+                "vacations",
+                "numeric",
+            )
+        )
+    for canton in vacation_cantons:
+        alias = canton_alias(canton)
+        prefix = alias[0].lower() + alias[1:]
+        for suffix in ("Week_After_Holiday", "First_Week_of_Holiday"):
+            features.append(
+                Feature(
+                    f"{canton}_{suffix}",
+                    prefix + suffix.replace("_", "").replace("of", "Of"),
+                    "i1",
+                    "vacations",
+                    "numeric",
+                )
+            )
+    for column in WEATHER_COLUMNS:
+        features.append(
+            Feature(
+                feature_name(column),
+                f"{WEATHER_ALIASES[column]}5dayMean",
+                "f8",
+                "rolling_weather",
+                "numeric",
+            )
+        )
+    for canton in holiday_cantons:
+        column = HOLIDAY_COLUMNS[canton]
+        features.append(
+            Feature(column, column, "i1", "public_holidays", "numeric")
+        )
+    features.append(
+        Feature("Weekday", "weekday", "i1", "calendar", "categorical")
+    )
+    features.append(Feature("IsWeekend", "isWeekend", "i1", "calendar", "info"))
+    return tuple(features)
+
+
+class FeatureSchema:
+    """Features, record layout and model inputs of one set of cantons."""
+
+    def __init__(self, features):
+        self.features = features
+        self.names = tuple(feature.name for feature in features)
+        self.aliases = tuple(feature.alias for feature in features)
+        # Fixed layout of a feature vector, one record per day
+        self.dtype = np.dtype(
+            [(feature.name, feature.dtype) for feature in features]
+        )
+        self.numeric_columns = [f.name for f in features if f.kind == "numeric"]
+        self.categorical_columns = [
+            f.name for f in features if f.kind == "categorical"
+        ]
+        self.model_inputs = self.numeric_columns + self.categorical_columns
+
+    def response_features(self, records):
+        """Feature dicts with the response aliases, one per record."""
+        return [dict(zip(self.aliases, row)) for row in records.tolist()]
+
+
+@lru_cache(maxsize=None)
+def get_feature_schema(
+    vacation_cantons=VACATION_CANTONS, holiday_cantons=HOLIDAY_CANTONS
+):
+    return FeatureSchema(build_features(vacation_cantons, holiday_cantons))
+
+
+DEFAULT_SCHEMA = get_feature_schema()
+FEATURES = DEFAULT_SCHEMA.features
+FEATURE_NAMES = DEFAULT_SCHEMA.names
+FEATURE_ALIASES = DEFAULT_SCHEMA.aliases
+FEATURE_DTYPE = DEFAULT_SCHEMA.dtype
+
+NUMERIC_COLUMNS = DEFAULT_SCHEMA.numeric_columns
+CATEGORICAL_COLUMNS = DEFAULT_SCHEMA.categorical_columns
+MODEL_INPUTS = DEFAULT_SCHEMA.model_inputs
@@ -0,0 +1,99 @@
+import os
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from triage_trend.data_service.feature_schema import (
+    DEFAULT_SCHEMA,
+    MOON_PHASE_COLUMN,
+)
+from triage_trend.data_service.moon_phase import get_moon_phases
+from triage_trend.data_service.public_holidays import get_public_holiday_flags
+from triage_trend.data_service.vacations import get_vacation_flags
+from triage_trend.metrics import instrument
+from triage_trend.sites import get_site
+
+# Horizon of the precomputed calendar, relative to the current year
+CALENDAR_PAST_YEARS = int(os.environ.get("FEATURE_CALENDAR_PAST_YEARS", 5))
+CALENDAR_FUTURE_YEARS = int(os.environ.get("FEATURE_CALENDAR_FUTURE_YEARS", 2))
+
+
+def compute_calendar_columns(ordinals, schema=DEFAULT_SCHEMA):
+    """Weather independent features of an array of day ordinals.
+
+    Only the columns of the feature schema are kept.
+    """
+    ordinals = np.asarray(ordinals)
+    # Ordinal 1 (0001-01-01) is a Monday
+    weekdays = ((ordinals - 1) % 7).astype(np.int8)
+    columns = {
+        MOON_PHASE_COLUMN: get_moon_phases(ordinals),
+        **get_vacation_flags(ordinals),
+        "Weekday": weekdays,
+        "IsWeekend": (weekdays >= 5).astype(np.int8),
+        **get_public_holiday_flags(ordinals),
+    }
+    return {
+        name: values for name, values in columns.items() if name in schema.names
+    }
+
+
+def compute_calendar_records(ordinals, schema=DEFAULT_SCHEMA):
+    """Schema records with the calendar features filled in."""
+    records = np.zeros(len(ordinals), dtype=schema.dtype)
+    for name, values in compute_calendar_columns(ordinals, schema).items():
+        records[name] = values
+    return records
+
+
+class FeatureCalendar:
+    """Calendar features of a span of days as schema records.
+
+    The weather fields are left zero and filled in per request, so a
+    lookup is a single take on the record array.
+    """
+
+    def __init__(self, start_ordinal, records):
+        self.start_ordinal = start_ordinal
+        self.records = records
+        self.num_days = len(records)
+        # Opaque rows are copied much faster than structured ones
+        self.rows = records.view(np.dtype((np.void, records.dtype.itemsize)))
+
+    def take(self, ordinals):
+        """Records of the given days, or None if one is outside the table."""
+        index = np.asarray(ordinals) - self.start_ordinal
+        if len(index) and (index.min() < 0 or index.max() >= self.num_days):
+            return None
+        return self.rows[index].view(self.records.dtype)
+
+
+def build_feature_calendar(start, end, schema=DEFAULT_SCHEMA):
+    start_ordinal = start.toordinal()
+    ordinals = np.arange(start_ordinal, end.toordinal() + 1)
+    return FeatureCalendar(
+        start_ordinal, compute_calendar_records(ordinals, schema)
+    )
+
+
+@lru_cache(maxsize=None)
+def load_feature_calendar(site_name):
+    today = date.today()
+    start = date(today.year - CALENDAR_PAST_YEARS, 1, 1)
+    end = date(today.year + CALENDAR_FUTURE_YEARS, 12, 31)
+    return build_feature_calendar(start, end, get_site(site_name).schema)
+
+
+def get_feature_calendar(site=None):
+    """Calendar of a site, the store is keyed by (site, day)."""
+    return load_feature_calendar(get_site(site).name)
+
+
+@instrument("calendar")
+def get_calendar_records(ordinals, site=None):
+    site = get_site(site)
+    records = get_feature_calendar(site).take(ordinals)
+    if records is None:
+        records = compute_calendar_records(ordinals, site.schema)
+    return records
@@ -1,40 +1,148 @@
-from datetime import datetime
+import hashlib
+import threading
+from datetime import date, datetime
+from functools import lru_cache
 
-from triage_trend.data_service.moon_phase import get_moon_phase
-from triage_trend.data_service.public_holidays import get_public_holidays
-from triage_trend.data_service.vacations import get_vacation_data
+import numpy as np
+
+from triage_trend.data_service.climatology import (
+    day_of_year_slots,
+    get_climatology,
+)
+from triage_trend.data_service.feature_store import (
+    get_calendar_records,
+    get_feature_calendar,
+)
+from triage_trend.data_service.rolling_weather import (
+    WEATHER_COLUMNS,
+    RollingWeather,
+    feature_name,
+)
 from triage_trend.data_service.weather_forecast import get_weather_forecast
+from triage_trend.metrics import instrument
+from triage_trend.sites import get_site
+from triage_trend.source_files import hash_file
+
+# Forecast version applied to the weather history of each site
+_applied_forecast_versions = {}
+_forecast_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def load_weather_history(site_name):
+    return RollingWeather.from_csv(get_site(site_name).weather)
+
+
+def get_weather_history(site=None):
+    return load_weather_history(get_site(site).name)
+
+
+@lru_cache(maxsize=None)
+def load_inputs_fingerprint(site_name):
+    """Hash of the stored inputs of a site's features.
+
+    Covers the weather file, which is also the source of the climatology,
+    and the calendar features. Like the stores, it is computed once per
+    process.
+    """
+    site = get_site(site_name)
+    digest = hashlib.sha256()
+    digest.update(hash_file(site.weather)[1].encode())
+    calendar = get_feature_calendar(site)
+    digest.update(str(calendar.start_ordinal).encode())
+    digest.update(calendar.records.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def get_inputs_fingerprint(site=None):
+    return load_inputs_fingerprint(get_site(site).name)
+
+
+@instrument("rolling_weather")
+def get_rolling_weather(forecast_data=None, site=None):
+    """Stored daily weather history of a site extended by the forecast days.
+
+    The days of a new forecast snapshot replace those of the previous one
+    once, on first use.
+    """
+    site = get_site(site)
+    if forecast_data is None:
+        forecast_data = get_weather_forecast()
+    rolling_weather = get_weather_history(site)
+    if _applied_forecast_versions.get(site.name) != forecast_data.version:
+        with _forecast_lock:
+            if (
+                _applied_forecast_versions.get(site.name)
+                != forecast_data.version
+            ):
+                rows = {}
+                for date_str in forecast_data:
+                    ordinal = date.fromisoformat(date_str).toordinal()
+                    rows[ordinal] = forecast_data.row(date_str)
+                rolling_weather.set_forecast(rows)
+                _applied_forecast_versions[site.name] = forecast_data.version
+    return rolling_weather
+
+
+@instrument("weather")
+def get_weather(ordinals, forecast_data, rolling_weather, site=None):
+    """Weather of an array of days for the model inputs.
+
+    Uses the forecast if it covers a day, else the observed history, else
+    the climatology of that day of the year.
+    """
+    climatology = get_climatology(get_site(site).weather).slots[
+        day_of_year_slots(ordinals)
+    ]
+    observed = rolling_weather.take_rows(ordinals)
+    weather = np.where(np.isnan(observed), climatology, observed)
+
+    forecast, covered = forecast_data.take(ordinals)
+    if covered.any():
+        weather[covered] = forecast[covered]
+    return weather
+
+
+@instrument("features")
+def get_feature_records(ordinals, forecast_data=None, site=None):
+    """Features of an array of days as records of the site's schema.
+
+    Every source fills whole columns, there is no loop over the days.
+    """
+    site = get_site(site)
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    if forecast_data is None:
+        forecast_data = get_weather_forecast()
+    rolling_weather = get_rolling_weather(forecast_data, site)
+    weather = get_weather(ordinals, forecast_data, rolling_weather, site)
+    rolling = rolling_weather.take_statistics(ordinals)["mean"]
+    # Without any known day in the window, fall back to the day's weather
+    rolling = np.where(np.isnan(rolling), weather, rolling)
+
+    records = get_calendar_records(ordinals, site)
+    for i, column in enumerate(WEATHER_COLUMNS):
+        records[column] = weather[:, i]
+        records[feature_name(column)] = rolling[:, i]
+    return records
+
+
+def get_data(date_str, forecast_data=None, site=None):
+    """Features of a single day, by name."""
+    ordinal = datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    record = get_feature_records([ordinal], forecast_data, site)[0]
+    return dict(zip(record.dtype.names, record.tolist()))
+
+
+def get_data_batch(date_strs, site=None):
+    ordinals = [
+        date.fromisoformat(date_str).toordinal() for date_str in date_strs
+    ]
+    return get_feature_records(ordinals, site=site)
 
 
-def get_data(date_str):
-    forecast_data = get_weather_forecast()
-    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-    weekday = date_obj.weekday()
-    is_weekend = 1 if weekday >= 5 else 0
-    moon_phase = get_moon_phase(date_obj)
-    holidays = get_public_holidays(date_str)
-    vacations = get_vacation_data(date_str)
-    forecast = forecast_data.get(date_str, forecast_data[date_str])
-
-    raw_data = {
-        "Average_Temperature": forecast["Avg_Temp"],
-        "Max_Temperature": forecast["Max_Temp"],
-        "Total_Rain_Duration": forecast["Rain_Duration"],
-        "Average_Pressure": forecast["Pressure"],
-        "Average_Global_Radiation": forecast["Radiation"],
-        "Cloudiness": forecast["Cloudiness"],
-        "Moon Phase (%)": moon_phase,
-        **vacations,
-        "Weekday": weekday,
-        "IsWeekend": is_weekend,
-        "Average_Temperature_5day_mean": (forecast["Avg_Temp"] + 19.0) / 2,
-        "Max_Temperature_5day_mean": (forecast["Max_Temp"] + 24.0) / 2,
-        "Total_Rain_Duration_5day_mean": (forecast["Rain_Duration"] + 1.8) / 2,
-        "Average_Pressure_5day_mean": (forecast["Pressure"] + 1012.0) / 2,
-        "Average_Global_Radiation_5day_mean": (forecast["Radiation"] + 215.0)
-        / 2,
-        "Cloudiness_5day_mean": (forecast["Cloudiness"] + 0.25) / 2,
-        **holidays,
-    }
-
-    return raw_data
+def get_data_range(first_ordinal, num_days, forecast_data=None, site=None):
+    return get_feature_records(
+        np.arange(first_ordinal, first_ordinal + num_days),
+        forecast_data,
+        site,
+    )
@@ -1,6 +1,168 @@
+import os
+import threading
+from datetime import date
+
 import ephem
+import numpy as np
+
+from triage_trend.data_service.dates import to_ordinals
+
+MOON_PHASE_CACHE_PATH = os.environ.get(
+    "MOON_PHASE_CACHE_PATH", "data/moon_phase.npz"
+)
+# Span computed when no cache file exists yet
+DEFAULT_FIRST_YEAR = 2019
+DEFAULT_FUTURE_YEARS = 2
+# The cache only grows within this many years around the default span, the
+# phases of days further out are computed per lookup and not stored
+CACHE_MARGIN_YEARS = 10
+
+# ephem dates count days from 1899-12-31 12:00 UTC
+EPHEM_EPOCH_ORDINAL = date(1899, 12, 31).toordinal()
+
+
+def compute_moon_phases(first_ordinal, last_ordinal):
+    """Compute the moon phase (%) at midnight UTC for a span of days."""
+    return compute_day_phases(range(first_ordinal, last_ordinal + 1))
+
+
+def compute_day_phases(ordinals):
+    moon = ephem.Moon()
+    phases = np.empty(len(ordinals), dtype=np.float32)
+    for i, ordinal in enumerate(ordinals):
+        moon.compute(int(ordinal) - EPHEM_EPOCH_ORDINAL - 0.5)
+        phases[i] = moon.phase
+    return phases
+
+
+def cache_bounds():
+    """First and last day the cache may grow to."""
+    first_year = DEFAULT_FIRST_YEAR - CACHE_MARGIN_YEARS
+    last_year = date.today().year + DEFAULT_FUTURE_YEARS + CACHE_MARGIN_YEARS
+    return (
+        date(first_year, 1, 1).toordinal(),
+        date(last_year, 12, 31).toordinal(),
+    )
+
+
+class MoonPhaseCache:
+    """Moon phases for a contiguous span of days, keyed by day ordinal.
+
+    ephem computes phases in single precision, so storing them as float32 is
+    lossless. The span only grows up to bounds, a pair of ordinals, so
+    requests for distant days do not grow the file.
+    """
+
+    def __init__(self, first_ordinal, phases, path=None, bounds=None):
+        self.first_ordinal = first_ordinal
+        self.phases = phases
+        self.path = path
+        self.bounds = cache_bounds() if bounds is None else bounds
+        self.lock = threading.Lock()
+
+    @property
+    def last_ordinal(self):
+        return self.first_ordinal + len(self.phases) - 1
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            cache = cls(int(data["first_ordinal"]), data["phases"], path)
+        # Files grown before the span had bounds are trimmed to them
+        start = max(cache.bounds[0] - cache.first_ordinal, 0)
+        stop = min(cache.bounds[1] - cache.first_ordinal + 1, len(cache.phases))
+        if start < stop and (start, stop) != (0, len(cache.phases)):
+            cache.phases = cache.phases[start:stop]
+            cache.first_ordinal += start
+            cache.save()
+        return cache
+
+    def save(self):
+        if self.path is None:
+            return
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = f"{self.path}.tmp.npz"
+        try:
+            np.savez(
+                tmp_path, first_ordinal=self.first_ordinal, phases=self.phases
+            )
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # The cache is an optimization, a read-only disk is fine
+            pass
+
+    def extend(self, first_ordinal, last_ordinal):
+        """Compute the missing days so the span covers both ordinals."""
+        with self.lock:
+            phases = self.phases
+            if first_ordinal < self.first_ordinal:
+                before = compute_moon_phases(
+                    first_ordinal, self.first_ordinal - 1
+                )
+                phases = np.concatenate([before, phases])
+            if last_ordinal > self.last_ordinal:
+                after = compute_moon_phases(self.last_ordinal + 1, last_ordinal)
+                phases = np.concatenate([phases, after])
+            self.first_ordinal = min(first_ordinal, self.first_ordinal)
+            self.phases = phases
+            self.save()
+
+    def lookup(self, ordinals):
+        ordinals = np.asarray(ordinals)
+        cacheable = ordinals[
+            (ordinals >= self.bounds[0]) & (ordinals <= self.bounds[1])
+        ]
+        if len(cacheable) and (
+            cacheable.min() < self.first_ordinal
+            or cacheable.max() > self.last_ordinal
+        ):
+            self.extend(int(cacheable.min()), int(cacheable.max()))
+
+        with self.lock:
+            first_ordinal, cached = self.first_ordinal, self.phases
+        positions = ordinals - first_ordinal
+        inside = (positions >= 0) & (positions < len(cached))
+        if inside.all():
+            return cached[positions].astype(np.float64)
+        phases = np.empty(len(ordinals))
+        phases[inside] = cached[positions[inside]]
+        outside, inverse = np.unique(ordinals[~inside], return_inverse=True)
+        phases[~inside] = compute_day_phases(outside)[inverse]
+        return phases
+
+    def lookup_one(self, ordinal):
+        if not self.first_ordinal <= ordinal <= self.last_ordinal:
+            return float(self.lookup(np.array([ordinal]))[0])
+        return float(self.phases[ordinal - self.first_ordinal])
+
+
+_cache = None
+
+
+def get_moon_phase_cache():
+    global _cache
+    if _cache is None:
+        if os.path.exists(MOON_PHASE_CACHE_PATH):
+            _cache = MoonPhaseCache.load(MOON_PHASE_CACHE_PATH)
+        else:
+            first_ordinal = date(DEFAULT_FIRST_YEAR, 1, 1).toordinal()
+            last_ordinal = date(
+                date.today().year + DEFAULT_FUTURE_YEARS, 12, 31
+            ).toordinal()
+            _cache = MoonPhaseCache(
+                first_ordinal,
+                compute_moon_phases(first_ordinal, last_ordinal),
+                MOON_PHASE_CACHE_PATH,
+            )
+            _cache.save()
+    return _cache
+
+
+def get_moon_phases(dates):
+    """Vectorized moon phases for an array of dates or day ordinals."""
+    ordinals = to_ordinals(dates)
+    return get_moon_phase_cache().lookup(ordinals)
 
 
 def get_moon_phase(date_obj):
-    moon = ephem.Moon(date_obj)
-    return moon.phase
+    return get_moon_phase_cache().lookup_one(date_obj.toordinal())
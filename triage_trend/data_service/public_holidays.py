@@ -1,92 +1,115 @@
-def get_public_holidays(date_str):
-    public_holidays = {
-        "2024-01-01": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-01-02": {
-            "Aargau": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-03-29": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-04-01": {
-            "Aargau": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-        },
-        "2024-05-01": {"Zurich": 1, "Thurgau": 1, "Schaffhausen": 1},
-        "2024-05-09": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-05-20": {
-            "Aargau": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-        },
-        "2024-08-01": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-08-15": {"Aargau": 1, "Zug": 1, "Schwyz": 1},
-        "2024-11-01": {"Aargau": 1, "Schwyz": 1, "St_gallen": 1, "Thurgau": 1},
-        "2024-12-25": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
-        "2024-12-26": {
-            "Aargau": 1,
-            "Zug": 1,
-            "Schwyz": 1,
-            "St_gallen": 1,
-            "Schaffhausen": 1,
-            "Thurgau": 1,
-            "Zurich": 1,
-        },
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from triage_trend.data_service.dates import to_datetime64, to_ordinals
+
+# Bit position of each canton in the holiday masks, and its feature column
+HOLIDAY_COLUMNS = {
+    "Aargau": "publicHolidayAargau",
+    "Zug": "publicHolidayZug",
+    "Schwyz": "publicHolidaySchwyz",
+    "St_gallen": "publicHolidayStGallen",
+    "Thurgau": "publicHolidayThurgau",
+    "Schaffhausen": "publicHolidaySchaffhausen",
+    "Zurich": "publicHolidayZurich",
+}
+ALL_CANTONS = tuple(HOLIDAY_COLUMNS)
+
+# (month, day) -> cantons
+FIXED_HOLIDAYS = {
+    (1, 1): ALL_CANTONS,
+    (1, 2): ("Thurgau",),
+    (3, 19): ("Schwyz",),
+    (5, 1): ("Aargau", "Zug", "Thurgau", "Schaffhausen", "Zurich"),
+    (8, 1): ("Zurich",),
+    (8, 15): ("Aargau", "Zug", "Schwyz"),
+    (11, 1): ("Aargau", "Zug", "Schwyz", "St_gallen", "Schaffhausen"),
+    (12, 8): ("Aargau", "Zug", "Schwyz"),
+    (12, 25): ALL_CANTONS,
+    (12, 26): ALL_CANTONS,
+}
+
+# Days relative to Easter Sunday -> cantons
+EASTER_HOLIDAYS = {
+    -2: ALL_CANTONS,  # Good Friday
+    1: ALL_CANTONS,  # Easter Monday
+    39: ALL_CANTONS,  # Ascension
+    50: ALL_CANTONS,  # Whit Monday
+    60: ("Aargau", "Schwyz"),  # Corpus Christi
+}
+
+# Federal Day of Thanksgiving, the third Sunday of September
+THANKSGIVING_CANTONS = ("Zug", "Schwyz", "St_gallen", "Thurgau", "Schaffhausen")
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    la = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * la) // 451
+    month, day = divmod(h + la - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def canton_mask(cantons):
+    bits = 0
+    for canton in cantons:
+        bits |= 1 << ALL_CANTONS.index(canton)
+    return bits
+
+
+@lru_cache(maxsize=None)
+def get_holiday_masks(year):
+    """Per-day canton bitmasks of one year, indexed by day of the year."""
+    new_year = date(year, 1, 1)
+    masks = np.zeros(date(year, 12, 31).timetuple().tm_yday, dtype=np.uint8)
+
+    for (month, day), cantons in FIXED_HOLIDAYS.items():
+        masks[(date(year, month, day) - new_year).days] |= canton_mask(cantons)
+
+    easter = easter_sunday(year)
+    for offset, cantons in EASTER_HOLIDAYS.items():
+        day = easter + timedelta(days=offset)
+        masks[(day - new_year).days] |= canton_mask(cantons)
+
+    first_sunday = 1 + (6 - date(year, 9, 1).weekday()) % 7
+    thanksgiving = date(year, 9, first_sunday + 14)
+    masks[(thanksgiving - new_year).days] |= canton_mask(THANKSGIVING_CANTONS)
+
+    masks.flags.writeable = False
+    return masks
+
+
+def get_public_holiday_flags(dates):
+    """Vectorized holiday flags for an array of dates or day ordinals."""
+    days = to_datetime64(to_ordinals(dates))
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years).astype(np.int64)
+    years = years.astype(np.int64) + 1970
+
+    masks = np.empty(len(days), dtype=np.uint8)
+    for year in np.unique(years):
+        in_year = years == year
+        masks[in_year] = get_holiday_masks(int(year))[day_of_year[in_year]]
+
+    return {
+        column: ((masks >> bit) & 1).astype(np.int8)
+        for bit, column in enumerate(HOLIDAY_COLUMNS.values())
     }
 
-    holidays = public_holidays.get(date_str, {})
 
+def get_public_holidays(date_str):
+    date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+    mask = get_holiday_masks(date_obj.year)[date_obj.timetuple().tm_yday - 1]
     return {
-        "publicHolidayAargau": holidays.get("Aargau", 0),
-        "publicHolidayZug": holidays.get("Zug", 0),
-        "publicHolidaySchwyz": holidays.get("Schwyz", 0),
-        "publicHolidayStGallen": holidays.get("St_gallen", 0),
-        "publicHolidayThurgau": holidays.get("Thurgau", 0),
-        "publicHolidaySchaffhausen": holidays.get("Schaffhausen", 0),
-        "publicHolidayZurich": holidays.get("Zurich", 0),
+        column: (int(mask) >> bit) & 1
+        for bit, column in enumerate(HOLIDAY_COLUMNS.values())
     }
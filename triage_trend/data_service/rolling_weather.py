@@ -0,0 +1,338 @@
+import threading
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from triage_trend.metrics import instrument
+
+WEATHER_FEATURES_PATH = "data/weather_features.csv"
+WEATHER_COLUMNS = [
+    "Average_Temperature",
+    "Max_Temperature",
+    "Total_Rain_Duration",
+    "Average_Pressure",
+    "Average_Global_Radiation",
+    "Cloudiness",
+]
+ROLLING_WINDOW = 5
+
+
+def feature_name(column, window=ROLLING_WINDOW, statistic="mean"):
+    return f"{column}_{window}day_{statistic}"
+
+
+class RollingWindow:
+    """Ring buffer over the last `size` rows of several columns.
+
+    Pushing a row is O(1): running sums and counts of the non-missing values
+    are updated instead of summing the whole window again. The sums are
+    recomputed from the buffer once per cycle so rounding errors cannot
+    accumulate over a long history.
+    """
+
+    def __init__(self, size, num_columns):
+        self.size = size
+        self.buffer = np.full((size, num_columns), np.nan)
+        self.position = 0
+        self.sums = np.zeros(num_columns)
+        self.counts = np.zeros(num_columns, dtype=np.int64)
+
+    def push(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        old = self.buffer[self.position]
+        old_valid = ~np.isnan(old)
+        self.sums[old_valid] -= old[old_valid]
+        self.counts -= old_valid
+
+        valid = ~np.isnan(values)
+        self.sums[valid] += values[valid]
+        self.counts += valid
+        self.buffer[self.position] = values
+        self.position = (self.position + 1) % self.size
+        if self.position == 0:
+            self.sums = np.nansum(self.buffer, axis=0)
+
+    def statistic(self, statistic, min_periods=None):
+        """Statistic per column, NaN below min_periods valid values."""
+        if min_periods is None:
+            min_periods = self.size
+        enough = self.counts >= max(min_periods, 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if statistic == "mean":
+                result = self.sums / self.counts
+            elif statistic == "sum":
+                result = self.sums.copy()
+            elif statistic in ("min", "max"):
+                # Only the min/max scan the window, which is a handful of rows
+                masked = np.where(
+                    np.isnan(self.buffer),
+                    np.inf if statistic == "min" else -np.inf,
+                    self.buffer,
+                )
+                result = getattr(masked, statistic)(axis=0)
+            else:
+                raise ValueError(f"Unknown rolling statistic '{statistic}'")
+        return np.where(enough, result, np.nan)
+
+
+def trailing_statistics(
+    values,
+    window=ROLLING_WINDOW,
+    statistics=("mean",),
+    min_periods=None,
+    initial_rows=None,
+):
+    """Statistics over the `window` rows before each row of a 2-D array.
+
+    With the default min_periods this equals
+    ``df.rolling(window).<statistic>().shift(1)``. Rows in initial_rows seed
+    the window as if they preceded values. Sums and counts come from running
+    totals, so the whole history is computed without a loop over the rows.
+    The ring buffer is only used to append days.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_columns = values.shape[1]
+    if min_periods is None:
+        min_periods = window
+    seed = np.empty((0, num_columns))
+    if initial_rows is not None and len(initial_rows):
+        seed = np.asarray(initial_rows, dtype=np.float64)[-window:]
+    # The window of row i is padded[i : i + window]
+    padded = np.concatenate(
+        [np.full((window - len(seed), num_columns), np.nan), seed, values]
+    )
+    valid = ~np.isnan(padded)
+    # Window sums and counts as differences of running totals
+    totals = np.zeros((len(padded) + 1, num_columns))
+    np.cumsum(np.where(valid, padded, 0.0), axis=0, out=totals[1:])
+    valid_totals = np.zeros((len(padded) + 1, num_columns), dtype=np.int64)
+    np.cumsum(valid, axis=0, out=valid_totals[1:])
+    end = slice(window, window + len(values))
+    sums = totals[end] - totals[: len(values)]
+    counts = valid_totals[end] - valid_totals[: len(values)]
+    enough = counts >= max(min_periods, 1)
+
+    results = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for statistic in statistics:
+            if statistic == "mean":
+                result = sums / counts
+            elif statistic == "sum":
+                result = sums
+            elif statistic in ("min", "max"):
+                masked = np.where(
+                    valid, padded, np.inf if statistic == "min" else -np.inf
+                )
+                windows = sliding_window_view(masked, window, axis=0)
+                result = getattr(windows[: len(values)], statistic)(axis=-1)
+            else:
+                raise ValueError(f"Unknown rolling statistic '{statistic}'")
+            results[statistic] = np.where(enough, result, np.nan)
+    return results
+
+
+def read_weather_history(path=WEATHER_FEATURES_PATH):
+    """Daily weather as (first ordinal, rows), missing days are NaN."""
+    weather_df = pd.read_csv(path)
+    dates = pd.to_datetime(weather_df["Datum"].str.slice(0, 10))
+    ordinals = np.array([date.toordinal() for date in dates])
+    first_ordinal = ordinals.min()
+    values = np.full(
+        (ordinals.max() - first_ordinal + 1, len(WEATHER_COLUMNS)), np.nan
+    )
+    values[ordinals - first_ordinal] = weather_df[WEATHER_COLUMNS]
+    return first_ordinal, values
+
+
+def grow_rows(array, capacity):
+    grown = np.full((capacity, array.shape[1]), np.nan)
+    grown[: len(array)] = array
+    return grown
+
+
+class RollingWeather:
+    """Daily weather history with precomputed trailing statistics.
+
+    Rows are indexed by day ordinal; missing days hold NaN. Serving uses
+    min_periods=1 so a gap before a forecast still yields the mean of the
+    days that are known. Forecast days replace the stored rows until the
+    next forecast, see set_forecast.
+    """
+
+    def __init__(
+        self,
+        first_ordinal,
+        values,
+        window=ROLLING_WINDOW,
+        statistics=("mean",),
+        min_periods=1,
+    ):
+        self.first_ordinal = first_ordinal
+        self.window = window
+        self.statistics = statistics
+        self.min_periods = min_periods
+        self.lock = threading.Lock()
+        # Row buffers grow geometrically so appending a day is amortized O(1)
+        self.num_days = len(values)
+        self.buffer = np.asarray(values, dtype=np.float64).copy()
+        self.trailing_buffers = trailing_statistics(
+            self.buffer, window, statistics, min_periods
+        )
+        # The ring buffer keeps the state after the last row, so appending
+        # a day does not revisit the history
+        self.rolling = RollingWindow(window, self.buffer.shape[1])
+        for row in self.values[-window:]:
+            self.rolling.push(row)
+        # Ordinal -> row the current forecast replaced, NaN past the history
+        self.replaced = {}
+
+    @property
+    def values(self):
+        return self.buffer[: self.num_days]
+
+    @classmethod
+    def from_csv(cls, path=WEATHER_FEATURES_PATH, **kwargs):
+        return cls(*read_weather_history(path), **kwargs)
+
+    @property
+    def last_ordinal(self):
+        return self.first_ordinal + self.num_days - 1
+
+    def set_forecast(self, rows):
+        """Replace the days of the previous forecast by rows.
+
+        rows maps day ordinals to weather rows. The days of the previous
+        forecast first get their stored weather back, so a day dropped from
+        the forecast no longer feeds the trailing statistics. Days before
+        the history are skipped.
+        """
+        with self.lock:
+            changed = []
+            for ordinal, row in self.replaced.items():
+                index = ordinal - self.first_ordinal
+                self.values[index] = row
+                changed.append(index)
+            self.replaced = {}
+
+            appended = []
+            for ordinal in sorted(rows):
+                row = np.asarray(rows[ordinal], dtype=np.float64)
+                index = ordinal - self.first_ordinal
+                if index < 0:
+                    continue
+                if index >= self.num_days:
+                    appended.append((ordinal, row))
+                    continue
+                self.replaced[ordinal] = self.values[index].copy()
+                self.values[index] = row
+                changed.append(index)
+            if changed:
+                self.recompute(min(changed) + 1, max(changed) + self.window + 1)
+
+            for ordinal, row in appended:
+                self.append_gap(ordinal - self.last_ordinal - 1)
+                self.replaced[ordinal] = np.full(len(row), np.nan)
+                self.append(row)
+
+    def append_gap(self, num_days):
+        for _ in range(num_days):
+            self.append(np.full(self.buffer.shape[1], np.nan))
+
+    def append(self, row):
+        if self.num_days == len(self.buffer):
+            capacity = max(2 * len(self.buffer), 16)
+            self.buffer = grow_rows(self.buffer, capacity)
+            self.trailing_buffers = {
+                statistic: grow_rows(buffer, capacity)
+                for statistic, buffer in self.trailing_buffers.items()
+            }
+        for statistic in self.statistics:
+            self.trailing_buffers[statistic][self.num_days] = (
+                self.rolling.statistic(statistic, self.min_periods)
+            )
+        self.buffer[self.num_days] = row
+        self.num_days += 1
+        self.rolling.push(row)
+
+    def recompute(self, start, end):
+        end = min(end, self.num_days)
+        if start >= end:
+            return
+        seed = self.values[max(start - self.window, 0) : start]
+        recomputed = trailing_statistics(
+            self.values[start:end],
+            self.window,
+            self.statistics,
+            self.min_periods,
+            initial_rows=seed,
+        )
+        for statistic in self.statistics:
+            self.trailing_buffers[statistic][start:end] = recomputed[statistic]
+        self.rolling = RollingWindow(self.window, self.buffer.shape[1])
+        for row in self.values[-self.window :]:
+            self.rolling.push(row)
+
+    def row(self, ordinal):
+        """Stored weather of a day, or None outside the history."""
+        with self.lock:
+            index = ordinal - self.first_ordinal
+            if 0 <= index < self.num_days:
+                return self.values[index].copy()
+            return None
+
+    def take_rows(self, ordinals):
+        """Stored weather of an array of days, NaN outside the history."""
+        index = np.asarray(ordinals) - self.first_ordinal
+        with self.lock:
+            known = (index >= 0) & (index < self.num_days)
+            rows = self.values[np.clip(index, 0, self.num_days - 1)]
+        rows[~known] = np.nan
+        return rows
+
+    @instrument("rolling_statistics")
+    def take_statistics(self, ordinals):
+        """Trailing statistics of an array of days, as (days, columns) rows.
+
+        The vectorized counterpart of features, keyed by statistic.
+        """
+        index = np.asarray(ordinals) - self.first_ordinal
+        rows = {}
+        # Readers hold the lock too, an update can replace the buffers
+        with self.lock:
+            unknown = (index < 0) | (index >= self.num_days)
+            next_day = index == self.num_days
+            index = np.clip(index, 0, self.num_days - 1)
+            for statistic in self.statistics:
+                rows[statistic] = self.trailing_buffers[statistic][index]
+                rows[statistic][unknown] = np.nan
+                if next_day.any():
+                    rows[statistic][next_day] = self.rolling.statistic(
+                        statistic, self.min_periods
+                    )
+        return rows
+
+    def features(self, ordinal):
+        """Trailing statistics of the days before ordinal, by feature name."""
+        index = ordinal - self.first_ordinal
+        with self.lock:
+            if 0 <= index < self.num_days:
+                rows = {
+                    s: self.trailing_buffers[s][index].copy()
+                    for s in self.statistics
+                }
+            elif index == self.num_days:
+                rows = {
+                    s: self.rolling.statistic(s, self.min_periods)
+                    for s in self.statistics
+                }
+            else:
+                rows = {
+                    s: np.full(len(WEATHER_COLUMNS), np.nan)
+                    for s in self.statistics
+                }
+        return {
+            feature_name(column, self.window, statistic): rows[statistic][i]
+            for statistic in self.statistics
+            for i, column in enumerate(WEATHER_COLUMNS)
+        }
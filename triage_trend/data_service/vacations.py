@@ -1,113 +1,226 @@
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import MAXYEAR, MINYEAR, date, datetime
 
+import numpy as np
 
-def is_date_in_range(date_str, start_str, end_str):
-    date = datetime.strptime(date_str, "%Y-%m-%d")
-    start = datetime.strptime(start_str, "%d.%m")
-    end = datetime.strptime(end_str, "%d.%m")
-    # Adjust year for the comparison
-    start = start.replace(year=date.year)
-    end = end.replace(year=date.year)
-    return start <= date <= end
+from triage_trend.data_service.dates import to_ordinals
 
+VACATION_PERIODS = {
+    "Zurich": [
+        ("22.04", "04.05"),
+        ("15.07", "17.08"),
+        ("07.10", "19.10"),
+        ("23.12", "04.01"),
+    ],
+    "Bern": [
+        ("06.04", "21.04"),
+        ("06.07", "11.08"),
+        ("21.09", "13.10"),
+        ("21.12", "05.01"),
+    ],
+    "Luzern": [
+        ("28.03", "14.04"),
+        ("03.02", "18.02"),
+        ("06.07", "18.08"),
+        ("28.09", "13.10"),
+        ("21.12", "05.01"),
+    ],
+    "Uri": [("27.04", "12.05"), ("02.03", "10.03"), ("06.07", "18.08")],
+    "Schwyz": [
+        ("29.04", "10.05"),
+        ("26.02", "01.03"),
+        ("30.09", "11.10"),
+        ("25.12", "06.01"),
+    ],
+    "Zug": [
+        ("13.04", "28.04"),
+        ("03.02", "18.02"),
+        ("06.07", "18.08"),
+        ("05.10", "20.10"),
+        ("21.12", "05.01"),
+    ],
+    "Schaffhausen": [
+        ("13.04", "28.04"),
+        ("27.01", "11.02"),
+        ("06.07", "11.08"),
+        ("28.09", "20.10"),
+        ("24.12", "05.01"),
+    ],
+    "St_gallen": [
+        ("07.04", "21.04"),
+        ("07.07", "11.08"),
+        ("29.09", "20.10"),
+        ("22.12", "05.01"),
+    ],
+    "Aargau": [
+        ("08.04", "19.04"),
+        ("22.07", "09.08"),
+        ("30.09", "11.10"),
+        ("23.12", "03.01"),
+    ],
+    "Thurgau": [
+        ("29.03", "14.04"),
+        ("29.01", "04.02"),
+        ("08.07", "11.08"),
+        ("07.10", "20.10"),
+        ("23.12", "05.01"),
+    ],
+}
 
-def get_vacation_data(date_str):
-    vacation_data = {
-        "Zurich": [
-            ("22.04", "04.05"),
-            ("15.07", "17.08"),
-            ("07.10", "19.10"),
-            ("23.12", "04.01"),
-        ],
-        "Bern": [
-            ("06.04", "21.04"),
-            ("06.07", "11.08"),
-            ("21.09", "13.10"),
-            ("21.12", "05.01"),
-        ],
-        "Luzern": [
-            ("28.03", "14.04"),
-            ("03.02", "18.02"),
-            ("06.07", "18.08"),
-            ("28.09", "13.10"),
-            ("21.12", "05.01"),
-        ],
-        "Uri": [("27.04", "12.05"), ("02.03", "10.03"), ("06.07", "18.08")],
-        "Schwyz": [
-            ("29.04", "10.05"),
-            ("26.02", "01.03"),
-            ("30.09", "11.10"),
-            ("25.12", "06.01"),
-        ],
-        "Zug": [
-            ("13.04", "28.04"),
-            ("03.02", "18.02"),
-            ("06.07", "18.08"),
-            ("05.10", "20.10"),
-            ("21.12", "05.01"),
-        ],
-        "Schaffhausen": [
-            ("13.04", "28.04"),
-            ("27.01", "11.02"),
-            ("06.07", "11.08"),
-            ("28.09", "20.10"),
-            ("24.12", "05.01"),
-        ],
-        "St_gallen": [
-            ("07.04", "21.04"),
-            ("07.07", "11.08"),
-            ("29.09", "20.10"),
-            ("22.12", "05.01"),
-        ],
-        "Aargau": [
-            ("08.04", "19.04"),
-            ("22.07", "09.08"),
-            ("30.09", "11.10"),
-            ("23.12", "03.01"),
-        ],
-        "Thurgau": [
-            ("29.03", "14.04"),
-            ("29.01", "04.02"),
-            ("08.07", "11.08"),
-            ("07.10", "20.10"),
-            ("23.12", "05.01"),
-        ],
-    }
-
-    vacations = {}
-    for canton, periods in vacation_data.items():
-        in_vacation = any(
-            is_date_in_range(date_str, start, end) for start, end in periods
-        )
-        first_week_of_holiday = any(
-            is_date_in_range(
-                date_str,
-                start,
-                (
-                    datetime.strptime(start, "%d.%m") + timedelta(days=7)
-                ).strftime("%d.%m"),
+FIRST_WEEK_DAYS = 7
+WEEK_AFTER_DAYS = 7
+
+
+def vacation_transitions(flags, ordinals):
+    """First week and week after flags from daily vacation flags.
+
+    flags is a (days, cantons) array of 0/1, ordinals the day of each row.
+    Runs of vacation days are found from their boundaries, so the result
+    follows the same definition as VacationCalendar.flags: the first
+    FIRST_WEEK_DAYS days of a vacation, and the WEEK_AFTER_DAYS days after
+    the last vacation that ended before a day. Returns two int8 arrays
+    shaped like flags.
+    """
+    in_vacation = np.asarray(flags) == 1
+    # Days since the first row, int32 keeps the 2-D passes small
+    days = np.asarray(ordinals, dtype=np.int64)
+    days = (days - days[:1]).astype(np.int32)[:, None]
+    never = np.int32(-(2**30))
+
+    # Day of the latest run start up to each row
+    starts = in_vacation.copy()
+    starts[1:] &= ~in_vacation[:-1]
+    last_start = np.maximum.accumulate(np.where(starts, days, never), axis=0)
+    first_week = in_vacation & (days - last_start < FIRST_WEEK_DAYS)
+
+    # Day of the latest run end strictly before each row
+    ends = in_vacation[:-1] & ~in_vacation[1:]
+    last_end = np.full(in_vacation.shape, never)
+    np.maximum.accumulate(
+        np.where(ends, days[:-1], never), axis=0, out=last_end[1:]
+    )
+    week_after = days - last_end <= WEEK_AFTER_DAYS
+    return first_week.astype(np.int8), week_after.astype(np.int8)
+
+
+def parse_day_month(day_month):
+    day, month = day_month.split(".")
+    return int(day), int(month)
+
+
+class VacationCalendar:
+    """Sorted vacation intervals per canton, in day ordinal space.
+
+    Periods are given as day and month only and repeat every year. A period
+    whose end lies before its start (e.g. ``("23.12", "04.01")``) wraps into
+    the following year.
+    """
+
+    def __init__(self, periods, first_year, last_year):
+        self.first_year = first_year
+        self.last_year = last_year
+        self.cantons = [canton.replace(" ", "_") for canton in periods]
+        self.starts = []
+        self.ends = []
+
+        for canton_periods in periods.values():
+            bounds = [
+                (parse_day_month(start), parse_day_month(end))
+                for start, end in canton_periods
+            ]
+            intervals = []
+            # Start one year early so periods wrapping into first_year are seen
+            for year in range(max(first_year - 1, MINYEAR), last_year + 1):
+                for (start_day, start_month), (end_day, end_month) in bounds:
+                    start = date(year, start_month, start_day)
+                    end = date(year, end_month, end_day)
+                    if end < start:
+                        end = (
+                            end.replace(year=year + 1)
+                            if year < MAXYEAR
+                            else date.max
+                        )
+                    intervals.append((start.toordinal(), end.toordinal()))
+            intervals.sort()
+            self.starts.append(np.array([start for start, _ in intervals]))
+            self.ends.append(np.array([end for _, end in intervals]))
+
+        # Plain lists for bisect, which is faster than NumPy for a single day
+        self.start_lists = [starts.tolist() for starts in self.starts]
+        self.end_lists = [ends.tolist() for ends in self.ends]
+
+    def covers(self, first_ordinal, last_ordinal):
+        first = date(self.first_year, 1, 1).toordinal()
+        last = date(self.last_year, 12, 31).toordinal()
+        return first_ordinal >= first and last_ordinal <= last
+
+    def flags(self, ordinals):
+        """Return the vacation flags of all cantons for an array of ordinals."""
+        flags = {}
+        for canton, starts, ends in zip(self.cantons, self.starts, self.ends):
+            # Last period starting on or before each day
+            current = np.searchsorted(starts, ordinals, side="right") - 1
+            days_since_start = ordinals - starts[current]
+            in_vacation = (current >= 0) & (ordinals <= ends[current])
+            first_week = in_vacation & (days_since_start < FIRST_WEEK_DAYS)
+
+            # Last period ending before each day
+            previous = np.searchsorted(ends, ordinals, side="left") - 1
+            days_since_end = ordinals - ends[previous]
+            week_after = (previous >= 0) & (days_since_end <= WEEK_AFTER_DAYS)
+
+            flags[f"IsVacation{canton}"] = in_vacation.astype(np.int8)
+            flags[f"{canton}_First_Week_of_Holiday"] = first_week.astype(
+                np.int8
+            )
+            flags[f"{canton}_Week_After_Holiday"] = week_after.astype(np.int8)
+        return flags
+
+    def flags_for_ordinal(self, ordinal):
+        """Scalar version of flags for a single day."""
+        flags = {}
+        for canton, starts, ends in zip(
+            self.cantons, self.start_lists, self.end_lists
+        ):
+            current = bisect_right(starts, ordinal) - 1
+            in_vacation = current >= 0 and ordinal <= ends[current]
+            first_week = (
+                in_vacation and ordinal - starts[current] < FIRST_WEEK_DAYS
             )
-            for start, end in periods
-        )
-        week_after_holiday = any(
-            is_date_in_range(
-                date_str,
-                (datetime.strptime(end, "%d.%m") + timedelta(days=1)).strftime(
-                    "%d.%m"
-                ),
-                (datetime.strptime(end, "%d.%m") + timedelta(days=7)).strftime(
-                    "%d.%m"
-                ),
+            previous = bisect_left(ends, ordinal) - 1
+            week_after = (
+                previous >= 0 and ordinal - ends[previous] <= WEEK_AFTER_DAYS
             )
-            for start, end in periods
-        )
-
-        # Ensure all keys match the model's expected format
-        canton_key = canton.replace(" ", "_")
-        vacations[f"IsVacation{canton_key}"] = int(in_vacation)
-        vacations[f"{canton_key}_First_Week_of_Holiday"] = int(
-            first_week_of_holiday
-        )
-        vacations[f"{canton_key}_Week_After_Holiday"] = int(week_after_holiday)
-
-    return vacations
+
+            flags[f"IsVacation{canton}"] = int(in_vacation)
+            flags[f"{canton}_First_Week_of_Holiday"] = int(first_week)
+            flags[f"{canton}_Week_After_Holiday"] = int(week_after)
+        return flags
+
+
+_calendar = None
+
+
+def get_vacation_calendar(first_ordinal, last_ordinal):
+    """Return a compiled calendar covering the given span of ordinals."""
+    global _calendar
+    if _calendar is None or not _calendar.covers(first_ordinal, last_ordinal):
+        first_year = date.fromordinal(int(first_ordinal)).year
+        last_year = date.fromordinal(int(last_ordinal)).year
+        if _calendar is not None:
+            first_year = min(first_year, _calendar.first_year)
+            last_year = max(last_year, _calendar.last_year)
+        _calendar = VacationCalendar(VACATION_PERIODS, first_year, last_year)
+    return _calendar
+
+
+def get_vacation_flags(dates):
+    """Vectorized vacation flags for an array of dates or day ordinals."""
+    ordinals = to_ordinals(dates)
+    calendar = get_vacation_calendar(ordinals.min(), ordinals.max())
+    return calendar.flags(ordinals)
+
+
+def get_vacation_data(date_str):
+    ordinal = datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    return get_vacation_calendar(ordinal, ordinal).flags_for_ordinal(ordinal)
@@ -1,83 +1,352 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from datetime import date
+
+import numpy as np
+
+from triage_trend.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+# Forecast keys in the order of the weather feature columns
+FORECAST_KEYS = [
+    "Avg_Temp",
+    "Max_Temp",
+    "Rain_Duration",
+    "Pressure",
+    "Radiation",
+    "Cloudiness",
+]
+
+# "static" serves WEATHER_FORECAST, "file" reads FORECAST_FILE
+FORECAST_PROVIDER = os.environ.get("FORECAST_PROVIDER", "static")
+FORECAST_FILE = os.environ.get("FORECAST_FILE", "data/forecast.json")
+FORECAST_CACHE_PATH = os.environ.get(
+    "FORECAST_CACHE_PATH", "data/cache/forecast.json"
+)
+FORECAST_REFRESH_SECONDS = float(
+    os.environ.get("FORECAST_REFRESH_SECONDS", 3600)
+)
+# A forecast older than this is reported as stale, but still used
+FORECAST_MAX_AGE_SECONDS = float(
+    os.environ.get("FORECAST_MAX_AGE_SECONDS", 6 * 3600)
+)
+
+WEATHER_FORECAST = {
+    "2024-08-24": {
+        "Avg_Temp": 23.5,
+        "Max_Temp": 30.0,
+        "Rain_Duration": 3.0,
+        "Pressure": 1008,
+        "Radiation": 200,
+        "Cloudiness": 0.7,
+    },
+    "2024-08-25": {
+        "Avg_Temp": 18.0,
+        "Max_Temp": 21.0,
+        "Rain_Duration": 3.5,
+        "Pressure": 1007,
+        "Radiation": 180,
+        "Cloudiness": 0.7,
+    },
+    "2024-08-26": {
+        "Avg_Temp": 16.5,
+        "Max_Temp": 19.0,
+        "Rain_Duration": 1.0,
+        "Pressure": 1010,
+        "Radiation": 190,
+        "Cloudiness": 0.4,
+    },
+    "2024-08-27": {
+        "Avg_Temp": 19.0,
+        "Max_Temp": 24.0,
+        "Rain_Duration": 0.5,
+        "Pressure": 1012,
+        "Radiation": 210,
+        "Cloudiness": 0.3,
+    },
+    "2024-08-28": {
+        "Avg_Temp": 21.5,
+        "Max_Temp": 28.0,
+        "Rain_Duration": 0.0,
+        "Pressure": 1015,
+        "Radiation": 220,
+        "Cloudiness": 0.2,
+    },
+    "2024-08-29": {
+        "Avg_Temp": 23.0,
+        "Max_Temp": 29.0,
+        "Rain_Duration": 0.0,
+        "Pressure": 1016,
+        "Radiation": 230,
+        "Cloudiness": 0.2,
+    },
+    "2024-08-30": {
+        "Avg_Temp": 22.5,
+        "Max_Temp": 28.0,
+        "Rain_Duration": 2.0,
+        "Pressure": 1009,
+        "Radiation": 200,
+        "Cloudiness": 0.6,
+    },
+    "2024-08-31": {
+        "Avg_Temp": 21.5,
+        "Max_Temp": 25.0,
+        "Rain_Duration": 2.5,
+        "Pressure": 1010,
+        "Radiation": 190,
+        "Cloudiness": 0.5,
+    },
+    "2024-09-01": {
+        "Avg_Temp": 20.0,
+        "Max_Temp": 23.0,
+        "Rain_Duration": 2.0,
+        "Pressure": 1011,
+        "Radiation": 195,
+        "Cloudiness": 0.5,
+    },
+    "2024-09-02": {
+        "Avg_Temp": 20.0,
+        "Max_Temp": 24.0,
+        "Rain_Duration": 0.0,
+        "Pressure": 1013,
+        "Radiation": 215,
+        "Cloudiness": 0.2,
+    },
+}
+
+
+class WeatherForecast(Mapping):
+    """Immutable forecast snapshot, mapping 'YYYY-MM-DD' to forecast dicts.
+
+    Days are stored as tuples in FORECAST_KEYS order. fetched_at and source
+    tell how old the forecast is and where it came from.
+    """
+
+    def __init__(self, days, fetched_at, source):
+        self.days = {
+            date_str: tuple(day[key] for key in FORECAST_KEYS)
+            for date_str, day in days.items()
+        }
+        # Day ordinals and values sorted by day, for vectorized lookups
+        ordinals = np.array(
+            [date.fromisoformat(date_str).toordinal() for date_str in days],
+            dtype=np.int64,
+        )
+        values = np.array(list(self.days.values()), dtype=np.float64)
+        order = np.argsort(ordinals)
+        self.ordinals = ordinals[order]
+        self.values = values.reshape(len(ordinals), len(FORECAST_KEYS))[order]
+        self.fetched_at = fetched_at
+        self.source = source
+        encoded = json.dumps(sorted(self.days.items())).encode()
+        self.version = hashlib.sha256(encoded).hexdigest()[:16]
+
+    def __getitem__(self, date_str):
+        return dict(zip(FORECAST_KEYS, self.days[date_str]))
+
+    def __iter__(self):
+        return iter(self.days)
+
+    def __len__(self):
+        return len(self.days)
+
+    def row(self, date_str):
+        """Values of a day in FORECAST_KEYS order, or None."""
+        return self.days.get(date_str)
+
+    def take(self, ordinals):
+        """Rows of an array of days and whether the forecast covers them."""
+        ordinals = np.asarray(ordinals)
+        if not len(self.ordinals):
+            rows = np.full((len(ordinals), len(FORECAST_KEYS)), np.nan)
+            return rows, np.zeros(len(ordinals), dtype=bool)
+        index = np.searchsorted(self.ordinals, ordinals)
+        index = np.minimum(index, len(self.ordinals) - 1)
+        return self.values[index], self.ordinals[index] == ordinals
+
+    def age(self, now=None):
+        return (time.time() if now is None else now) - self.fetched_at
+
+    def status(self, now=None):
+        age = self.age(now)
+        return {
+            "source": self.source,
+            "version": self.version,
+            "fetchedAt": self.fetched_at,
+            "ageSeconds": age,
+            "stale": age > FORECAST_MAX_AGE_SECONDS,
+            "firstDay": min(self.days, default=None),
+            "lastDay": max(self.days, default=None),
+        }
+
+    def to_json(self):
+        return {
+            "fetched_at": self.fetched_at,
+            "source": self.source,
+            "days": {date_str: self[date_str] for date_str in self.days},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["days"], data["fetched_at"], data["source"])
+
+
+class ForecastProvider(ABC):
+    """Source of daily forecasts keyed by 'YYYY-MM-DD'."""
+
+    name = "provider"
+    # Whether fetched forecasts are worth persisting across restarts
+    persistent = True
+
+    @abstractmethod
+    def fetch(self):
+        """Return a dict of days to dicts with the FORECAST_KEYS."""
+
+
+class StaticForecastProvider(ForecastProvider):
+    name = "static"
+    persistent = False
+
+    def __init__(self, days=WEATHER_FORECAST):
+        self.days = days
+
+    def fetch(self):
+        return self.days
+
+
+class FileForecastProvider(ForecastProvider):
+    """Reads a forecast JSON file, e.g. written by an external job."""
+
+    name = "file"
+
+    def __init__(self, path=FORECAST_FILE):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class ForecastStore:
+    """Holds the latest forecast and refreshes it from a provider.
+
+    Requests only read the current snapshot; fetching happens at startup and
+    in a background thread. Each snapshot is persisted so a restart can serve
+    the last forecast without fetching. Failed refreshes keep the previous
+    forecast.
+    """
+
+    def __init__(self, provider, cache_path=None):
+        self.provider = provider
+        self.cache_path = cache_path
+        self.forecast = None
+        self.last_error = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def current(self):
+        if self.forecast is None:
+            with self.lock:
+                if self.forecast is None:
+                    self.forecast = self.load()
+                    if self.forecast is None:
+                        self.forecast = self.fetch()
+                        self.save(self.forecast)
+        return self.forecast
+
+    def fetch(self):
+        return WeatherForecast(
+            self.provider.fetch(), time.time(), self.provider.name
+        )
+
+    def refresh(self):
+        try:
+            forecast = self.fetch()
+        except Exception as error:
+            logger.warning("Weather forecast refresh failed: %s", error)
+            self.last_error = str(error)
+            return False
+        self.forecast = forecast
+        self.last_error = None
+        self.save(forecast)
+        return True
+
+    def load(self):
+        if self.cache_path is None or not self.provider.persistent:
+            return None
+        try:
+            with open(self.cache_path) as f:
+                forecast = WeatherForecast.from_json(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        # Ignore a cache written by another provider
+        return forecast if forecast.source == self.provider.name else None
+
+    def save(self, forecast):
+        if self.cache_path is None or not self.provider.persistent:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(forecast.to_json(), f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # The cache only speeds up restarts, a read-only disk is fine
+            pass
+
+    def start(self, interval=FORECAST_REFRESH_SECONDS):
+        """Refresh the forecast every interval seconds in a daemon thread."""
+        if self.thread is not None:
+            return
+        self.current()
+
+        def run():
+            while not self.stop_event.wait(interval):
+                self.refresh()
+
+        self.thread = threading.Thread(
+            target=run, name="forecast-refresh", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def status(self):
+        return {**self.current().status(), "lastError": self.last_error}
+
+
+def create_forecast_provider(name=FORECAST_PROVIDER):
+    if name == "static":
+        return StaticForecastProvider()
+    if name == "file":
+        return FileForecastProvider()
+    raise ValueError(f"Unknown forecast provider '{name}'")
+
+
+_store = None
+
+
+def get_forecast_store():
+    global _store
+    if _store is None:
+        _store = ForecastStore(create_forecast_provider(), FORECAST_CACHE_PATH)
+    return _store
+
+
+@instrument("forecast")
 def get_weather_forecast():
-    return {
-        "2024-08-24": {
-            "Avg_Temp": 23.5,
-            "Max_Temp": 30.0,
-            "Rain_Duration": 3.0,
-            "Pressure": 1008,
-            "Radiation": 200,
-            "Cloudiness": 0.7,
-        },
-        "2024-08-25": {
-            "Avg_Temp": 18.0,
-            "Max_Temp": 21.0,
-            "Rain_Duration": 3.5,
-            "Pressure": 1007,
-            "Radiation": 180,
-            "Cloudiness": 0.7,
-        },
-        "2024-08-26": {
-            "Avg_Temp": 16.5,
-            "Max_Temp": 19.0,
-            "Rain_Duration": 1.0,
-            "Pressure": 1010,
-            "Radiation": 190,
-            "Cloudiness": 0.4,
-        },
-        "2024-08-27": {
-            "Avg_Temp": 19.0,
-            "Max_Temp": 24.0,
-            "Rain_Duration": 0.5,
-            "Pressure": 1012,
-            "Radiation": 210,
-            "Cloudiness": 0.3,
-        },
-        "2024-08-28": {
-            "Avg_Temp": 21.5,
-            "Max_Temp": 28.0,
-            "Rain_Duration": 0.0,
-            "Pressure": 1015,
-            "Radiation": 220,
-            "Cloudiness": 0.2,
-        },
-        "2024-08-29": {
-            "Avg_Temp": 23.0,
-            "Max_Temp": 29.0,
-            "Rain_Duration": 0.0,
-            "Pressure": 1016,
-            "Radiation": 230,
-            "Cloudiness": 0.2,
-        },
-        "2024-08-30": {
-            "Avg_Temp": 22.5,
-            "Max_Temp": 28.0,
-            "Rain_Duration": 2.0,
-            "Pressure": 1009,
-            "Radiation": 200,
-            "Cloudiness": 0.6,
-        },
-        "2024-08-31": {
-            "Avg_Temp": 21.5,
-            "Max_Temp": 25.0,
-            "Rain_Duration": 2.5,
-            "Pressure": 1010,
-            "Radiation": 190,
-            "Cloudiness": 0.5,
-        },
-        "2024-09-01": {
-            "Avg_Temp": 20.0,
-            "Max_Temp": 23.0,
-            "Rain_Duration": 2.0,
-            "Pressure": 1011,
-            "Radiation": 195,
-            "Cloudiness": 0.5,
-        },
-        "2024-09-02": {
-            "Avg_Temp": 20.0,
-            "Max_Temp": 24.0,
-            "Rain_Duration": 0.0,
-            "Pressure": 1013,
-            "Radiation": 215,
-            "Cloudiness": 0.2,
-        },
-    }
+    """The current forecast snapshot, fetched only if there is none yet."""
+    return get_forecast_store().current()
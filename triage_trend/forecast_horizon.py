@@ -0,0 +1,64 @@
+import os
+from datetime import date
+
+import numpy as np
+
+from triage_trend.compiled_model import QUANTILES
+from triage_trend.data_service.get_data import get_data_range
+from triage_trend.metrics import instrument
+from triage_trend.sites import get_model, get_quantile_models, get_site
+
+DEFAULT_HORIZON_DAYS = 14
+MAX_HORIZON_DAYS = int(os.environ.get("FORECAST_HORIZON_MAX_DAYS", 90))
+
+
+@instrument("horizon")
+def forecast_horizon(
+    start,
+    num_days=DEFAULT_HORIZON_DAYS,
+    model=None,
+    quantile_models=None,
+    site=None,
+):
+    """Predictions with intervals for num_days days from start.
+
+    The features of the whole horizon are assembled at once and every
+    model scores them in a single call. Intervals are clipped to contain
+    the prediction, which comes from a different model than the quantiles.
+    """
+    if isinstance(start, str):
+        start = date.fromisoformat(start)
+    if not 1 <= num_days <= MAX_HORIZON_DAYS:
+        raise ValueError(
+            f"The horizon must be between 1 and {MAX_HORIZON_DAYS} days"
+        )
+    site = get_site(site)
+    if model is None:
+        model, _ = get_model(site)
+    if quantile_models is None:
+        quantile_models = get_quantile_models(site)
+
+    features = get_data_range(start.toordinal(), num_days, site=site)
+    predictions = model.predict_features(features)
+    if len(quantile_models) == len(QUANTILES):
+        bounds = np.sort(
+            [
+                quantile_models[alpha].predict_features(features)
+                for alpha in QUANTILES
+            ],
+            axis=0,
+        )
+        lower = np.minimum(bounds[0], predictions)
+        upper = np.maximum(bounds[-1], predictions)
+    else:
+        lower = upper = np.full(num_days, np.nan)
+
+    return [
+        {
+            "date": date.fromordinal(start.toordinal() + i).isoformat(),
+            "prediction": float(predictions[i]),
+            "lower": None if np.isnan(lower[i]) else float(lower[i]),
+            "upper": None if np.isnan(upper[i]) else float(upper[i]),
+        }
+        for i in range(num_days)
+    ]
@@ -1,34 +1,78 @@
+import json
+import os
+
+import numpy as np
 import pandas as pd
 
+from triage_trend.data_service.dates import to_ordinals
+from triage_trend.data_service.moon_phase import get_moon_phases
+from triage_trend.data_service.public_holidays import get_public_holiday_flags
+from triage_trend.data_service.rolling_weather import (
+    ROLLING_WINDOW,
+    WEATHER_COLUMNS,
+    feature_name,
+    trailing_statistics,
+)
+from triage_trend.data_service.vacations import (
+    get_vacation_flags,
+    vacation_transitions,
+)
+from triage_trend.sites import get_site
+from triage_trend.source_files import (
+    compare_source,
+    fingerprint,
+    read_appended,
+)
 
-def load_data():
-    # Load existing datasets
-    weather_features_path = "data/weather_features.csv"
-    weather_df = pd.read_csv(weather_features_path)
+# Source paths and the cache directory come from the site, see sites.py
+DATASET_CACHE_FILE = "dataset.npz"
+DATASET_MANIFEST_FILE = "dataset.json"
+# Bump whenever the feature engineering changes to invalidate old caches
+DATASET_VERSION = 3
+# Trailing rows needed to recompute the derived features of appended days
+LOOKBACK_ROWS = 7
 
-    moon_path = "data/moon_phase.csv"
-    moon_df = pd.read_csv(moon_path)
+# Keys of the admission counts stored next to the dataset columns
+ADMISSION_DATES_KEY = "__admission_dates"
+ADMISSION_COUNTS_KEY = "__admission_counts"
 
-    vacations_path = "data/vacations.csv"
-    vacations_df = pd.read_csv(vacations_path)
 
-    new_data_path = "data/clienia_dataset.csv"  # Adjust this path as needed
-    new_df = pd.read_csv(new_data_path)
+def read_weather(source):
+    weather_df = pd.read_csv(source)
+    weather_df["Datum"] = pd.to_datetime(weather_df["Datum"])
+    # Timezone normalization
+    weather_df["Datum"] = weather_df["Datum"].dt.tz_localize(None)
+    return weather_df
 
-    public_holidays_path = "data/public_holidays.csv"
-    public_holidays_df = pd.read_csv(public_holidays_path)
 
-    # Ensure datetime formats
-    weather_df["Datum"] = pd.to_datetime(weather_df["Datum"])
-    moon_df["Date"] = pd.to_datetime(moon_df["Date"])
+def read_vacations(source):
+    vacations_df = pd.read_csv(source)
     vacations_df["Date"] = pd.to_datetime(vacations_df["Date"])
+    return vacations_df
+
+
+def read_admission_counts(source):
+    new_df = pd.read_csv(source)
     new_df["Fall_Eintritt_Datum"] = pd.to_datetime(
         new_df["Fall_Eintritt_Datum"], format="%m/%d/%y"
     )
-    public_holidays_df["Date"] = pd.to_datetime(public_holidays_df["Date"])
+    date_counts = new_df["Fall_Eintritt_Datum"].value_counts().reset_index()
+    date_counts.columns = ["Datum", "Date_Occurrences"]
+    return date_counts
 
-    # Timezone normalization
-    weather_df["Datum"] = weather_df["Datum"].dt.tz_localize(None)
+
+def merge_sources(weather_df, vacations_df, date_counts, vacation_cantons=()):
+    # Moon phases come from the cached ephemeris instead of a CSV
+    moon_df = pd.DataFrame({"Date": weather_df["Datum"].unique()})
+    moon_df["Moon Phase (%)"] = get_moon_phases(moon_df["Date"].to_numpy())
+
+    # Public holidays are derived from the same rules used when serving
+    public_holidays_df = pd.DataFrame(
+        {
+            "Date": moon_df["Date"],
+            **get_public_holiday_flags(moon_df["Date"].to_numpy()),
+        }
+    )
 
     # Merging datasets
     combined_df = pd.merge(
@@ -40,6 +84,17 @@ def load_data():
     )
     combined_df.drop(columns=["Date"], inplace=True)
 
+    # Cantons of the site that the vacations file lacks use the serving rules
+    missing = [
+        f"IsVacation{canton}"
+        for canton in vacation_cantons
+        if f"IsVacation{canton}" not in combined_df.columns
+    ]
+    if missing:
+        flags = get_vacation_flags(combined_df["Datum"].to_numpy())
+        for column in missing:
+            combined_df[column] = flags[column]
+
     # Merge with public holidays dataset
     combined_df = pd.merge(
         combined_df,
@@ -51,8 +106,6 @@ def load_data():
     combined_df.drop(columns=["Date"], inplace=True)
 
     # Count occurrences
-    date_counts = new_df["Fall_Eintritt_Datum"].value_counts().reset_index()
-    date_counts.columns = ["Datum", "Date_Occurrences"]
     combined_df = pd.merge(combined_df, date_counts, on="Datum", how="left")
     combined_df["Date_Occurrences"] = (
         combined_df["Date_Occurrences"].fillna(0).astype(int)
@@ -61,61 +114,239 @@ def load_data():
     # Weekday
     combined_df["Weekday"] = combined_df["Datum"].dt.day_name()
 
+    return combined_df
+
+
+def build_dataset(site=None):
+    site = get_site(site)
+    weather_df = read_weather(site.weather)
+    vacations_df = read_vacations(site.vacations)
+    date_counts = read_admission_counts(site.admissions)
+
+    combined_df = merge_sources(
+        weather_df, vacations_df, date_counts, site.vacation_cantons
+    )
     combined_df = add_holiday_and_weather_features(combined_df)
 
-    combined_df.to_csv("tempdata.csv")
+    return combined_df, date_counts
+
+
+def load_data(use_cache=True, site=None):
+    """Load the merged, feature-engineered dataset of a site.
+
+    The result is cached as typed columns in the site's cache directory,
+    keyed by a fingerprint of the source files. If the sources only had rows
+    appended since the cache was written, just the new days are merged.
+    """
+    site = get_site(site)
+    if not use_cache:
+        return build_dataset(site)[0]
 
+    sources = {
+        "weather": site.weather,
+        "vacations": site.vacations,
+        "admissions": site.admissions,
+    }
+    manifest = read_manifest(site.cache_dir)
+    cached = None
+    if (
+        manifest is not None
+        and manifest["version"] == DATASET_VERSION
+        and manifest.get("vacation_cantons") == list(site.vacation_cantons)
+    ):
+        changes = {
+            name: compare_source(path, manifest["sources"].get(name))
+            for name, path in sources.items()
+        }
+        statuses = {status for status, _ in changes.values()}
+        fingerprints = {name: info for name, (_, info) in changes.items()}
+        if statuses == {"unchanged"}:
+            cached = read_cache(site.cache_dir)[0]
+        elif "changed" not in statuses:
+            cached = update_dataset(manifest, changes, site)
+
+        if cached is not None:
+            if fingerprints != manifest["sources"]:
+                write_manifest(fingerprints, site)
+            return cached
+
+    combined_df, date_counts = build_dataset(site)
+    write_cache(combined_df, date_counts, site.cache_dir)
+    write_manifest(
+        {name: fingerprint(path) for name, path in sources.items()}, site
+    )
     return combined_df
 
 
-def add_holiday_and_weather_features(df):
-    """Add features for holiday periods and 5-day rolling mean for weather data."""
-    # Holiday-related features for each canton
-    cantons = [
-        "Aargau",
-        "Zug",
-        "Schwyz",
-        "St_gallen",
-        "Schaffhausen",
-        "Thurgau",
-        "Zurich",
-    ]
+def load_sites_data(sites, use_cache=True):
+    """Datasets of several sites in one long frame keyed by (Site, Datum).
 
-    for canton in cantons:
-        holiday_col = f"IsVacation{canton}"
-
-        if holiday_col in df.columns:
-            # Identify the week after a holiday ends (when the holiday switches from 1 to 0)
-            df[f"{canton}_Week_After_Holiday"] = (
-                (df[holiday_col] == 0) & (df[holiday_col].shift(7) == 1)
-            ).astype(int)
-
-            # Identify the first week of the holiday (when the holiday switches from 0 to 1)
-            df[f"{canton}_First_Week_of_Holiday"] = (
-                (df[holiday_col] == 1) & (df[holiday_col].shift(7) == 0)
-            ).astype(int)
-        else:
-            # If the holiday column doesn't exist, fill with zeros
-            df[f"{canton}_Week_After_Holiday"] = 0
-            df[f"{canton}_First_Week_of_Holiday"] = 0
-
-    # Compute 5-day rolling means for weather-related features
-    weather_columns = [
-        "Average_Temperature",
-        "Max_Temperature",
-        "Total_Rain_Duration",
-        "Average_Pressure",
-        "Average_Global_Radiation",
-        "Cloudiness",
+    Columns of cantons that a site does not use are missing (NaN) in its
+    rows, its schema only selects its own.
+    """
+    frames = [
+        load_data(use_cache, site).assign(Site=get_site(site).name)
+        for site in sites
     ]
+    return (
+        pd.concat(frames, ignore_index=True)
+        .set_index(["Site", "Datum"])
+        .sort_index()
+    )
+
+
+def site_frame(sites_df, site_name):
+    """Rows of one site from load_sites_data, like load_data returns them."""
+    return sites_df.xs(site_name, level="Site").reset_index()
+
+
+def update_dataset(manifest, changes, site):
+    """Append new days to the cached dataset, or None if not possible."""
+    combined_df, date_counts = read_cache(site.cache_dir)
+    last_date = combined_df["Datum"].iloc[-1]
+
+    weather_status, _ = changes["weather"]
+    weather_df = None
+    if weather_status == "appended":
+        weather_df = read_weather(
+            read_appended(site.weather, manifest["sources"]["weather"])
+        )
+        if (weather_df["Datum"] <= last_date).any():
+            return None
+
+    vacations_df = read_vacations(site.vacations)
+    if changes["vacations"][0] == "appended":
+        appended = read_vacations(
+            read_appended(site.vacations, manifest["sources"]["vacations"])
+        )
+        if (appended["Date"] <= last_date).any():
+            return None
+
+    if changes["admissions"][0] == "appended":
+        new_counts = read_admission_counts(
+            read_appended(site.admissions, manifest["sources"]["admissions"])
+        )
+        date_counts = (
+            pd.concat([date_counts, new_counts])
+            .groupby("Datum", as_index=False)["Date_Occurrences"]
+            .sum()
+        )
+        # Admissions are the only source that may touch existing days
+        updated = combined_df["Datum"].map(
+            date_counts.set_index("Datum")["Date_Occurrences"]
+        )
+        combined_df["Date_Occurrences"] = updated.fillna(0).astype(int)
+
+    if weather_df is not None and len(weather_df):
+        new_df = merge_sources(
+            weather_df, vacations_df, date_counts, site.vacation_cantons
+        )
+        raw_columns = list(new_df.columns)
+        tail_df = combined_df[raw_columns].iloc[-LOOKBACK_ROWS:]
+        new_df = add_holiday_and_weather_features(
+            pd.concat([tail_df, new_df], ignore_index=True)
+        ).iloc[len(tail_df) :]
+        combined_df = pd.concat([combined_df, new_df], ignore_index=True)
+
+    write_cache(combined_df, date_counts, site.cache_dir)
+    return combined_df
+
 
-    df.set_index("Datum", inplace=True)
-    df_rolling_means = (
-        df[weather_columns].rolling(window=5).mean().shift(1)
-    )  # 5-day rolling means, shift to previous day
-    df = df.join(df_rolling_means, rsuffix="_5day_mean")
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, DATASET_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(sources, site):
+    os.makedirs(site.cache_dir, exist_ok=True)
+    path = os.path.join(site.cache_dir, DATASET_MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "version": DATASET_VERSION,
+                # Cantons missing from the vacations file are derived
+                "vacation_cantons": list(site.vacation_cantons),
+                "sources": sources,
+            },
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def read_cache(cache_dir):
+    path = os.path.join(cache_dir, DATASET_CACHE_FILE)
+    with np.load(path, allow_pickle=False) as data:
+        date_counts = pd.DataFrame(
+            {
+                "Datum": data[ADMISSION_DATES_KEY],
+                "Date_Occurrences": data[ADMISSION_COUNTS_KEY],
+            }
+        )
+        columns = [
+            name
+            for name in data.files
+            if name not in (ADMISSION_DATES_KEY, ADMISSION_COUNTS_KEY)
+        ]
+        combined_df = pd.DataFrame({name: data[name] for name in columns})
+    for name in combined_df.columns:
+        # String columns come back as fixed width unicode, restore objects
+        if combined_df[name].dtype.kind == "U":
+            combined_df[name] = combined_df[name].astype(object)
+    return combined_df, date_counts
+
+
+def write_cache(combined_df, date_counts, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {
+        name: (
+            combined_df[name].to_numpy(dtype=str)
+            if combined_df[name].dtype == object
+            else combined_df[name].to_numpy()
+        )
+        for name in combined_df.columns
+    }
+    arrays[ADMISSION_DATES_KEY] = date_counts["Datum"].to_numpy()
+    arrays[ADMISSION_COUNTS_KEY] = date_counts["Date_Occurrences"].to_numpy()
+    path = os.path.join(cache_dir, DATASET_CACHE_FILE)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def vacation_transition_features(df):
+    """First week and week after columns for every IsVacation column.
+
+    All cantons are computed at once, see vacation_transitions.
+    """
+    vacation_columns = [c for c in df.columns if c.startswith("IsVacation")]
+    first_week, week_after = vacation_transitions(
+        df[vacation_columns].to_numpy(dtype=np.float64),
+        to_ordinals(df["Datum"].to_numpy()),
+    )
+    features = {}
+    for i, column in enumerate(vacation_columns):
+        canton = column[len("IsVacation") :]
+        features[f"{canton}_Week_After_Holiday"] = week_after[:, i]
+        features[f"{canton}_First_Week_of_Holiday"] = first_week[:, i]
+    return features
+
+
+def add_holiday_and_weather_features(df):
+    """Add features for holiday periods and 5-day rolling mean for weather data."""
+    features = vacation_transition_features(df)
 
-    # Reset index after joining
-    df.reset_index(inplace=True)
+    # 5-day rolling means of the previous days, shared with serving
+    rolling_means = trailing_statistics(
+        df[WEATHER_COLUMNS].to_numpy(), ROLLING_WINDOW
+    )["mean"]
+    for i, column in enumerate(WEATHER_COLUMNS):
+        features[feature_name(column)] = rolling_means[:, i]
 
-    return df
+    # Appended in one step; replaces columns that are recomputed, e.g. for
+    # the days appended to the cache
+    df = df.drop(columns=[name for name in features if name in df.columns])
+    return pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
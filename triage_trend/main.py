@@ -1,17 +1,52 @@
-from typing import Any, Dict
+import asyncio
+from datetime import date, timedelta
+from functools import partial
+from typing import Any, Dict, List, Optional
 
-import joblib
-import pandas as pd
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-from triage_trend.data_service.feature_map import feature_map
-from triage_trend.data_service.get_data import get_data
+from triage_trend.batching import create_batcher
+from triage_trend.compiled_model import QUANTILES, model_version
+from triage_trend.data_service.feature_store import get_feature_calendar
+from triage_trend.data_service.get_data import (
+    get_data_batch,
+    get_inputs_fingerprint,
+    get_rolling_weather,
+)
+from triage_trend.data_service.weather_forecast import (
+    get_forecast_store,
+    get_weather_forecast,
+)
+from triage_trend.forecast_horizon import (
+    DEFAULT_HORIZON_DAYS,
+    MAX_HORIZON_DAYS,
+    forecast_horizon,
+)
+from triage_trend.metrics import METRICS_ENABLED, instrument, render_metrics
+from triage_trend.prediction_cache import cache_key, create_prediction_cache
+from triage_trend.sites import (
+    MAX_RESIDENT_SITES,
+    get_model,
+    get_site,
+    get_sites,
+)
 
-MODEL_PATH = "./model/gb_model.pkl"
+MAX_BATCH_DAYS = 366
+# Days the service predicts, including the last day of a range or horizon
+MIN_DATE = date(1900, 1, 1)
+MAX_DATE = date(2100, 12, 31)
 
-model = joblib.load(MODEL_PATH)
+# Build the feature stores of the default site at startup instead of on the
+# first request, other sites are loaded when first requested
+get_feature_calendar()
+get_rolling_weather()
+get_inputs_fingerprint()
+# Forecasts are fetched in the background, never on the request path
+get_forecast_store().start()
+prediction_cache = create_prediction_cache()
 app = FastAPI()
 
 app.add_middleware(
@@ -25,6 +60,24 @@ app.add_middleware(
 
 class PredictionRequest(BaseModel):
     date: str  # Date in 'YYYY-MM-DD' format
+    site: Optional[str] = None  # Configured site, the default one if unset
+
+
+class BatchPredictionRequest(BaseModel):
+    dates: List[str]  # Dates in 'YYYY-MM-DD' format
+    site: Optional[str] = None
+
+
+class RangePredictionRequest(BaseModel):
+    start: str  # First date in 'YYYY-MM-DD' format
+    end: str  # Last date (inclusive) in 'YYYY-MM-DD' format
+    site: Optional[str] = None
+
+
+class HorizonRequest(BaseModel):
+    start: str  # First date in 'YYYY-MM-DD' format
+    days: int = DEFAULT_HORIZON_DAYS
+    site: Optional[str] = None
 
 
 class PredictionResponse(BaseModel):
@@ -32,16 +85,230 @@ class PredictionResponse(BaseModel):
     featuresUsed: Dict[str, Any]
 
 
+class DatedPredictionResponse(PredictionResponse):
+    date: str
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[DatedPredictionResponse]
+
+
+class HorizonPrediction(BaseModel):
+    date: str
+    prediction: float
+    lower: Optional[float]
+    upper: Optional[float]
+
+
+class HorizonResponse(BaseModel):
+    quantiles: List[float]
+    predictions: List[HorizonPrediction]
+
+
+@instrument("cache")
+def cached_results(keys):
+    return [prediction_cache.get(key) for key in keys]
+
+
+@instrument("model")
+def score(model, features):
+    return model.predict_features(features)
+
+
+@instrument("response")
+def response_features(site, features):
+    return site.schema.response_features(features)
+
+
+def predict_site(site, date_strs):
+    """Predictions of several days, served from the cache where possible.
+
+    Cache keys contain the site, the model version, a hash of the site's
+    stored inputs and the forecast version. A retrained model or a new
+    forecast gets new keys, and so does a worker that loaded changed
+    weather or calendar inputs, also in a shared cache.
+    """
+    model, version = get_model(site)
+    inputs_hash = (
+        f"{get_inputs_fingerprint(site)}:{get_weather_forecast().version}"
+    )
+    keys = [cache_key(site.name, d, version, inputs_hash) for d in date_strs]
+    results = cached_results(keys)
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        # Score all uncached days with a single model call
+        features = get_data_batch([date_strs[i] for i in missing], site)
+        predictions = score(model, features)
+        for i, prediction, features_used in zip(
+            missing, predictions.tolist(), response_features(site, features)
+        ):
+            results[i] = {
+                "prediction": prediction,
+                "featuresUsed": features_used,
+            }
+            prediction_cache.set(keys[i], results[i])
+    return results
+
+
+@instrument("predict")
+def predict(items):
+    """Predictions of (site, date) items, one model call per site."""
+    indices_by_site = {}
+    for i, (site_name, _) in enumerate(items):
+        indices_by_site.setdefault(site_name, []).append(i)
+
+    results = [None] * len(items)
+    for site_name, indices in indices_by_site.items():
+        site_results = predict_site(
+            get_site(site_name), [items[i][1] for i in indices]
+        )
+        for i, result in zip(indices, site_results):
+            results[i] = result
+    return results
+
+
+# Feature assembly and scoring run in a thread pool, and concurrent
+# requests share one model call
+batcher = create_batcher(predict)
+
+
+def resolve_site(site_name):
+    try:
+        return get_site(site_name)
+    except KeyError:
+        raise HTTPException(
+            status_code=404, detail=f"Unknown site '{site_name}'"
+        )
+
+
+async def predict_dates(site, date_strs):
+    if len(date_strs) > MAX_BATCH_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_DAYS} days can be predicted at once",
+        )
+
+    items = [(site.name, date_str) for date_str in date_strs]
+    results = await batcher.submit(items) if items else []
+    return BatchPredictionResponse(
+        predictions=[
+            DatedPredictionResponse(date=date_str, **result)
+            for date_str, result in zip(date_strs, results)
+        ]
+    )
+
+
+def parse_date(date_str):
+    try:
+        day = date.fromisoformat(date_str)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid date '{date_str}'"
+        )
+    check_date_span(day)
+    return day
+
+
+def check_date_span(day):
+    if not MIN_DATE <= day <= MAX_DATE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dates must be between {MIN_DATE} and {MAX_DATE}",
+        )
+
+
 @app.post("/predict", response_model=PredictionResponse)
-async def predict(data: PredictionRequest):
-    features = get_data(data.date)
-    input_df = pd.DataFrame([features])
-    input_df = input_df[model.named_steps["preprocessor"].feature_names_in_]
-    prediction = model.predict(input_df)
-    features_camel_case = {
-        feature_map.get(k, k): v for k, v in features.items()
-    }
+async def predict_date(data: PredictionRequest):
+    site = resolve_site(data.site)
+    # Validated here, an invalid day would fail the whole coalesced batch
+    date_str = parse_date(data.date).isoformat()
+    results = await batcher.submit([(site.name, date_str)])
+    return PredictionResponse(**results[0])
 
-    return PredictionResponse(
-        prediction=prediction[0], featuresUsed=features_camel_case
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(data: BatchPredictionRequest):
+    site = resolve_site(data.site)
+    date_strs = [parse_date(d).isoformat() for d in data.dates]
+    return await predict_dates(site, date_strs)
+
+
+@app.post("/predict/range", response_model=BatchPredictionResponse)
+async def predict_range(data: RangePredictionRequest):
+    site = resolve_site(data.site)
+    start = parse_date(data.start)
+    end = parse_date(data.end)
+    if end < start:
+        raise HTTPException(
+            status_code=400, detail="'end' must not be before 'start'"
+        )
+    num_days = (end - start).days + 1
+    if num_days > MAX_BATCH_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_DAYS} days can be predicted at once",
+        )
+    date_strs = [
+        (start + timedelta(days=i)).isoformat() for i in range(num_days)
+    ]
+    return await predict_dates(site, date_strs)
+
+
+@app.post("/predict/horizon", response_model=HorizonResponse)
+async def predict_horizon(data: HorizonRequest):
+    site = resolve_site(data.site)
+    start = parse_date(data.start)
+    if not 1 <= data.days <= MAX_HORIZON_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'days' must be between 1 and {MAX_HORIZON_DAYS}",
+        )
+    check_date_span(start + timedelta(days=data.days - 1))
+    # The whole horizon is one model call, so it skips batching and cache
+    predictions = await asyncio.get_running_loop().run_in_executor(
+        batcher.executor,
+        partial(forecast_horizon, start, data.days, site=site),
     )
+    return HorizonResponse(quantiles=list(QUANTILES), predictions=predictions)
+
+
+@app.get("/sites")
+async def list_sites():
+    sites, default = get_sites()
+    return {
+        "default": default,
+        "maxResidentSites": MAX_RESIDENT_SITES,
+        "sites": {
+            name: {
+                "vacationCantons": list(site.vacation_cantons),
+                "holidayCantons": list(site.holiday_cantons),
+            }
+            for name, site in sites.items()
+        },
+    }
+
+
+@app.get("/forecast/status")
+async def forecast_status():
+    return get_forecast_store().status()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return prediction_cache.stats()
+
+
+if METRICS_ENABLED:
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        sites, _ = get_sites()
+        versions = {
+            name: model_version(site.compiled_model_dir, site.pickle_model_path)
+            for name, site in sites.items()
+        }
+        return PlainTextResponse(
+            render_metrics(prediction_cache.stats(), versions),
+            media_type="text/plain; version=0.0.4",
+        )
@@ -0,0 +1,183 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+# With 0 nothing is timed, instrumented functions are left unwrapped
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Upper bounds of the buckets, in seconds and in items
+LATENCY_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class Histogram:
+    """Bucket counts, sum and count of observed values.
+
+    The buckets are allocated once, an observation only increments them.
+    """
+
+    def __init__(self, buckets):
+        self.bounds = list(buckets)
+        # The last bucket counts the values above all bounds. A list is
+        # incremented faster than a numpy array from Python.
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return np.cumsum(self.counts), self.sum
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per label value."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def get(self, value):
+        """Histogram of a label value, created once at registration."""
+        with self.lock:
+            if value not in self.histograms:
+                self.histograms[value] = Histogram(self.buckets)
+            return self.histograms[value]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for value, histogram in sorted(self.histograms.items()):
+            label = f'{self.label}="{value}"'
+            cumulative, total = histogram.snapshot()
+            bounds = [repr(float(b)) for b in histogram.bounds] + ["+Inf"]
+            for bound, count in zip(bounds, cumulative.tolist()):
+                lines.append(
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {count}'
+                )
+            lines.append(f"{self.name}_sum{{{label}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative[-1]}")
+        return lines
+
+
+stage_seconds = HistogramFamily(
+    "triage_stage_seconds",
+    "Time spent in each stage of a prediction.",
+    "stage",
+    LATENCY_BUCKETS,
+)
+batch_sizes = HistogramFamily(
+    "triage_batch_items",
+    "Days scored per call of the prediction batcher.",
+    "batcher",
+    SIZE_BUCKETS,
+)
+
+
+def instrument(stage):
+    """Decorator timing every call of a function as a prediction stage.
+
+    The function is returned unchanged if metrics are disabled.
+    """
+
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        histogram = stage_seconds.get(stage)
+        clock = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(clock() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def render_samples(name, help_text, samples, metric_type="counter"):
+    """Lines of a counter or gauge, samples maps label strings to values."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples.items():
+        lines.append(
+            f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+        )
+    return lines
+
+
+def render_metrics(cache_stats, model_versions):
+    """All metrics in the Prometheus text format.
+
+    cache_stats are the counters of the prediction cache and model_versions
+    maps site names to the version of their model artifacts.
+    """
+    lines = stage_seconds.render() + batch_sizes.render()
+    for counter in (
+        "hits",
+        "shared_hits",
+        "misses",
+        "expirations",
+        "evictions",
+    ):
+        lines += render_samples(
+            f"triage_prediction_cache_{counter}_total",
+            f"Prediction cache {counter.replace('_', ' ')}.",
+            {"": cache_stats[counter]},
+        )
+    hits = cache_stats["hits"] + cache_stats["shared_hits"]
+    lookups = hits + cache_stats["misses"]
+    lines += render_samples(
+        "triage_prediction_cache_hit_ratio",
+        "Share of cache lookups that were hits, local or shared.",
+        {"": hits / lookups if lookups else 0.0},
+        "gauge",
+    )
+    lines += render_samples(
+        "triage_prediction_cache_entries",
+        "Predictions held in the local cache.",
+        {"": cache_stats["size"]},
+        "gauge",
+    )
+    lines += render_samples(
+        "triage_model_info",
+        "Version of the model artifacts of each site.",
+        {
+            f'site="{site}",version="{version}"': 1
+            for site, version in model_versions.items()
+        },
+        "gauge",
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,422 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import (
+    GradientBoostingRegressor,
+    RandomForestRegressor,
+    StackingRegressor,
+)
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+from triage_trend.load_data import load_data
+
+COMPARISON_CACHE_DIR = "data/cache/model_comparison"
+CHECKPOINT_PATH = os.path.join(COMPARISON_CACHE_DIR, "trials.jsonl")
+REPORT_DIR = "reports"
+REPORT_PATH = os.path.join(REPORT_DIR, "model_comparison.md")
+REPORT_JSON_PATH = os.path.join(REPORT_DIR, "model_comparison.json")
+MATRIX_NAMES = ["X_train", "X_test", "y_train", "y_test"]
+
+N_ITER = 50
+CV_FOLDS = 3
+RANDOM_STATE = 42
+
+
+def polynomial_regression():
+    return Pipeline(
+        [
+            ("poly", PolynomialFeatures(degree=2)),
+            ("scaler", StandardScaler()),
+            ("regressor", LinearRegression()),
+        ]
+    )
+
+
+def random_forest():
+    return RandomForestRegressor(random_state=RANDOM_STATE)
+
+
+def gradient_boosting():
+    return GradientBoostingRegressor(random_state=RANDOM_STATE)
+
+
+def neural_network():
+    return Pipeline(
+        [
+            ("scaler", StandardScaler()),
+            (
+                "regressor",
+                MLPRegressor(
+                    random_state=RANDOM_STATE,
+                    max_iter=1500,
+                    hidden_layer_sizes=(100, 50),
+                    learning_rate_init=0.01,
+                ),
+            ),
+        ]
+    )
+
+
+def ensemble_stacking():
+    return StackingRegressor(
+        estimators=[
+            ("rf", RandomForestRegressor(random_state=RANDOM_STATE)),
+            ("gb", GradientBoostingRegressor(random_state=RANDOM_STATE)),
+        ],
+        final_estimator=LinearRegression(),
+    )
+
+
+# Model name -> (estimator factory, parameter distributions or None).
+# Models with distributions get a randomized search over N_ITER candidates.
+CANDIDATES = {
+    "Polynomial Regression": (polynomial_regression, None),
+    "Random Forest": (
+        random_forest,
+        {
+            "n_estimators": [100, 200, 300],
+            "max_depth": [None, 10, 20, 30],
+            "min_samples_split": [2, 5, 10],
+            "min_samples_leaf": [1, 2, 4],
+        },
+    ),
+    "Gradient Boosting": (
+        gradient_boosting,
+        {
+            "n_estimators": [100, 200, 300],
+            "learning_rate": [0.01, 0.1, 0.2],
+            "max_depth": [3, 5, 7],
+            "subsample": [0.8, 1.0],
+        },
+    ),
+    "Neural Network": (neural_network, None),
+    "Ensemble Stacking": (ensemble_stacking, None),
+}
+
+
+def preprocess_data(df):
+    df["Weekday"] = df["Weekday"].map(
+        {
+            "Monday": 0,
+            "Tuesday": 1,
+            "Wednesday": 2,
+            "Thursday": 3,
+            "Friday": 4,
+            "Saturday": 5,
+            "Sunday": 6,
+        }
+    )
+
+    # Handle datetime columns
+    for col in df.columns:
+        if np.issubdtype(df[col].dtype, np.datetime64):
+            df[f"{col}_ordinal"] = pd.to_datetime(df[col]).map(
+                pd.Timestamp.toordinal
+            )
+            df = df.drop(columns=[col])
+
+    # Ensure all features are numeric
+    for col in df.columns:
+        if df[col].dtype == "object":
+            df[col] = df[col].astype("category").cat.codes
+
+    # Fill missing values
+    df = df.fillna(df.mean())
+
+    # Add IsWeekend feature
+    df["IsWeekend"] = df["Weekday"].isin([5, 6]).astype(int)
+
+    X = df.drop(columns=["Date_Occurrences"])
+    y = df["Date_Occurrences"]
+
+    return X, y
+
+
+def prepare_matrices(cache_dir=COMPARISON_CACHE_DIR):
+    """Preprocess and split the dataset once, stored as .npy files.
+
+    Returns the directory of the matrices, named by a hash of their
+    contents so trials of different data never mix.
+    """
+    X, y = preprocess_data(load_data())
+    if not np.all([np.issubdtype(dtype, np.number) for dtype in X.dtypes]):
+        raise ValueError(
+            "All features must be numeric. Check data preprocessing."
+        )
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.3, random_state=RANDOM_STATE
+    )
+    matrices = {
+        "X_train": X_train.to_numpy(dtype=np.float64),
+        "X_test": X_test.to_numpy(dtype=np.float64),
+        "y_train": y_train.to_numpy(dtype=np.float64),
+        "y_test": y_test.to_numpy(dtype=np.float64),
+    }
+    digest = hashlib.sha256()
+    for name in MATRIX_NAMES:
+        digest.update(np.ascontiguousarray(matrices[name]).tobytes())
+    matrices_dir = os.path.join(cache_dir, digest.hexdigest()[:16])
+
+    if not os.path.exists(os.path.join(matrices_dir, "y_test.npy")):
+        os.makedirs(matrices_dir, exist_ok=True)
+        # y_test is written last and marks a complete set
+        for name in MATRIX_NAMES:
+            np.save(os.path.join(matrices_dir, f"{name}.npy"), matrices[name])
+    return matrices_dir
+
+
+_matrices = {}
+
+
+def load_matrices(matrices_dir):
+    """Memory-mapped matrices, so all workers share the page cache."""
+    if matrices_dir not in _matrices:
+        _matrices[matrices_dir] = {
+            name: np.load(
+                os.path.join(matrices_dir, f"{name}.npy"), mmap_mode="r"
+            )
+            for name in MATRIX_NAMES
+        }
+    return _matrices[matrices_dir]
+
+
+def trial_key(kind, model_name, params, matrices_dir):
+    encoded = json.dumps(
+        [kind, model_name, params, os.path.basename(matrices_dir)],
+        sort_keys=True,
+    )
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def build_estimator(model_name, params):
+    factory, _ = CANDIDATES[model_name]
+    return factory().set_params(**params)
+
+
+def run_trial(trial):
+    """Fit one trial in a worker process and return its record.
+
+    "cv" trials score parameters with K-fold cross validation on the
+    training set, "final" trials fit on the training set and evaluate on
+    the test set.
+    """
+    matrices = load_matrices(trial["matrices_dir"])
+    X_train = matrices["X_train"]
+    y_train = matrices["y_train"]
+    estimator = build_estimator(trial["model"], trial["params"])
+
+    start = time.perf_counter()
+    if trial["kind"] == "cv":
+        scores = []
+        folds = KFold(n_splits=CV_FOLDS).split(X_train)
+        for train_index, test_index in folds:
+            fold_estimator = clone(estimator)
+            fold_estimator.fit(X_train[train_index], y_train[train_index])
+            scores.append(
+                fold_estimator.score(X_train[test_index], y_train[test_index])
+            )
+        metrics = {"cv_r2": float(np.mean(scores))}
+    else:
+        estimator.fit(X_train, y_train)
+        y_test = matrices["y_test"]
+        y_pred = estimator.predict(matrices["X_test"])
+        metrics = {
+            "mse": float(mean_squared_error(y_test, y_pred)),
+            "mae": float(mean_absolute_error(y_test, y_pred)),
+            "r2": float(r2_score(y_test, y_pred)),
+        }
+
+    return {
+        "key": trial["key"],
+        "kind": trial["kind"],
+        "model": trial["model"],
+        "params": trial["params"],
+        **metrics,
+        "fit_time": time.perf_counter() - start,
+    }
+
+
+def read_checkpoint(path=CHECKPOINT_PATH):
+    records = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                # A line cut off by an interruption is simply rerun
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["key"]] = record
+    return records
+
+
+def append_checkpoint(record, path=CHECKPOINT_PATH):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def run_trials(trials, records, max_workers, checkpoint_path):
+    """Run the trials without a record in parallel, checkpointing each."""
+    pending = [trial for trial in trials if trial["key"] not in records]
+    if not pending:
+        return
+    print(f"Running {len(pending)} trials, {len(trials) - len(pending)} done")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_trial, trial) for trial in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            records[record["key"]] = record
+            append_checkpoint(record, checkpoint_path)
+
+
+def compare_models(
+    n_iter=N_ITER,
+    max_workers=None,
+    cache_dir=COMPARISON_CACHE_DIR,
+    checkpoint_path=CHECKPOINT_PATH,
+):
+    """Tune and evaluate every candidate, resuming from the checkpoint.
+
+    Like RandomizedSearchCV, the parameters with the best cross validated
+    R^2 are refit on the whole training set before the test evaluation.
+    """
+    matrices_dir = prepare_matrices(cache_dir)
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    records = read_checkpoint(checkpoint_path)
+
+    def make_trial(kind, model_name, params):
+        return {
+            "key": trial_key(kind, model_name, params, matrices_dir),
+            "kind": kind,
+            "model": model_name,
+            "params": params,
+            "matrices_dir": matrices_dir,
+        }
+
+    cv_trials = [
+        make_trial("cv", model_name, params)
+        for model_name, (_, distributions) in CANDIDATES.items()
+        if distributions is not None
+        for params in ParameterSampler(
+            distributions, n_iter=n_iter, random_state=RANDOM_STATE
+        )
+    ]
+    run_trials(cv_trials, records, max_workers, checkpoint_path)
+
+    best_params = {}
+    for trial in cv_trials:
+        record = records[trial["key"]]
+        best = best_params.get(trial["model"])
+        if best is None or record["cv_r2"] > best["cv_r2"]:
+            best_params[trial["model"]] = record
+
+    final_trials = [
+        make_trial(
+            "final",
+            model_name,
+            best_params[model_name]["params"]
+            if model_name in best_params
+            else {},
+        )
+        for model_name in CANDIDATES
+    ]
+    run_trials(final_trials, records, max_workers, checkpoint_path)
+
+    results = []
+    for trial in final_trials:
+        record = dict(records[trial["key"]])
+        search = [
+            records[t["key"]]
+            for t in cv_trials
+            if t["model"] == record["model"]
+        ]
+        record["cv_r2"] = best_params.get(record["model"], {}).get("cv_r2")
+        record["search_trials"] = len(search)
+        record["search_time"] = sum(r["fit_time"] for r in search)
+        results.append(record)
+    return sorted(results, key=lambda record: record["mse"])
+
+
+def format_value(value, digits=2):
+    if value is None:
+        return "-"
+    return f"{value:.{digits}f}"
+
+
+def write_report(results, path=REPORT_PATH, json_path=REPORT_JSON_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(json_path, "w") as f:
+        json.dump(results, f, indent=2)
+
+    lines = [
+        "# Model comparison",
+        "",
+        "Test set metrics, sorted by MSE. CV R^2 is the best cross "
+        "validated score of the randomized search.",
+        "",
+        "| Model | MSE | MAE | R^2 | CV R^2 | Fit time (s) | Search "
+        "trials | Search time (s) | Parameters |",
+        "| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | --- |",
+    ]
+    for record in results:
+        params = ", ".join(
+            f"{name}={value}"
+            for name, value in sorted(record["params"].items())
+        )
+        lines.append(
+            f"| {record['model']} | {format_value(record['mse'])} "
+            f"| {format_value(record['mae'])} | {format_value(record['r2'])} "
+            f"| {format_value(record['cv_r2'])} "
+            f"| {format_value(record['fit_time'])} "
+            f"| {record['search_trials']} "
+            f"| {format_value(record['search_time'])} | {params or '-'} |"
+        )
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tune and compare regression models"
+    )
+    parser.add_argument(
+        "--n-iter",
+        type=int,
+        default=N_ITER,
+        help="Parameter candidates per randomized search",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes"
+    )
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    results = compare_models(n_iter=args.n_iter, max_workers=args.workers)
+    write_report(
+        results, args.report, os.path.splitext(args.report)[0] + ".json"
+    )
+    for record in results:
+        print(
+            f"{record['model']}: MSE = {record['mse']:.2f}, "
+            f"MAE = {record['mae']:.2f}, R^2 = {record['r2']:.2f}"
+        )
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
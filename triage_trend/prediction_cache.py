@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+# Seconds a cached prediction stays valid, 0 disables expiry
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 3600))
+# SQLite file shared by all workers on a host, unset for a per-process cache
+PREDICTION_CACHE_PATH = os.environ.get("PREDICTION_CACHE_PATH")
+
+
+def cache_key(site_name, date_str, model_version, inputs_hash):
+    return f"{site_name}|{date_str}|{model_version}|{inputs_hash}"
+
+
+class SQLiteBackend:
+    """Cache store shared between processes through an SQLite file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        with self.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+
+    def connection(self):
+        # sqlite3 connections must not be shared between threads
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key, now):
+        row = (
+            self.connection()
+            .execute(
+                "SELECT value FROM predictions WHERE key = ? AND expires > ?",
+                (key, now),
+            )
+            .fetchone()
+        )
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value, expires):
+        with self.connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+
+    def clear(self):
+        with self.connection() as connection:
+            connection.execute("DELETE FROM predictions")
+
+
+class PredictionCache:
+    """LRU cache of prediction results with a time to live.
+
+    Keys contain the model version and a hash of the inputs, so results of
+    an old model or forecast are never returned; they age out of the LRU.
+    A shared backend, if given, is consulted on local misses.
+    """
+
+    def __init__(
+        self,
+        max_entries=PREDICTION_CACHE_SIZE,
+        ttl=PREDICTION_CACHE_TTL,
+        backend=None,
+        clock=time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def expires(self, now):
+        return now + self.ttl if self.ttl > 0 else float("inf")
+
+    def get(self, key):
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self.entries[key]
+                self.counters["expirations"] += 1
+
+        if self.backend is not None:
+            value = self.backend.get(key, now)
+            if value is not None:
+                with self.lock:
+                    self.counters["shared_hits"] += 1
+                    self.store_local(key, value, self.expires(now))
+                return value
+
+        with self.lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        expires = self.expires(self.clock())
+        with self.lock:
+            self.store_local(key, value, expires)
+        if self.backend is not None:
+            self.backend.set(key, value, expires)
+
+    def store_local(self, key, value, expires):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (value, expires)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "shared": self.backend is not None,
+            }
+
+
+def create_prediction_cache():
+    backend = None
+    if PREDICTION_CACHE_PATH:
+        backend = SQLiteBackend(PREDICTION_CACHE_PATH)
+    return PredictionCache(backend=backend)
@@ -0,0 +1,305 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Render without a display, also in worker processes
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import seaborn as sns  # noqa: E402
+
+from triage_trend.sites import get_site  # noqa: E402
+
+PLOTS_DIR = "plots"
+REPORT_INPUTS_PATH = "data/cache/report_inputs.npz"
+REPORT_HTML_PATH = os.path.join(PLOTS_DIR, "report.html")
+REPORT_JSON_PATH = os.path.join(PLOTS_DIR, "report.json")
+# Bump when a figure function changes, so all figures are rendered again
+FIGURES_VERSION = 1
+
+
+def plot_feature_distributions(inputs, path):
+    df = pd.DataFrame(inputs["overview"], columns=inputs["overview_columns"])
+    df.drop(columns=["Date_Occurrences"]).hist(bins=30, figsize=(18, 12))
+    plt.suptitle("Feature Distributions", fontsize=18)
+    plt.tight_layout(rect=[0, 0, 1, 0.96])
+    plt.savefig(path)
+
+
+def plot_correlation_heatmap(inputs, path):
+    df = pd.DataFrame(inputs["overview"], columns=inputs["overview_columns"])
+    plt.figure(figsize=(14, 12))
+    sns.heatmap(df.corr(), annot=True, fmt=".2f", cmap="coolwarm")
+    plt.title("Correlation Heatmap", fontsize=16)
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def plot_target_distribution(inputs, path):
+    columns = list(inputs["overview_columns"])
+    target = inputs["overview"][:, columns.index("Date_Occurrences")]
+    plt.figure(figsize=(12, 8))
+    sns.histplot(target, kde=True, bins=30)
+    plt.title("Target Variable Distribution (Date_Occurrences)", fontsize=16)
+    plt.xlabel("Date Occurrences", fontsize=14)
+    plt.ylabel("Frequency", fontsize=14)
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def plot_actual_vs_predicted(inputs, path):
+    y_test = inputs["y_test"]
+    y_pred = inputs["y_pred"]
+    plt.figure(figsize=(12, 8))
+    plt.scatter(y_test, y_pred, alpha=0.7)
+    plt.title("Actual vs Predicted Values", fontsize=16)
+    plt.xlabel("Actual", fontsize=14)
+    plt.ylabel("Predicted", fontsize=14)
+    plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], "r--")
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def plot_residuals(inputs, path):
+    plt.figure(figsize=(12, 8))
+    sns.histplot(inputs["y_test"] - inputs["y_pred"], kde=True, bins=30)
+    plt.title("Distribution of Residuals", fontsize=16)
+    plt.xlabel("Residuals", fontsize=14)
+    plt.ylabel("Count", fontsize=14)
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def plot_feature_importance(inputs, path):
+    importance_df = pd.DataFrame(
+        {
+            "Feature": inputs["feature_names"],
+            "Importance": inputs["feature_importances"],
+        }
+    ).sort_values(by="Importance", ascending=False)
+    plt.figure(figsize=(14, 10))
+    sns.barplot(x="Importance", y="Feature", data=importance_df)
+    plt.title("Feature Importances", fontsize=16)
+    plt.xlabel("Importance", fontsize=14)
+    plt.ylabel("Feature", fontsize=14)
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+# Figure name -> (file name, plot function, inputs it depends on)
+FIGURES = {
+    "feature_distributions": (
+        "feature_distributions.png",
+        plot_feature_distributions,
+        ("overview", "overview_columns"),
+    ),
+    "correlation_heatmap": (
+        "correlation_heatmap.png",
+        plot_correlation_heatmap,
+        ("overview", "overview_columns"),
+    ),
+    "target_distribution": (
+        "target_variable_distribution.png",
+        plot_target_distribution,
+        ("overview", "overview_columns"),
+    ),
+    "actual_vs_predicted": (
+        "actual_vs_predicted_values.png",
+        plot_actual_vs_predicted,
+        ("y_test", "y_pred"),
+    ),
+    "residuals": (
+        "distribution_of_residuals.png",
+        plot_residuals,
+        ("y_test", "y_pred"),
+    ),
+    "feature_importance": (
+        "feature_importance.png",
+        plot_feature_importance,
+        ("feature_names", "feature_importances"),
+    ),
+}
+
+
+def write_report_inputs(
+    overview_df,
+    y_test,
+    y_pred,
+    feature_names,
+    feature_importances,
+    metrics,
+    path=REPORT_INPUTS_PATH,
+):
+    """Store what the report needs, so it can be rendered separately."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        overview=overview_df.to_numpy(dtype=np.float64),
+        overview_columns=np.array(overview_df.columns, dtype=str),
+        y_test=np.asarray(y_test, dtype=np.float64),
+        y_pred=np.asarray(y_pred, dtype=np.float64),
+        feature_names=np.array(feature_names, dtype=str),
+        feature_importances=np.asarray(feature_importances, dtype=np.float64),
+        metrics=json.dumps(metrics),
+    )
+    os.replace(tmp_path, path)
+
+
+def read_report_inputs(path=REPORT_INPUTS_PATH):
+    with np.load(path, allow_pickle=False) as data:
+        inputs = {name: data[name] for name in data.files}
+    inputs["metrics"] = json.loads(str(inputs["metrics"]))
+    return inputs
+
+
+def figure_hash(name, inputs):
+    digest = hashlib.sha256(f"{name}|{FIGURES_VERSION}".encode())
+    for key in FIGURES[name][2]:
+        digest.update(np.ascontiguousarray(inputs[key]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def render_figure(name, inputs, plots_dir):
+    file_name, plot, _ = FIGURES[name]
+    start = time.perf_counter()
+    tmp_path = os.path.join(plots_dir, f".{file_name}")
+    plot(inputs, tmp_path)
+    plt.close("all")
+    os.replace(tmp_path, os.path.join(plots_dir, file_name))
+    return time.perf_counter() - start
+
+
+def read_previous_report(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_report(
+    inputs_path=REPORT_INPUTS_PATH, plots_dir=PLOTS_DIR, max_workers=None
+):
+    """Render changed figures in parallel and write the HTML/JSON report.
+
+    A figure is skipped if the hash of its inputs matches the previous
+    report and its file still exists.
+    """
+    inputs = read_report_inputs(inputs_path)
+    os.makedirs(plots_dir, exist_ok=True)
+    json_path = os.path.join(plots_dir, os.path.basename(REPORT_JSON_PATH))
+    html_path = os.path.join(plots_dir, os.path.basename(REPORT_HTML_PATH))
+    previous = read_previous_report(json_path).get("figures", {})
+
+    figures = {}
+    pending = []
+    for name, (file_name, _, keys) in FIGURES.items():
+        digest = figure_hash(name, inputs)
+        unchanged = previous.get(name, {}).get("hash") == digest
+        if unchanged and os.path.exists(os.path.join(plots_dir, file_name)):
+            figures[name] = {**previous[name], "rendered": False}
+        else:
+            figures[name] = {"file": file_name, "hash": digest}
+            pending.append(name)
+
+    if pending:
+        # Each worker only gets the inputs of its figure
+        with ProcessPoolExecutor(
+            max_workers=min(len(pending), max_workers or os.cpu_count())
+        ) as executor:
+            futures = {
+                name: executor.submit(
+                    render_figure,
+                    name,
+                    {key: inputs[key] for key in FIGURES[name][2]},
+                    plots_dir,
+                )
+                for name in pending
+            }
+            for name, future in futures.items():
+                figures[name]["render_seconds"] = future.result()
+                figures[name]["rendered"] = True
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metrics": inputs["metrics"],
+        "figures": figures,
+    }
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2)
+    with open(html_path, "w") as f:
+        f.write(render_html(report))
+    return report
+
+
+def render_html(report):
+    rows = "\n".join(
+        f"<tr><th>{html.escape(name)}</th><td>{value:.4f}</td></tr>"
+        for name, value in report["metrics"].items()
+    )
+    figures = "\n".join(
+        f'<figure><img src="{html.escape(figure["file"])}" '
+        f'alt="{html.escape(name)}"><figcaption>{html.escape(name)}'
+        "</figcaption></figure>"
+        for name, figure in report["figures"].items()
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Training report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+img {{ max-width: 100%; }}
+th {{ text-align: left; padding-right: 1em; }}
+</style>
+</head>
+<body>
+<h1>Training report</h1>
+<p>Generated {html.escape(report["generated_at"])}</p>
+<table>
+{rows}
+</table>
+{figures}
+</body>
+</html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render the training report from the stored inputs"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--site",
+        action="append",
+        help="Site to render the report of, repeatable "
+        "(default: the default site)",
+    )
+    args = parser.parse_args(argv)
+    for name in args.site or [None]:
+        site = get_site(name)
+        start = time.perf_counter()
+        report = build_report(
+            site.report_inputs_path, site.plots_dir, max_workers=args.workers
+        )
+        rendered = [n for n, f in report["figures"].items() if f["rendered"]]
+        print(
+            f"Rendered {len(rendered)} of {len(report['figures'])} figures in "
+            f"{time.perf_counter() - start:.1f}s, report written to "
+            f"{os.path.join(site.plots_dir, os.path.basename(REPORT_HTML_PATH))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from triage_trend.compiled_model import (
+    COMPILED_MODEL_DIR,
+    META_FILE,
+    PICKLE_MODEL_PATH,
+    QUANTILES,
+    export_pipeline,
+    model_version,
+)
+from triage_trend.data_service.dates import to_ordinals
+from triage_trend.load_data import load_data
+from triage_trend.sites import get_site
+from triage_trend.train import (
+    create_pipeline,
+    missing_value_fills,
+    preprocess_data,
+)
+
+# Written to the cache directory of the site
+TRAINING_STATE_FILE = "training_state.json"
+TRAINING_MATRIX_FILE = "training_matrix.npz"
+
+# Trees added by each incremental run
+ESTIMATORS_PER_UPDATE = 10
+# Full refit policy, see full_refit_reason
+MAX_ESTIMATORS = 300
+MAX_INCREMENTAL_UPDATES = 30
+MAX_NEW_FRACTION = 0.1
+# Mean absolute z-score of the new days that counts as a shift in the data
+MAX_DRIFT = 2.0
+
+
+def read_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_matrix(path):
+    with np.load(path, allow_pickle=False) as data:
+        X = pd.DataFrame(data["X"], columns=data["columns"].tolist())
+        return X, data["ordinals"]
+
+
+def write_matrix(X, ordinals, path):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        X=X.to_numpy(dtype=np.float64),
+        columns=np.array(X.columns, dtype=str),
+        ordinals=ordinals,
+    )
+    os.replace(tmp_path, path)
+
+
+def full_refit_reason(state, pipeline, quantile_pipelines, X_new, num_rows):
+    """Why the models have to be refit from scratch, or None.
+
+    Warm starting only adds trees fitted to the residuals of the frozen
+    ensemble and scaler. Refit once that ensemble grows too large, after
+    many updates, when many days arrive at once or when the new days look
+    unlike the training data.
+    """
+    if state is None or pipeline is None:
+        return "no incremental training state"
+    if len(quantile_pipelines) < len(QUANTILES):
+        return "quantile models are missing or were not published last"
+    gb = pipeline.named_steps["gb"]
+    if gb.n_estimators + ESTIMATORS_PER_UPDATE > MAX_ESTIMATORS:
+        return f"ensemble would exceed {MAX_ESTIMATORS} trees"
+    if state["incremental_updates"] >= MAX_INCREMENTAL_UPDATES:
+        return f"{MAX_INCREMENTAL_UPDATES} updates since the last full refit"
+    if len(X_new) > MAX_NEW_FRACTION * num_rows:
+        return f"more than {MAX_NEW_FRACTION:.0%} of the days are new"
+
+    scaler = pipeline.named_steps["preprocessor"].named_transformers_["num"]
+    numeric = X_new[list(scaler.feature_names_in_)].to_numpy(np.float64)
+    drift = np.abs((numeric - scaler.mean_) / scaler.scale_).mean()
+    if drift > MAX_DRIFT:
+        return f"new days drift from the training data ({drift:.2f})"
+    return None
+
+
+def full_refit(X, y, schema):
+    """Point model and quantile models by alpha, fitted from scratch."""
+    pipeline = create_pipeline(schema=schema)
+    pipeline.fit(X, y)
+    quantile_pipelines = {}
+    for alpha in QUANTILES:
+        quantile_pipelines[alpha] = create_pipeline(
+            loss="quantile", alpha=alpha, schema=schema
+        )
+        quantile_pipelines[alpha].fit(X, y)
+    return pipeline, quantile_pipelines
+
+
+def quantile_versions(site):
+    return {
+        str(alpha): model_version(*site.quantile_model_paths(alpha))
+        for alpha in QUANTILES
+    }
+
+
+def load_quantile_pipelines(site, state):
+    """Quantile models published with the state, missing ones left out."""
+    versions = quantile_versions(site)
+    pipelines = {}
+    for alpha in QUANTILES:
+        if versions[str(alpha)] == state.get("quantile_versions", {}).get(
+            str(alpha)
+        ):
+            pipelines[alpha] = joblib.load(site.quantile_model_paths(alpha)[1])
+    return pipelines
+
+
+def warm_start(pipeline, X, y):
+    """Add ESTIMATORS_PER_UPDATE trees fitted on all days.
+
+    The preprocessing stays as fitted, otherwise the existing trees would
+    see differently scaled inputs.
+    """
+    gb = pipeline.named_steps["gb"]
+    transformed = pipeline.named_steps["preprocessor"].transform(X)
+    gb.set_params(
+        warm_start=True, n_estimators=gb.n_estimators + ESTIMATORS_PER_UPDATE
+    )
+    gb.fit(transformed, y)
+    gb.set_params(warm_start=False)
+    return pipeline
+
+
+def publish(pipeline, pickle_path=PICKLE_MODEL_PATH, bundle=COMPILED_MODEL_DIR):
+    """Swap the new model in, the running service picks it up by itself.
+
+    The service reloads when the artifact stamps change and prefers the
+    bundle only if it is not older than the pickle, so the pickle goes
+    first and the bundle's meta.json is touched last.
+    """
+    os.makedirs(os.path.dirname(pickle_path), exist_ok=True)
+    tmp_bundle = f"{bundle}.new"
+    old_bundle = f"{bundle}.old"
+    shutil.rmtree(tmp_bundle, ignore_errors=True)
+    export_pipeline(pipeline, tmp_bundle)
+
+    tmp_pickle = f"{pickle_path}.tmp"
+    joblib.dump(pipeline, tmp_pickle)
+    os.replace(tmp_pickle, pickle_path)
+
+    shutil.rmtree(old_bundle, ignore_errors=True)
+    if os.path.exists(bundle):
+        os.rename(bundle, old_bundle)
+    os.rename(tmp_bundle, bundle)
+    os.utime(os.path.join(bundle, META_FILE))
+    shutil.rmtree(old_bundle, ignore_errors=True)
+
+
+def retrain(force_full=False, compare=False, site=None):
+    """Update the model of a site with the days added since the last run.
+
+    Unlike train.main, which holds out a random test split, this trains on
+    the whole history, as the model used for serving. The preprocessed
+    training matrix is cached, so only new days are preprocessed.
+    """
+    site = get_site(site)
+    schema = site.schema
+    state_path = os.path.join(site.cache_dir, TRAINING_STATE_FILE)
+    matrix_path = os.path.join(site.cache_dir, TRAINING_MATRIX_FILE)
+    version_paths = (site.compiled_model_dir, site.pickle_model_path)
+
+    df = load_data(site=site)
+    ordinals = to_ordinals(df["Datum"])
+    y = df["Date_Occurrences"].to_numpy()
+    state = read_state(state_path)
+    pipeline = None
+    quantile_pipelines = {}
+    # The state only belongs to the model this command published last,
+    # not to one written by train.py since
+    if (
+        state is not None
+        and state.get("model_version") == model_version(*version_paths)
+        and os.path.exists(matrix_path)
+    ):
+        pipeline = joblib.load(site.pickle_model_path)
+        quantile_pipelines = load_quantile_pipelines(site, state)
+        X_cached, cached_ordinals = read_matrix(matrix_path)
+        known = ordinals <= cached_ordinals[-1]
+        if not np.array_equal(ordinals[known], cached_ordinals):
+            state = None
+    else:
+        state = None
+
+    if state is None:
+        X, _, _ = preprocess_data(df.copy(), schema=schema)
+        fill_values = missing_value_fills(X.assign(Date_Occurrences=y), schema)
+        X_new = X
+    else:
+        fill_values = state["fill_values"]
+        X_new, _, _ = preprocess_data(df[~known].copy(), fill_values, schema)
+        X_new = X_new[X_cached.columns]
+        X = pd.concat([X_cached, X_new], ignore_index=True)
+
+    if state is not None and not len(X_new) and not force_full:
+        print("No new days since the last training run")
+        return None
+
+    reason = "requested" if force_full else None
+    if reason is None:
+        reason = full_refit_reason(
+            state, pipeline, quantile_pipelines, X_new, len(X)
+        )
+
+    start = time.perf_counter()
+    if reason is not None:
+        pipeline, quantile_pipelines = full_refit(X, y, schema)
+        mode = "full"
+    else:
+        # The intervals are updated with the point model, so a horizon
+        # never clips stale quantiles around a new prediction
+        pipeline = warm_start(pipeline, X, y)
+        for quantile_pipeline in quantile_pipelines.values():
+            warm_start(quantile_pipeline, X, y)
+        mode = "incremental"
+    fit_seconds = time.perf_counter() - start
+
+    for alpha, quantile_pipeline in quantile_pipelines.items():
+        compiled_path, pickle_path = site.quantile_model_paths(alpha)
+        publish(quantile_pipeline, pickle_path, compiled_path)
+    publish(pipeline, site.pickle_model_path, site.compiled_model_dir)
+    os.makedirs(site.cache_dir, exist_ok=True)
+    write_matrix(X, ordinals, matrix_path)
+
+    gb = pipeline.named_steps["gb"]
+    if mode == "full":
+        full_fit_seconds = fit_seconds
+        incremental_updates = 0
+    else:
+        full_fit_seconds = state["full_fit_seconds"]
+        incremental_updates = state["incremental_updates"] + 1
+    write_json(
+        state_path,
+        {
+            "last_date": str(df["Datum"].iloc[-1].date()),
+            "rows": len(X),
+            "n_estimators": gb.n_estimators,
+            "incremental_updates": incremental_updates,
+            "full_fit_seconds": full_fit_seconds,
+            "model_version": model_version(*version_paths),
+            "quantile_versions": quantile_versions(site),
+            "fill_values": {
+                column: float(value) for column, value in fill_values.items()
+            },
+        },
+    )
+
+    print(
+        f"{mode.capitalize()} fit on {len(X)} days ({len(X_new)} new) in "
+        f"{fit_seconds:.2f}s, {gb.n_estimators} trees"
+        + (f", because {reason}" if reason else "")
+    )
+    if mode == "incremental":
+        if compare:
+            start = time.perf_counter()
+            full_refit(X, y, schema)
+            full_fit_seconds = time.perf_counter() - start
+        saved = full_fit_seconds - fit_seconds
+        print(
+            f"Saved {saved:.2f}s ({saved / full_fit_seconds:.0%}) compared "
+            f"to a full fit of {full_fit_seconds:.2f}s"
+            + ("" if compare else " (last measured)")
+        )
+    return {"mode": mode, "fit_seconds": fit_seconds, "reason": reason}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Retrain the model with the newly added days"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Refit from scratch"
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also time a full fit to report the savings",
+    )
+    parser.add_argument(
+        "--site", help="Site to retrain (default: the default site)"
+    )
+    args = parser.parse_args(argv)
+    retrain(force_full=args.full, compare=args.compare, site=args.site)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from triage_trend.compiled_model import (
+    QUANTILES,
+    load_model,
+    model_version,
+    quantile_model_paths,
+)
+from triage_trend.data_service.feature_schema import (
+    HOLIDAY_CANTONS,
+    VACATION_CANTONS,
+    get_feature_schema,
+)
+from triage_trend.data_service.public_holidays import HOLIDAY_COLUMNS
+from triage_trend.data_service.vacations import VACATION_PERIODS
+from triage_trend.metrics import instrument
+
+SITES_CONFIG_PATH = os.environ.get("SITES_CONFIG", "data/sites.json")
+# Sites whose models stay loaded, the least recently used are dropped
+MAX_RESIDENT_SITES = int(os.environ.get("MAX_RESIDENT_SITES", 4))
+
+# name: key of the site in the config and in requests
+# weather, vacations, admissions: source files of the training data
+# model_dir, cache_dir, plots_dir: where its artifacts are written
+SITE_FIELDS = [
+    "name",
+    "vacation_cantons",
+    "holiday_cantons",
+    "weather",
+    "vacations",
+    "admissions",
+    "model_dir",
+    "cache_dir",
+    "plots_dir",
+]
+
+
+class Site(namedtuple("Site", SITE_FIELDS)):
+    """A clinic site with its canton sets, data sources and artifacts."""
+
+    @property
+    def schema(self):
+        return get_feature_schema(self.vacation_cantons, self.holiday_cantons)
+
+    @property
+    def compiled_model_dir(self):
+        return os.path.join(self.model_dir, "gb_model")
+
+    @property
+    def pickle_model_path(self):
+        return os.path.join(self.model_dir, "gb_model.pkl")
+
+    def quantile_model_paths(self, alpha):
+        return quantile_model_paths(alpha, self.model_dir)
+
+    @property
+    def report_inputs_path(self):
+        return os.path.join(self.cache_dir, "report_inputs.npz")
+
+
+def parse_site(name, config):
+    vacation_cantons = tuple(config.get("vacation_cantons", VACATION_CANTONS))
+    holiday_cantons = tuple(config.get("holiday_cantons", HOLIDAY_CANTONS))
+    unknown = [c for c in vacation_cantons if c not in VACATION_PERIODS] + [
+        c for c in holiday_cantons if c not in HOLIDAY_COLUMNS
+    ]
+    if unknown:
+        raise ValueError(
+            f"Site '{name}' uses unknown cantons: {', '.join(unknown)}"
+        )
+    return Site(
+        name=name,
+        vacation_cantons=vacation_cantons,
+        holiday_cantons=holiday_cantons,
+        weather=config.get("weather", "data/weather_features.csv"),
+        vacations=config.get("vacations", "data/vacations.csv"),
+        admissions=config["admissions"],
+        model_dir=config.get("model_dir", f"./model/sites/{name}"),
+        cache_dir=config.get("cache_dir", f"data/cache/sites/{name}"),
+        plots_dir=config.get("plots_dir", f"plots/sites/{name}"),
+    )
+
+
+def load_sites(path=SITES_CONFIG_PATH):
+    """Sites by name and the name of the default site."""
+    with open(path) as f:
+        config = json.load(f)
+    sites = {
+        name: parse_site(name, site_config)
+        for name, site_config in config["sites"].items()
+    }
+    default = config.get("default", next(iter(sites)))
+    if default not in sites:
+        raise ValueError(f"Unknown default site '{default}'")
+    return sites, default
+
+
+@lru_cache(maxsize=None)
+def get_sites():
+    return load_sites()
+
+
+def get_site(name=None):
+    """The configured site, the default one if name is None."""
+    if isinstance(name, Site):
+        return name
+    sites, default = get_sites()
+    if name is None:
+        name = default
+    if name not in sites:
+        raise KeyError(f"Unknown site '{name}'")
+    return sites[name]
+
+
+# Every site has a point model and one model per quantile
+@lru_cache(maxsize=MAX_RESIDENT_SITES * (len(QUANTILES) + 1))
+def load_versioned_model(compiled_path, pickle_path, version):
+    return load_model(compiled_path, pickle_path)
+
+
+@instrument("model_lookup")
+def get_model(site=None):
+    """The model of a site and its version, reloaded when it changes.
+
+    Models are loaded on their first prediction, not at startup.
+    """
+    site = get_site(site)
+    compiled_path, pickle_path = site.compiled_model_dir, site.pickle_model_path
+    version = model_version(compiled_path, pickle_path)
+    return load_versioned_model(compiled_path, pickle_path, version), version
+
+
+def get_quantile_models(site=None):
+    """Quantile models of a site by alpha, reloaded when they change.
+
+    Models that were not trained are left out, the forecast then has no
+    intervals.
+    """
+    models = {}
+    for alpha in QUANTILES:
+        compiled_path, pickle_path = get_site(site).quantile_model_paths(alpha)
+        version = model_version(compiled_path, pickle_path)
+        if version != "missing:missing":
+            models[alpha] = load_versioned_model(
+                compiled_path, pickle_path, version
+            )
+    return models
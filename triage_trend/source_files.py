@@ -0,0 +1,66 @@
+import hashlib
+import io
+import os
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(path)[1],
+    }
+
+
+def hash_file(path, prefix_size=0):
+    """Return the sha256 of the first prefix_size bytes and of the file."""
+    digest = hashlib.sha256()
+    prefix_digest = None
+    with open(path, "rb") as f:
+        remaining = prefix_size
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        prefix_digest = digest.hexdigest()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return prefix_digest, digest.hexdigest()
+
+
+def compare_source(path, previous):
+    """Classify a source file as unchanged, appended or changed."""
+    stat = os.stat(path)
+    if previous is None:
+        return "changed", None
+    if (
+        stat.st_size == previous["size"]
+        and stat.st_mtime_ns == previous["mtime_ns"]
+    ):
+        return "unchanged", previous
+
+    prefix_size = min(stat.st_size, previous["size"])
+    prefix_hash, file_hash = hash_file(path, prefix_size)
+    info = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash,
+    }
+    if file_hash == previous["sha256"]:
+        return "unchanged", info
+    if stat.st_size > previous["size"] and prefix_hash == previous["sha256"]:
+        with open(path, "rb") as f:
+            f.seek(previous["size"] - 1)
+            if f.read(1) == b"\n":
+                return "appended", info
+    return "changed", info
+
+
+def read_appended(path, previous):
+    """Return the rows appended since previous, with the CSV header."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(previous["size"])
+        return io.BytesIO(header + f.read())
@@ -1,9 +1,8 @@
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import joblib
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
@@ -11,49 +10,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
-from triage_trend.load_data import load_data
-
-CATEGORICAL_COLUMNS = ["Weekday"]
-NUMERIC_COLUMNS = [
-    "Average_Temperature",
-    "Max_Temperature",
-    "Total_Rain_Duration",
-    "Average_Pressure",
-    "Average_Global_Radiation",
-    "Cloudiness",
-    "Moon Phase (%)",
-    "IsVacationAargau",
-    "IsVacationZug",
-    "IsVacationSchwyz",
-    "IsVacationSt_gallen",
-    "IsVacationSchaffhausen",
-    "IsVacationThurgau",
-    "Aargau_Week_After_Holiday",
-    "Aargau_First_Week_of_Holiday",
-    "Zug_Week_After_Holiday",
-    "Zug_First_Week_of_Holiday",
-    "Schwyz_Week_After_Holiday",
-    "Schwyz_First_Week_of_Holiday",
-    "St_gallen_Week_After_Holiday",
-    "St_gallen_First_Week_of_Holiday",
-    "Schaffhausen_Week_After_Holiday",
-    "Schaffhausen_First_Week_of_Holiday",
-    "Thurgau_Week_After_Holiday",
-    "Thurgau_First_Week_of_Holiday",
-    "Average_Temperature_5day_mean",
-    "Max_Temperature_5day_mean",
-    "Total_Rain_Duration_5day_mean",
-    "Average_Pressure_5day_mean",
-    "Average_Global_Radiation_5day_mean",
-    "Cloudiness_5day_mean",
-    "publicHolidayAargau",
-    "publicHolidayZug",
-    "publicHolidaySchwyz",
-    "publicHolidayStGallen",
-    "publicHolidayThurgau",
-    "publicHolidaySchaffhausen",
-    "publicHolidayZurich",
-]
+from triage_trend.compiled_model import QUANTILES, export_pipeline
+from triage_trend.data_service.feature_schema import DEFAULT_SCHEMA
+from triage_trend.load_data import load_data, load_sites_data, site_frame
+from triage_trend.sites import get_site, get_sites
 
 
 def map_weekdays(df):
@@ -70,36 +30,46 @@ def map_weekdays(df):
     return df
 
 
-def handle_missing_values(df):
+def missing_value_fills(df, schema=DEFAULT_SCHEMA):
     numeric_cols = df.select_dtypes(include=["number"]).columns.drop(
         "Date_Occurrences"
     )
-    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
+    fill_values = df[numeric_cols].mean().to_dict()
+    for col in schema.categorical_columns:
+        fill_values[col] = df[col].mode()[0]
+    return fill_values
 
-    for col in CATEGORICAL_COLUMNS:
-        df[col] = df[col].fillna(df[col].mode()[0])
 
-    return df
+def handle_missing_values(df, fill_values=None, schema=DEFAULT_SCHEMA):
+    """Fill gaps with the column means, or with the given fill values."""
+    if fill_values is None:
+        fill_values = missing_value_fills(df, schema)
+    return df.fillna(fill_values)
 
 
-def preprocess_data(df):
+def preprocess_data(df, fill_values=None, schema=DEFAULT_SCHEMA):
     df = map_weekdays(df)
-    df = handle_missing_values(df)
+    df = handle_missing_values(df, fill_values, schema)
 
     df["IsWeekend"] = df["Weekday"].isin([5, 6]).astype(int)
 
     df = df.select_dtypes(exclude=["datetime64"])
-    X = df.drop(columns=["Date_Occurrences"])
+    # Exactly the inputs serving computes, see feature_schema
+    X = df[schema.model_inputs]
     y = df["Date_Occurrences"]
 
     return X, y, df
 
 
-def create_pipeline():
+def create_pipeline(loss="squared_error", alpha=0.9, schema=DEFAULT_SCHEMA):
     preprocessor = ColumnTransformer(
         transformers=[
-            ("num", StandardScaler(), NUMERIC_COLUMNS),
-            ("cat", OneHotEncoder(sparse_output=False), CATEGORICAL_COLUMNS),
+            ("num", StandardScaler(), schema.numeric_columns),
+            (
+                "cat",
+                OneHotEncoder(sparse_output=False),
+                schema.categorical_columns,
+            ),
         ]
     )
 
@@ -109,6 +79,8 @@ def create_pipeline():
             (
                 "gb",
                 GradientBoostingRegressor(
+                    loss=loss,
+                    alpha=alpha,
                     learning_rate=0.05,
                     max_depth=4,
                     min_samples_leaf=2,
@@ -125,99 +97,144 @@ def create_pipeline():
 
 def evaluate_model(model, X_test, y_test):
     y_pred = model.predict(X_test)
-    mse = mean_squared_error(y_test, y_pred)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-
-    print(f"Mean Squared Error: {mse:.2f}")
-    print(f"Mean Absolute Error: {mae:.2f}")
-    print(f"R^2 Score: {r2:.2f}")
-
-    plt.figure(figsize=(12, 8))
-    plt.scatter(y_test, y_pred, alpha=0.7)
-    plt.title("Actual vs Predicted Values", fontsize=16)
-    plt.xlabel("Actual", fontsize=14)
-    plt.ylabel("Predicted", fontsize=14)
-    plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], "r--")
-    plt.tight_layout()
-    plt.savefig("plots/actual_vs_predicted_values.png")
-    # plt.show()
-
-    residuals = y_test - y_pred
-    plt.figure(figsize=(12, 8))
-    sns.histplot(residuals, kde=True, bins=30)
-    plt.title("Distribution of Residuals", fontsize=16)
-    plt.xlabel("Residuals", fontsize=14)
-    plt.ylabel("Count", fontsize=14)
-    plt.tight_layout()
-    plt.savefig("plots/distribution_of_residuals.png")
-    # plt.show()
-
-    feature_importances = model.named_steps["gb"].feature_importances_
-    feature_names = NUMERIC_COLUMNS + list(
+    metrics = {
+        "mse": mean_squared_error(y_test, y_pred),
+        "mae": mean_absolute_error(y_test, y_pred),
+        "r2": r2_score(y_test, y_pred),
+    }
+
+    print(f"Mean Squared Error: {metrics['mse']:.2f}")
+    print(f"Mean Absolute Error: {metrics['mae']:.2f}")
+    print(f"R^2 Score: {metrics['r2']:.2f}")
+    return y_pred, metrics
+
+
+def feature_names(model, schema=DEFAULT_SCHEMA):
+    return schema.numeric_columns + list(
         model.named_steps["preprocessor"]
         .transformers_[1][1]
-        .get_feature_names_out(CATEGORICAL_COLUMNS)
-    )
-    importance_df = pd.DataFrame(
-        {"Feature": feature_names, "Importance": feature_importances}
+        .get_feature_names_out(schema.categorical_columns)
     )
-    importance_df = importance_df.sort_values(by="Importance", ascending=False)
-
-    plt.figure(figsize=(14, 10))
-    sns.barplot(x="Importance", y="Feature", data=importance_df)
-    plt.title("Feature Importances", fontsize=16)
-    plt.xlabel("Importance", fontsize=14)
-    plt.ylabel("Feature", fontsize=14)
-    plt.tight_layout()
-    plt.savefig("plots/feature_importance.png")
-    # plt.show()
-
-
-def plot_data_overview(df):
-    df[NUMERIC_COLUMNS].hist(bins=30, figsize=(18, 12))
-    plt.suptitle("Feature Distributions", fontsize=18)
-    plt.tight_layout(rect=[0, 0, 1, 0.96])
-    plt.savefig("plots/feature_distributions.png")
-    # plt.show()
-
-    plt.figure(figsize=(14, 12))
-    sns.heatmap(
-        df[NUMERIC_COLUMNS + ["Date_Occurrences"]].corr(),
-        annot=True,
-        fmt=".2f",
-        cmap="coolwarm",
-    )
-    plt.title("Correlation Heatmap", fontsize=16)
-    plt.tight_layout()
-    plt.savefig("plots/correlation_heatmap.png")
-    # plt.show()
-
-    plt.figure(figsize=(12, 8))
-    sns.histplot(df["Date_Occurrences"], kde=True, bins=30)
-    plt.title("Target Variable Distribution (Date_Occurrences)", fontsize=16)
-    plt.xlabel("Date Occurrences", fontsize=14)
-    plt.ylabel("Frequency", fontsize=14)
-    plt.tight_layout()
-    plt.savefig("plots/target_variable_distribution.png")
-    # plt.show()
-
-
-def main():
-    df = load_data()
-    X, y, full_df = preprocess_data(df)
+
+
+def train_site(site, df):
+    """Fit and publish the models of a site, and store its report inputs.
+
+    Runs in a worker process when several sites are trained.
+    """
+    from triage_trend import report
+
+    schema = site.schema
+    X, y, full_df = preprocess_data(df, schema=schema)
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.3, random_state=42
     )
 
-    pipeline = create_pipeline()
+    pipeline = create_pipeline(schema=schema)
     pipeline.fit(X_train, y_train)
 
-    os.makedirs("./model", exist_ok=True)
-    joblib.dump(pipeline, "./model/gb_model.pkl")
-
-    plot_data_overview(full_df)
-    evaluate_model(pipeline, X_test, y_test)
+    os.makedirs(site.model_dir, exist_ok=True)
+    joblib.dump(pipeline, site.pickle_model_path)
+    # Array bundle the service loads without unpickling sklearn objects
+    export_pipeline(pipeline, site.compiled_model_dir)
+
+    y_pred, metrics = evaluate_model(pipeline, X_test, y_test)
+
+    # Quantile-loss models for the prediction intervals of the forecasts
+    bounds = []
+    for alpha in QUANTILES:
+        quantile_pipeline = create_pipeline(
+            loss="quantile", alpha=alpha, schema=schema
+        )
+        quantile_pipeline.fit(X_train, y_train)
+        compiled_path, pickle_path = site.quantile_model_paths(alpha)
+        joblib.dump(quantile_pipeline, pickle_path)
+        export_pipeline(quantile_pipeline, compiled_path)
+        bounds.append(quantile_pipeline.predict(X_test))
+    covered = (y_test >= bounds[0]) & (y_test <= bounds[-1])
+    metrics["interval_coverage"] = float(covered.mean())
+    print(
+        f"Interval coverage ({QUANTILES[0]:.0%}-{QUANTILES[-1]:.0%}): "
+        f"{metrics['interval_coverage']:.2f}"
+    )
+    report.write_report_inputs(
+        full_df[schema.numeric_columns + ["Date_Occurrences"]],
+        y_test,
+        y_pred,
+        feature_names(pipeline, schema),
+        pipeline.named_steps["gb"].feature_importances_,
+        metrics,
+        path=site.report_inputs_path,
+    )
+    return metrics
+
+
+def train_sites(sites, max_workers=None):
+    """Train several sites in parallel worker processes.
+
+    The datasets are loaded once as a long frame and each worker gets the
+    rows of its site.
+    """
+    sites_df = load_sites_data(sites)
+    with ProcessPoolExecutor(
+        max_workers=min(len(sites), max_workers or os.cpu_count())
+    ) as executor:
+        futures = {
+            site.name: executor.submit(
+                train_site, site, site_frame(sites_df, site.name)
+            )
+            for site in sites
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main(argv=None):
+    # Imported here, the backtest module builds on this one and the report
+    # pulls in the plotting libraries
+    from triage_trend import backtest, report
+
+    parser = argparse.ArgumentParser(description="Train the admission model")
+    parser.add_argument(
+        "--backtest",
+        action="store_true",
+        help="Run a rolling-origin backtest instead of training",
+    )
+    parser.add_argument(
+        "--no-report",
+        action="store_true",
+        help="Only store the report inputs, render them with scripts/report.py",
+    )
+    parser.add_argument(
+        "--site",
+        action="append",
+        help="Site from the sites config to train, repeatable "
+        "(default: the default site)",
+    )
+    parser.add_argument(
+        "--all-sites",
+        action="store_true",
+        help="Train every configured site",
+    )
+    # Also adds --workers, used for the sites as well as the folds
+    backtest.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.all_sites:
+        sites = list(get_sites()[0].values())
+    else:
+        sites = [get_site(name) for name in args.site or [None]]
+    if args.backtest:
+        backtest.check_arguments(parser, args, sites)
+        backtest.run(args, sites)
+        return
+
+    if len(sites) == 1:
+        train_site(sites[0], load_data(site=sites[0]))
+    else:
+        for name, metrics in train_sites(sites, args.workers).items():
+            print(f"{name}: MAE {metrics['mae']:.2f}, R^2 {metrics['r2']:.2f}")
+    if not args.no_report:
+        for site in sites:
+            report.build_report(site.report_inputs_path, site.plots_dir)
 
 
 if __name__ == "__main__":
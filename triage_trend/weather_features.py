@@ -0,0 +1,746 @@
+import argparse
+import glob
+import json
+import os
+from datetime import date, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from triage_trend.data_service.dates import to_datetime64, to_ordinals
+from triage_trend.source_files import (
+    compare_source,
+    fingerprint,
+    read_appended,
+)
+
+WEATHER_DATA_PATTERN = "data/weather_data_*.csv"
+CLEANED_WEATHER_PATH = "data/cleaned_weather_features_{year}.csv"
+WEATHER_FEATURES_PATH = "data/weather_features.csv"
+CHUNKSIZE = 100_000
+
+STATION_WEATHER_PATH = "data/cache/station_weather.npz"
+STATION_WEATHER_MANIFEST_PATH = "data/cache/station_weather.json"
+# Bump whenever the stored arrays change to invalidate old caches
+STATION_WEATHER_VERSION = 2
+# Weight of a station in the daily average, stations not listed weigh 1
+STATION_WEIGHTS = {}
+
+# How stations without a value enter the daily features. "reporting" keeps
+# the rules the feature files, the trained model and the static forecast
+# use: every station with a row on a day counts, missing rain as 0 minutes
+# and missing radiation as DEFAULT_CLOUDINESS, and days without a value stay
+# NaN. "masked" leaves such stations out, weights the stations by
+# STATION_WEIGHTS and fills days without a value from the nearest day.
+AGGREGATIONS = ("reporting", "masked")
+DEFAULT_AGGREGATION = "reporting"
+DEFAULT_CLOUDINESS = 0.5  # neutral cloudiness if radiation is missing
+
+# Parameter -> (feature column, daily aggregation per station)
+WEATHER_PARAMETERS = {
+    "T": ("Average_Temperature", "mean"),
+    "T_max_h1": ("Max_Temperature", "max"),
+    "RainDur": ("Total_Rain_Duration", "sum"),
+    "p": ("Average_Pressure", "mean"),
+    "StrGlo": ("Average_Global_Radiation", "mean"),
+}
+FEATURE_COLUMNS = [column for column, _ in WEATHER_PARAMETERS.values()] + [
+    "Cloudiness"
+]
+MAX_RAIN_DURATION = 1440  # minutes per day
+
+
+# Function to calculate cloudiness based on Global Radiation (StrGlo)
+def calculate_cloudiness(global_radiation):
+    max_possible_radiation = 1000  # A rough estimate of max possible radiation
+    return np.clip(
+        1 - (global_radiation / max_possible_radiation), 0, 1
+    )  # Ensure value is between 0 and 1
+
+
+def aggregate_stations(sums, counts, maxima, reporting=None):
+    """Daily aggregate of every station and parameter, NaN if missing.
+
+    The arrays hold the running sums, counts and maxima of the folded rows
+    with the parameters on the last axis. With reporting, the mask of the
+    stations that had any row, a reporting station without rain counts as
+    0 minutes.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    values = np.empty(sums.shape)
+    for i, (_, aggregation) in enumerate(WEATHER_PARAMETERS.values()):
+        if aggregation == "mean":
+            values[..., i] = means[..., i]
+        elif aggregation == "max":
+            values[..., i] = maxima[..., i]
+        else:
+            values[..., i] = sums[..., i]
+    values[counts == 0] = np.nan
+    rain = list(WEATHER_PARAMETERS).index("RainDur")
+    if reporting is not None:
+        values[..., rain][reporting & np.isnan(values[..., rain])] = 0
+    values[..., rain] = np.clip(values[..., rain], 0, MAX_RAIN_DURATION)
+    return values
+
+
+def mean_reporting_stations(values, reporting, order):
+    """Mean over the reporting stations of the values with a value.
+
+    A reporting station without radiation counts as DEFAULT_CLOUDINESS. The
+    stations are summed in the given order with the compensated summation
+    of pandas' groupby mean, so the original feature files are reproduced
+    bit for bit.
+    """
+    radiation = list(WEATHER_PARAMETERS).index("StrGlo")
+    cloudiness = calculate_cloudiness(values[..., radiation])
+    cloudiness[reporting & np.isnan(cloudiness)] = DEFAULT_CLOUDINESS
+    features = np.concatenate([values, cloudiness[..., None]], axis=-1)
+    shape = features.shape[:-2] + features.shape[-1:]
+    totals = np.zeros(shape)
+    compensation = np.zeros(shape)
+    counts = np.zeros(shape)
+    for station in order:
+        value = features[..., station, :]
+        valid = ~np.isnan(value)
+        y = value - compensation
+        t = totals + y
+        compensation = np.where(
+            valid, np.nan_to_num(t - totals - y), compensation
+        )
+        totals = np.where(valid, t, totals)
+        counts += valid
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def average_stations(values, station_weights):
+    """Weighted mean over the station axis of the stations with a value.
+
+    values has the stations on the second to last axis and the parameters
+    on the last. A station without a value is left out instead of filled
+    in, the feature is NaN if no station has one.
+    """
+    radiation = list(WEATHER_PARAMETERS).index("StrGlo")
+    cloudiness = calculate_cloudiness(values[..., radiation])
+    features = np.concatenate([values, cloudiness[..., None]], axis=-1)
+    valid = ~np.isnan(features)
+    weights = np.where(valid, station_weights[:, None], 0.0)
+    totals = weights.sum(axis=-2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        averages = (np.where(valid, features, 0.0) * weights).sum(
+            axis=-2
+        ) / totals
+    return np.where(totals > 0, averages, np.nan)
+
+
+def station_weight_array(stations, weights=None):
+    if weights is None:
+        weights = STATION_WEIGHTS
+    return np.array([weights.get(name, 1.0) for name in stations], dtype=float)
+
+
+def combine_stations(
+    sums, counts, maxima, reporting, stations, aggregation, weights=None
+):
+    """Daily features from the per-station accumulators, see AGGREGATIONS.
+
+    stations holds the names along the station axis of the arrays.
+    """
+    if aggregation == "masked":
+        return average_stations(
+            aggregate_stations(sums, counts, maxima),
+            station_weight_array(stations, weights),
+        )
+    # The original groupby visits the stations sorted by name
+    return mean_reporting_stations(
+        aggregate_stations(sums, counts, maxima, reporting),
+        reporting,
+        np.argsort(np.array(stations, dtype=str), kind="stable"),
+    )
+
+
+def day_timestamps(ordinals, utc_offset=None):
+    """Midnight of each day, with the UTC offset in minutes of the source."""
+    days = pd.DatetimeIndex(to_datetime64(ordinals).astype("datetime64[ns]"))
+    if utc_offset is None:
+        return days
+    return days.tz_localize(timezone(timedelta(minutes=utc_offset)))
+
+
+def read_utc_offset(timestamp):
+    """UTC offset in minutes of a source timestamp, None if it has none."""
+    offset = pd.Timestamp(timestamp).utcoffset()
+    return None if offset is None else int(offset.total_seconds() // 60)
+
+
+class Interner:
+    """Assign stable integer codes to repeated strings."""
+
+    def __init__(self, values=()):
+        self.codes = {}
+        self.values = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, column):
+        """Encode a column, interning each distinct value only once."""
+        codes, uniques = pd.factorize(column)
+        lookup = np.array(
+            [self.code(value) for value in uniques], dtype=np.int64
+        )
+        return lookup[codes] if len(codes) else codes.astype(np.int64)
+
+
+class DailyAccumulator:
+    """Running per-station sums, counts and maxima of one day."""
+
+    def __init__(self, num_parameters):
+        self.num_parameters = num_parameters
+        self.allocate(0)
+
+    def reset(self, num_stations):
+        if num_stations != len(self.sums):
+            self.allocate(num_stations)
+            return
+        # Reuse the buffers of the previous day
+        self.sums.fill(0)
+        self.counts.fill(0)
+        self.maxima.fill(-np.inf)
+        self.reporting.fill(False)
+
+    def allocate(self, num_stations):
+        shape = (num_stations, self.num_parameters)
+        self.sums = np.zeros(shape)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.maxima = np.full(shape, -np.inf)
+        self.reporting = np.zeros(num_stations, dtype=bool)
+
+    def grow(self, num_stations):
+        if num_stations <= len(self.sums):
+            return
+        extra = (num_stations - len(self.sums), self.num_parameters)
+        self.sums = np.vstack([self.sums, np.zeros(extra)])
+        self.counts = np.vstack([self.counts, np.zeros(extra, dtype=np.int64)])
+        self.maxima = np.vstack([self.maxima, np.full(extra, -np.inf)])
+        self.reporting = np.concatenate(
+            [self.reporting, np.zeros(extra[0], dtype=bool)]
+        )
+
+    def add(self, stations, parameters, values):
+        """Fold rows into the accumulators, parameters < 0 are ignored.
+
+        Every row marks its station as reporting, also without a value.
+        """
+        self.reporting[stations] = True
+        relevant = (parameters >= 0) & ~np.isnan(values)
+        stations = stations[relevant]
+        parameters = parameters[relevant]
+        values = values[relevant]
+        np.add.at(self.sums, (stations, parameters), values)
+        np.add.at(self.counts, (stations, parameters), 1)
+        np.maximum.at(self.maxima, (stations, parameters), values)
+
+    def features(self, stations, aggregation=DEFAULT_AGGREGATION):
+        """Daily features of the station names, see combine_stations."""
+        return combine_stations(
+            self.sums,
+            self.counts,
+            self.maxima,
+            self.reporting,
+            stations[: len(self.sums)],
+            aggregation,
+        )
+
+
+def impute_nearest(values, valid):
+    """Fill invalid cells along the first axis from the nearest valid day.
+
+    Ties go to the earlier day. Columns without any valid day stay NaN.
+    """
+    num_days = len(values)
+    index = np.arange(num_days).reshape((-1,) + (1,) * (values.ndim - 1))
+    previous = np.maximum.accumulate(np.where(valid, index, -1), axis=0)
+    following = np.minimum.accumulate(
+        np.where(valid, index, num_days)[::-1], axis=0
+    )[::-1]
+    # Without a valid day on one side, that side is never the nearest
+    before = np.where(previous >= 0, index - previous, num_days + 1)
+    after = np.where(following < num_days, following - index, num_days + 1)
+    source = np.where(before <= after, previous, following)
+    distance = np.minimum(before, after)
+
+    nearest = np.take_along_axis(
+        values, np.clip(source, 0, num_days - 1), axis=0
+    )
+    return np.where(distance <= num_days, nearest, np.nan)
+
+
+class StationWeather:
+    """Daily weather per station as day x station x parameter arrays.
+
+    Stores the running sums, counts and maxima of the folded rows, so rows
+    of new days or of a new station are added without touching the rest of
+    the history. A cell is valid if at least one value was folded into it,
+    and reporting marks the day x station pairs with any row.
+    """
+
+    def __init__(
+        self,
+        first_ordinal,
+        stations,
+        sums,
+        counts,
+        maxima,
+        reporting,
+        utc_offset=None,
+    ):
+        self.first_ordinal = first_ordinal
+        self.stations = Interner(stations)
+        self.sums = sums
+        self.counts = counts
+        self.maxima = maxima
+        self.reporting = reporting
+        self.utc_offset = utc_offset
+
+    @classmethod
+    def empty(cls):
+        shape = (0, 0, len(WEATHER_PARAMETERS))
+        return cls(
+            None,
+            (),
+            np.zeros(shape),
+            np.zeros(shape, dtype=np.int32),
+            np.full(shape, -np.inf),
+            np.zeros(shape[:2], dtype=bool),
+        )
+
+    @property
+    def num_days(self):
+        return len(self.sums)
+
+    @property
+    def ordinals(self):
+        return np.arange(self.first_ordinal, self.first_ordinal + self.num_days)
+
+    @property
+    def valid(self):
+        return self.counts > 0
+
+    def resize(self, first_ordinal, last_ordinal, num_stations):
+        """Grow the arrays to cover the days and stations, keeping the data."""
+        if self.first_ordinal is not None:
+            first_ordinal = min(first_ordinal, self.first_ordinal)
+            last_ordinal = max(last_ordinal, self.ordinals[-1])
+        shape = (
+            last_ordinal - first_ordinal + 1,
+            num_stations,
+            len(WEATHER_PARAMETERS),
+        )
+        if shape == self.sums.shape:
+            return
+        offset = 0
+        if self.first_ordinal is not None:
+            offset = self.first_ordinal - first_ordinal
+        days = slice(offset, offset + self.num_days)
+        stations = slice(0, self.sums.shape[1])
+        for name, fill in (
+            ("sums", 0),
+            ("counts", 0),
+            ("maxima", -np.inf),
+            ("reporting", False),
+        ):
+            old = getattr(self, name)
+            new = np.full(shape[: old.ndim], fill, dtype=old.dtype)
+            new[days, stations] = old
+            setattr(self, name, new)
+        self.first_ordinal = first_ordinal
+
+    def add_rows(self, ordinals, stations, parameters, values):
+        """Fold long-format rows in, unknown parameters and NaN are ignored.
+
+        Every row marks its station as reporting on its day.
+        """
+        if not len(ordinals):
+            return
+        ordinals = np.asarray(ordinals)
+        station_codes = self.stations.encode(np.asarray(stations))
+        self.resize(
+            int(ordinals.min()), int(ordinals.max()), len(self.stations.values)
+        )
+        self.reporting[ordinals - self.first_ordinal, station_codes] = True
+
+        parameter_codes = pd.Series(parameters).map(
+            {parameter: i for i, parameter in enumerate(WEATHER_PARAMETERS)}
+        )
+        values = np.asarray(values, dtype=np.float64)
+        relevant = parameter_codes.notna().to_numpy() & ~np.isnan(values)
+        ordinals = ordinals[relevant]
+        station_codes = station_codes[relevant]
+        parameter_codes = parameter_codes.to_numpy()[relevant].astype(np.int64)
+        values = values[relevant]
+
+        cells = (ordinals - self.first_ordinal, station_codes, parameter_codes)
+        np.add.at(self.sums, cells, values)
+        np.add.at(self.counts, cells, 1)
+        np.maximum.at(self.maxima, cells, values)
+
+    def station_values(self):
+        """Daily aggregate of every station and parameter, NaN if missing."""
+        return aggregate_stations(self.sums, self.counts, self.maxima)
+
+    def daily_features(self, aggregation=DEFAULT_AGGREGATION, weights=None):
+        """Daily features, one row per day, see AGGREGATIONS.
+
+        With "reporting", only days with a reporting station have a row.
+        With "masked", every day has one, and days without any station take
+        the value of the nearest day that has one.
+        """
+        daily = combine_stations(
+            self.sums,
+            self.counts,
+            self.maxima,
+            self.reporting,
+            self.stations.values,
+            aggregation,
+            weights,
+        )
+        ordinals = self.ordinals
+        if aggregation == "masked":
+            daily = impute_nearest(daily, ~np.isnan(daily))
+        else:
+            reported = self.reporting.any(axis=1)
+            daily = daily[reported]
+            ordinals = ordinals[reported]
+        df = pd.DataFrame(daily, columns=FEATURE_COLUMNS)
+        df.insert(0, "Datum", day_timestamps(ordinals, self.utc_offset))
+        return df
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            first_ordinal=self.first_ordinal,
+            stations=np.array(self.stations.values, dtype=str),
+            sums=self.sums,
+            counts=self.counts,
+            maxima=self.maxima,
+            reporting=self.reporting,
+            # -1 for sources without an offset
+            utc_offset=-1 if self.utc_offset is None else self.utc_offset,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            utc_offset = int(data["utc_offset"])
+            return cls(
+                int(data["first_ordinal"]),
+                data["stations"].tolist(),
+                data["sums"],
+                data["counts"],
+                data["maxima"],
+                data["reporting"],
+                None if utc_offset == -1 else utc_offset,
+            )
+
+
+def fold_weather_file(weather, source, chunksize=CHUNKSIZE):
+    """Add the rows of a long-format weather CSV to a StationWeather."""
+    for chunk in pd.read_csv(
+        source,
+        usecols=["Datum", "Standort", "Parameter", "Wert"],
+        dtype={"Datum": str, "Standort": str, "Parameter": str},
+        chunksize=chunksize,
+    ):
+        if weather.utc_offset is None and len(chunk):
+            weather.utc_offset = read_utc_offset(chunk["Datum"].iloc[0])
+        # Group by calendar day, also for sub-daily intervals
+        days = chunk["Datum"].str.slice(0, 10).to_numpy(dtype="datetime64[D]")
+        weather.add_rows(
+            to_ordinals(days),
+            chunk["Standort"].to_numpy(),
+            chunk["Parameter"].to_numpy(),
+            chunk["Wert"].to_numpy(dtype=np.float64),
+        )
+
+
+def read_station_manifest(path=STATION_WEATHER_MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != STATION_WEATHER_VERSION:
+        return None
+    return manifest
+
+
+def update_station_weather(
+    paths,
+    chunksize=CHUNKSIZE,
+    cache_path=STATION_WEATHER_PATH,
+    manifest_path=STATION_WEATHER_MANIFEST_PATH,
+):
+    """Fold the weather files into the stored per-station array.
+
+    Only new files, e.g. of a new station or year, and rows appended to
+    known files are read. If a known file changed otherwise or is gone, the
+    array is rebuilt from all files.
+    """
+    manifest = read_station_manifest(manifest_path)
+    known = {} if manifest is None else manifest["files"]
+    changes = {path: compare_source(path, known.get(path)) for path in paths}
+    rebuild = (
+        manifest is None
+        or not os.path.exists(cache_path)
+        or set(known) - set(paths)
+        or any(
+            status == "changed" and path in known
+            for path, (status, _) in changes.items()
+        )
+    )
+    if rebuild:
+        weather = StationWeather.empty()
+        known = {}
+    else:
+        weather = StationWeather.load(cache_path)
+
+    for path in paths:
+        status, _ = changes[path]
+        if status == "unchanged" and path in known:
+            continue
+        if status == "appended" and path in known:
+            fold_weather_file(
+                weather,
+                read_appended(path, known[path]),
+                chunksize,
+            )
+        else:
+            fold_weather_file(weather, path, chunksize)
+
+    weather.save(cache_path)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "version": STATION_WEATHER_VERSION,
+                "files": {path: fingerprint(path) for path in paths},
+            },
+            f,
+        )
+    os.replace(tmp_path, manifest_path)
+    return weather
+
+
+def impute_nearest_stream(days):
+    """impute_nearest over a stream of (ordinal, row) pairs.
+
+    A row with missing cells is held back until the next day with a value
+    in each of them, so only the rows of a gap are buffered.
+    """
+    pending = []
+    previous = {}
+    for ordinal, row in days:
+        pending.append((ordinal, row.copy()))
+        for column in np.flatnonzero(~np.isnan(row)):
+            for pending_ordinal, pending_row in pending:
+                if not np.isnan(pending_row[column]):
+                    continue
+                before = previous.get(column)
+                if before is not None and (
+                    pending_ordinal - before[0] <= ordinal - pending_ordinal
+                ):
+                    pending_row[column] = before[1]
+                else:
+                    pending_row[column] = row[column]
+            previous[column] = (ordinal, row[column])
+        while pending and not np.isnan(pending[0][1]).any():
+            yield pending.pop(0)
+
+    # Missing cells at the end only have a day before them
+    for ordinal, row in pending:
+        for column in np.flatnonzero(np.isnan(row)):
+            if column in previous:
+                row[column] = previous[column][1]
+        yield ordinal, row
+
+
+def iter_daily_rows(
+    paths,
+    chunksize=CHUNKSIZE,
+    resume_after=None,
+    aggregation=DEFAULT_AGGREGATION,
+):
+    """Daily (ordinal, feature row) pairs before imputation, see below.
+
+    With "masked", days without any row are yielded as NaN rows.
+    """
+    parameters = Interner(WEATHER_PARAMETERS)
+    stations = Interner()
+    accumulator = DailyAccumulator(len(WEATHER_PARAMETERS))
+    current_day = None
+
+    def finish_day():
+        return (
+            date.fromisoformat(current_day).toordinal(),
+            accumulator.features(stations.values, aggregation),
+        )
+
+    for path in paths:
+        for chunk in pd.read_csv(
+            path,
+            usecols=["Datum", "Standort", "Parameter", "Wert"],
+            dtype={"Datum": str, "Standort": str, "Parameter": str},
+            chunksize=chunksize,
+        ):
+            # Group by calendar day, also for sub-daily intervals
+            days = chunk["Datum"].str.slice(0, 10).to_numpy()
+            if resume_after is not None:
+                keep = days > resume_after
+                chunk = chunk[keep]
+                days = days[keep]
+            if not len(days):
+                continue
+
+            station_codes = stations.encode(chunk["Standort"])
+            parameter_codes = parameters.encode(chunk["Parameter"])
+            # Parameters beyond the known ones are ignored
+            parameter_codes[parameter_codes >= len(WEATHER_PARAMETERS)] = -1
+            values = chunk["Wert"].to_numpy(dtype=np.float64)
+
+            boundaries = np.flatnonzero(days[1:] != days[:-1]) + 1
+            starts = np.concatenate([[0], boundaries])
+            ends = np.concatenate([boundaries, [len(days)]])
+            for start, end in zip(starts, ends):
+                day = days[start]
+                if day != current_day:
+                    if current_day is not None:
+                        if day < current_day:
+                            raise ValueError(
+                                f"Weather rows are not ordered by date: {day} "
+                                f"follows {current_day} in {path}"
+                            )
+                        ordinal, row = finish_day()
+                        yield ordinal, row
+                        if aggregation == "masked":
+                            # Days without any row are missing everywhere
+                            gap = date.fromisoformat(day).toordinal() - ordinal
+                            for missing in range(ordinal + 1, ordinal + gap):
+                                yield (
+                                    missing,
+                                    np.full(len(FEATURE_COLUMNS), np.nan),
+                                )
+                    current_day = day
+                    accumulator.reset(len(stations.values))
+                accumulator.grow(len(stations.values))
+                accumulator.add(
+                    station_codes[start:end],
+                    parameter_codes[start:end],
+                    values[start:end],
+                )
+
+    if current_day is not None:
+        yield finish_day()
+
+
+def iter_daily_weather_features(
+    paths,
+    chunksize=CHUNKSIZE,
+    resume_after=None,
+    aggregation=DEFAULT_AGGREGATION,
+):
+    """Stream long-format weather CSVs and yield (day, features) pairs.
+
+    Rows must be ordered by date within and across the files. Memory use is
+    bounded by the chunk size, the number of stations and the longest gap,
+    not the file size. The features are the same as those of
+    StationWeather.daily_features. Days up to and including resume_after
+    ("YYYY-MM-DD") are skipped, and with "masked" gaps are then only filled
+    from the streamed days.
+    """
+    days = iter_daily_rows(paths, chunksize, resume_after, aggregation)
+    if aggregation == "masked":
+        days = impute_nearest_stream(days)
+    for ordinal, row in days:
+        yield (
+            pd.Timestamp(date.fromordinal(ordinal)),
+            dict(zip(FEATURE_COLUMNS, row.tolist())),
+        )
+
+
+def stream_weather_features(
+    paths,
+    checkpoint_path,
+    chunksize=CHUNKSIZE,
+    aggregation=DEFAULT_AGGREGATION,
+):
+    """Like iter_daily_weather_features, resuming from a checkpoint file.
+
+    The checkpoint holds the last day handed to the consumer, it is updated
+    once the consumer asks for the next day.
+    """
+    resume_after = None
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            resume_after = f.read().strip() or None
+
+    for day, features in iter_daily_weather_features(
+        paths, chunksize, resume_after, aggregation
+    ):
+        yield day, features
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(day.strftime("%Y-%m-%d"))
+        os.replace(tmp_path, checkpoint_path)
+
+
+def build_weather_features(
+    paths=None, chunksize=CHUNKSIZE, aggregation=DEFAULT_AGGREGATION
+):
+    """Write the yearly cleaned feature files and the combined feature file.
+
+    The features are derived from the per-station array, see StationWeather.
+    """
+    if paths is None:
+        paths = sorted(glob.glob(WEATHER_DATA_PATTERN))
+    features = update_station_weather(paths, chunksize).daily_features(
+        aggregation
+    )
+
+    for year, year_features in features.groupby(features["Datum"].dt.year):
+        year_features.to_csv(
+            CLEANED_WEATHER_PATH.format(year=year), index=False
+        )
+    features.to_csv(WEATHER_FEATURES_PATH, index=False)
+    return features
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build the daily weather features"
+    )
+    parser.add_argument(
+        "--aggregation",
+        choices=AGGREGATIONS,
+        default=DEFAULT_AGGREGATION,
+        help="How stations without a value are treated, see AGGREGATIONS. "
+        "Retrain the model after switching to masked.",
+    )
+    args = parser.parse_args(argv)
+    features = build_weather_features(aggregation=args.aggregation)
+    print(features)
+
+
+if __name__ == "__main__":
+    main()